@@ -1,12 +1,13 @@
 # agents/credit_agent.py
 
-import os, re, json, asyncio
+import os, re, json
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
 from whatsapp.builder_out import whatsapp_output
 #from database._init_ import AsyncSessionLocal
 from app.db import get_sessionmaker
+from app.scheduler import scheduler
 AsyncSessionLocal = get_sessionmaker()
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -17,6 +18,7 @@ from langchain_openai import ChatOpenAI
 # from database.credit_crud import CreditCRUD
 # from database.vendor_crud import VendorCRUD
 from managers.credit_manager import CreditManager
+from managers.credit_events import credit_events
 from managers.trust_module import BabaiTrustModule
 # from managers.uoc_manager import UOCManager
 from whatsapp import apis
@@ -265,6 +267,65 @@ async def handle_collect_gst(state):
 
     return state
  
+CREDIT_APPROVAL_WATCH = "credit_approval_watch"
+CREDIT_DECISION_TIMER = "credit_decision"
+CREDIT_APPROVAL_MAX_WAIT_SECONDS = 300
+
+
+def _approval_watch_key(sender_id: str) -> str:
+    return f"{CREDIT_APPROVAL_WATCH}:{sender_id}"
+
+
+async def _on_credit_status_change(snapshot: Dict[str, Any]) -> None:
+    """Push the approval message the moment a watched applicant's profile flips to approved."""
+    sender_id = snapshot.get("sender_id")
+    if not sender_id or snapshot.get("status") != "approved":
+        return
+    # The pending watch timer is the subscription; claiming it sends the notification once,
+    # whichever worker wrote the approval and whichever one holds the timer.
+    if not await scheduler.claim(_approval_watch_key(sender_id)):
+        return
+
+    limit = float(snapshot.get("limit", 0.0))
+    used  = float(snapshot.get("used", 0.0))
+    available = max(0.0, limit - used)
+    msg = (
+        "🎉 Credit Approved!\n" 
+        f"Available: ₹{available:,.0f} (Used ₹{used:,.0f} / Limit ₹{limit:,.0f})\n"
+        f"Tap to continue with your vendors."
+    )
+    # Proactive push to the user on WhatsApp: 
+    whatsapp_output(sender_id, msg, message_type="button", extra_data=[
+        {"id": "credit_view_portal", "title": "View Credit & Vendors"},
+        {"id": "rfq", "title": "Get Material Quotations"}
+    ])
+
+
+async def _run_credit_approval_timeout(key: str, payload: Dict[str, Any]) -> None:
+    # Still watched after the wait window. Another worker may have claimed the approval
+    # without reaching this worker's in-memory timer, so re-read before nudging.
+    async with AsyncSessionLocal() as session:
+        profile = await CreditManager(session).get_profile(payload["sender_id"])
+    if profile.get("status") == "approved":
+        return
+    whatsapp_output(
+        payload["sender_id"],
+        "Still reviewing your application. This can take a bit longer sometimes. I’ll notify you as soon as it’s approved.",
+        message_type="plain",
+    )
+
+
+async def _run_credit_decision(key: str, payload: Dict[str, Any]) -> None:
+    # Stand-in for the partner callback: one decision pass, whose write publishes the status event.
+    async with AsyncSessionLocal() as session:
+        await CreditManager(session).refresh_partner_status(payload["sender_id"])
+
+
+credit_events.listen("credit_approval_notifier", _on_credit_status_change)
+scheduler.register(CREDIT_APPROVAL_WATCH, _run_credit_approval_timeout)
+scheduler.register(CREDIT_DECISION_TIMER, _run_credit_decision)
+
+
 async def handle_collect_consent(state):
     text = state.get("messages", [])[-1].get("content", "").strip().upper()
     if text not in ("I CONSENT", "CONSENT"):
@@ -297,38 +358,15 @@ async def handle_collect_consent(state):
         needs_clarification=True,
     ) 
   
-    async def _bg_poll_and_notify(sender_id: str):
-        print("Credit Agent:::: background poll started for sender_id:", sender_id)
-        try:
-            async with AsyncSessionLocal() as session:
-                mgr = CreditManager(session)
-                snap = await mgr.poll_until_approved(sender_id, max_wait_seconds=300, interval_seconds=20)
-
-                if snap.get("status") == "approved":
-                    limit = float(snap.get("limit", 0.0))
-                    used  = float(snap.get("used", 0.0))
-                    available = max(0.0, limit - used)
-                    msg = (
-                        "🎉 Credit Approved!\n" 
-                        f"Available: ₹{available:,.0f} (Used ₹{used:,.0f} / Limit ₹{limit:,.0f})\n"
-                        f"Tap to continue with your vendors."
-                    )
-                    # Proactive push to the user on WhatsApp: 
-                    await apis.send_message(sender_id, msg, buttons=[
-                        {"id": "credit_view_portal", "title": "View Credit & Vendors"},
-                        {"id": "rfq", "title": "Get Material Quotations"}
-                    ])
-                else:
-                    # Optional: gentle nudge if still pending after timeout
-                    await apis.send_message(
-                        sender_id,
-                        "Still reviewing your application. This can take a bit longer sometimes. I’ll notify you as soon as it’s approved."
-                    )
-        except Exception as e:
-            print("Credit Agent:::: background poll failed:", e)
-
-    # schedule without awaiting (don't block the user flow)
-    asyncio.create_task(_bg_poll_and_notify(sender_id))
+    # Event-driven: the approval message is pushed by _on_credit_status_change when the profile
+    # flips; the watch timer only fires (without querying) if nothing arrives in time.
+    scheduler.schedule(
+        _approval_watch_key(sender_id),
+        CREDIT_APPROVAL_WATCH,
+        CREDIT_APPROVAL_MAX_WAIT_SECONDS,
+        {"sender_id": sender_id},
+    )
+    scheduler.schedule(f"{CREDIT_DECISION_TIMER}:{sender_id}", CREDIT_DECISION_TIMER, 0, {"sender_id": sender_id})
     return state
  
 async def handle_poll_approval(state, crud):
@@ -23,6 +23,7 @@ from urllib.parse import quote
 #from app.db import SessionLocal
 
 from app.db import get_sessionmaker
+from app.scheduler import scheduler
 AsyncSessionLocal = get_sessionmaker()
 from  users.user_onboarding_manager import set_user_role
 from users import user_onboarding_manager
@@ -237,8 +238,7 @@ FOCUS_MORE_BUTTON_ID = "focus_more"
 ADD_MORE_PHOTOS_BUTTON_ID = "add_more_photos"
 GENERATE_ORDER_BUTTON_ID = "generate_order"
 BULK_AUTO_FINALIZE_SECONDS = 120
-
-_bulk_finalize_tasks: Dict[str, asyncio.Task] = {}
+BULK_AUTO_FINALIZE_TIMER = "bulk_auto_finalize"
 
 
 def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
@@ -593,50 +593,6 @@ def _looks_like_followup(message: str) -> bool:
     return any(word in ml for word in FOLLOWUP_KEYWORDS)
 
 
-def _score_order_for_query(order: dict, message: str) -> int:
-    if not message:
-        return 0
-    message = message.lower()
-    score = 0
-
-    rid = str(order.get("request_id", "")).lower()
-    if rid and rid in message:
-        score += 5
-
-    vendor_names = []
-    approved = order.get("approved_vendor") or {}
-    if approved.get("name"):
-        vendor_names.append(approved["name"])
-    for vendor in order.get("vendors") or []:
-        name = vendor.get("name")
-        if name:
-            vendor_names.append(name)
-    for name in vendor_names:
-        name_l = name.lower()
-        if name_l and name_l in message:
-            score += 4
-
-    for cat in (order.get("vendor_categories") or []):
-        cat_l = cat.lower()
-        if cat_l and cat_l in message:
-            score += 3
-
-    for material in (order.get("sample_materials") or [])[:3]:
-        mat_l = material.lower()
-        if mat_l and mat_l in message:
-            score += 2
-
-    status = (order.get("status") or "").lower()
-    if "draft" in message and status == "draft":
-        score += 1
-    if "active" in message and status in {"requested", "quoted"}:
-        score += 1
-    if ("delivered" in message or "arrived" in message) and order.get("delivered_at"):
-        score += 2
-
-    return score
-
-
 def _format_date_string(value: Optional[str]) -> Optional[str]:
     if not value:
         return None
@@ -776,13 +732,15 @@ def _gather_focus_entries(
 # -----------------------------------------------------------------------------
 # Bulk Photo Helpers
 # -----------------------------------------------------------------------------
+def _bulk_finalize_key(sender_id: str) -> str:
+    return f"{BULK_AUTO_FINALIZE_TIMER}:{sender_id}"
+
+
 def _cancel_bulk_auto_finalize(state: dict) -> None:
     sender_id = state.get("sender_id")
     if not sender_id:
         return
-    task = _bulk_finalize_tasks.pop(sender_id, None)
-    if task and not task.done():
-        task.cancel()
+    scheduler.cancel(_bulk_finalize_key(sender_id))
 
 
 def _schedule_bulk_auto_finalize(state: dict) -> None:
@@ -791,29 +749,35 @@ def _schedule_bulk_auto_finalize(state: dict) -> None:
         return
     _cancel_bulk_auto_finalize(state)
 
-    async def _auto_finalize_after_delay() -> None:
-        try:
-            await asyncio.sleep(BULK_AUTO_FINALIZE_SECONDS)
-            if not state.get("bulk_pending_items"):
-                return
-            if state.get("bulk_auto_locked"):
-                return
-            state["bulk_auto_locked"] = True
-            summary = await _finalize_bulk_batch(state, auto=True)
-            if summary:
-                message, message_type, extra = summary
-                whatsapp_output(sender_id, message, message_type=message_type, extra_data=extra)
-            else:
-                state.pop("bulk_auto_locked", None)
-        except asyncio.CancelledError:
-            return
-        finally:
-            _bulk_finalize_tasks.pop(sender_id, None)
-
     state["bulk_auto_finalize_deadline"] = (
         datetime.utcnow() + timedelta(seconds=BULK_AUTO_FINALIZE_SECONDS)
     ).isoformat()
-    _bulk_finalize_tasks[sender_id] = asyncio.create_task(_auto_finalize_after_delay())
+    # In-memory on purpose: the pending bulk items live in the webhook's in-process state.
+    scheduler.call_later(
+        _bulk_finalize_key(sender_id),
+        BULK_AUTO_FINALIZE_SECONDS,
+        lambda: _run_bulk_auto_finalize(sender_id),
+    )
+
+
+async def _run_bulk_auto_finalize(sender_id: str) -> None:
+    from whatsapp.webhook import get_state  # webhook imports this module
+
+    state = get_state(sender_id)
+    if not state:
+        return
+    if not state.get("bulk_pending_items"):
+        return
+    if state.get("bulk_auto_locked"):
+        return
+    state["bulk_auto_locked"] = True
+    summary = await _finalize_bulk_batch(state, auto=True)
+    if summary:
+        message, message_type, extra = summary
+        whatsapp_output(sender_id, message, message_type=message_type, extra_data=extra)
+    else:
+        state.pop("bulk_auto_locked", None)
+
 
 
 def _clear_bulk_state(state: dict) -> None:
@@ -1004,9 +968,12 @@ async def _handle_order_status_query(state: dict, query_text: str) -> bool:
 
     force_list = (query_text == MY_ORDERS_BUTTON_ID)
 
+    ranked: list = []
     async with AsyncSessionLocal() as session:
         service = OrderContextService(session)
         context = await service.get_orders_for_sender(sender_id, limit=20)
+        if not force_list and query_text:
+            ranked = await service.search_orders(sender_id, query_text, limit=1)
 
     if not context:
         state.update(
@@ -1043,14 +1010,8 @@ async def _handle_order_status_query(state: dict, query_text: str) -> bool:
                 candidate = order
                 break
 
-    if not candidate and not force_list:
-        scores = []
-        for order in all_orders:
-            score = _score_order_for_query(order, query_text_lc)
-            if score > 0:
-                scores.append((score, order))
-        if scores:
-            candidate = max(scores, key=lambda s: s[0])[1]
+    if not candidate and not force_list and ranked:
+        candidate = ranked[0][1]
 
     if not candidate and not force_list and len(active) == 1:
         candidate = active[0]
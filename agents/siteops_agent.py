@@ -1,14 +1,22 @@
 
 
 import os, json, base64, openai
-from typing import Dict, Tuple, Optional
+from typing import Dict, Optional
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 import re        
 from models.chatstate import AgentState
 from managers.uoc_manager import UOCManager
-from whatsapp.builder_out import whatsapp_output
+from whatsapp.builder_out import whatsapp_output, whatsapp_output_async
+from jobs.site_updates import SITE_UPDATE_ACK, enqueue_site_update
+from jobs.site_digest import format_project_digest
+from jobs.lesson_refresh import enqueue_lesson_refresh
+from managers.lesson_library import lesson_library
+from database.rollup_crud import get_recent_rollups, site_today
+from database.models import Project
+from datetime import timedelta
+from uuid import UUID
 from database.uoc_crud import DatabaseCRUD
 #from database._init_ import AsyncSessionLocal
 from app.db import get_sessionmaker
@@ -237,62 +245,31 @@ def generate_new_user_greeting(
     print("SiteOps Agent:::: generate_new_user_greeting : response:", resp)
     return resp
 # ---------------------------------------------------------------------------
-# Helper 2 · Build context tags and human block
+# Helper 2 · Hand a site update to the summary pipeline
 # ---------------------------------------------------------------------------
-def get_context_and_tags(state: dict) -> Tuple[str, str]:
-    # ----------- gather raw inputs -----------
+async def queue_site_update(state: dict) -> bool:
+    """
+    Ack the update right away and enqueue it for summarise_update; the summary is pushed to
+    the sender by jobs.site_updates once it is ready. Returns False if it was already queued.
+    """
     last_msg = state["messages"][-1]["content"] if state.get("messages") else ""
     caption  = state.get("caption", "")
     combined = f"{last_msg}\n{caption}".strip()
+    sender_id = state["sender_id"]
 
-    # ----------- image (safe) -----------
-    img_b64 = None
-    img_path = state.get("image_path")
-    if img_path:
-        try:
-            img_b64 = encode_image_base64(img_path)
-        except FileNotFoundError:
-            print("⚠  Image file not found:", img_path)
-
-    # ----------- summarise (safe) -----------
-    try:
-        note = summarise_update(combined, img_b64) or {}
-    except Exception as e:
-        print("⚠  summarise_update failed:", e)
-        note = {}
-
-    # Mandatory keys with defaults
-    note.setdefault("component",  None)
-    note.setdefault("highlight",  None)
-    note.setdefault("risk",       None)
-    note.setdefault(
-        "summary",
-        "Sorry, I couldn’t grasp that update. Could you re-phrase?"
-    )
-
-    # store quick-grasp *string* for WhatsApp reply
-    state["siteops_quick_grasp"] = note["summary"]
-    print("SiteOps Agent:::: get_context_and_tags : summary:", note["summary"])
-    # ----------- vector tags (safe) -----------
-    # try:
-    #     query = f"{note['component'] or ''} {note['highlight'] or ''}".strip()
-    #     raw_tags   = vector_search(query) if query else []
-    #     tags_pretty = filter_tags(raw_tags)
-    # except Exception as e:
-    #     print("⚠  vector_search failed:", e)
-    #     tags_pretty = ""
-
-    # # ----------- human context block -----------
-    ctx_block = (
-        f"Component : {note['component']}\n"
-        f"Highlight : {note['highlight']}\n"
-        f"Risk      : {note['risk']}\n\n"
-        f"Summary   : {note['summary']}\n\n"
+    queued = await enqueue_site_update(
+        sender_id=sender_id,
+        text=combined,
+        image_path=state.get("image_path"),
+        project_id=state.get("active_project_id"),
+        task_id=state.get("task_id"),
+        # The image's media id is unique per photo, including ones replayed from a media batch.
+        source_key=(state.get("media_id") if state.get("msg_type") == "image" else None) or state.get("inbound_wamid"),
     )
-
-    return ctx_block
-
-
+    if queued:
+        await whatsapp_output_async(sender_id, SITE_UPDATE_ACK, message_type="plain")
+    print("SiteOps Agent:::: queue_site_update : queued:", queued)
+    return queued
 
 
 
@@ -348,15 +325,8 @@ def handle_main_menu(state: AgentState, crud: DatabaseCRUD, latest_response: str
     print("Random Agent::::: handle_main_menu:::::  --Handling main menu intent --", state)
     return state
 
-async def handle_micro_lesson(state:AgentState, crud: DatabaseCRUD, latest_response:str, uoc_next_message_extra_data= None) -> AgentState:
-    msg_obj = (state["siteops_conversation_log"][-1]["content"]) if state.get("siteops_conversation_log") else {}
-    # msg_obj = safe_json(msg_obj, default={})
-    msg_obj= safe_json(msg_obj, default={}) if isinstance(msg_obj, str) else ""
-    message_from_previous = msg_obj.get("message", "") if isinstance(msg_obj, dict) else ""
-    topic_to_be_covered = msg_obj.get("smart_button", "") if isinstance(msg_obj, dict) else ""
-    print("SiteOps Agent:::: new_user_flow : Started micro_lesson")
-    topic = topic_to_be_covered if topic_to_be_covered else "Construction Basics"
-    user_lang = 'Telugu'
+async def generate_micro_lesson(topic: str, user_lang: str) -> str:
+    """One LLM call for a six-bullet lesson; raises if nothing usable comes back."""
     micro_lesson_prompt = f"""
 You are a master builder-mentor. Explain *{topic}* so that even a curious
 20-year-old helper and a seasoned contractor both say “aha!”.
@@ -384,15 +354,36 @@ DON’TS
 
 Language: {user_lang}
 """
+    response = await llm.ainvoke([
+        SystemMessage(content=micro_lesson_prompt),
+        HumanMessage(content=f"Please explain: {topic}")
+    ])
+    response_text = getattr(response, "content", str(response)).strip()
+    if not response_text:
+        raise ValueError(f"empty micro-lesson for {topic!r}")
+    return response_text
+
+
+async def handle_micro_lesson(state:AgentState, crud: DatabaseCRUD, latest_response:str, uoc_next_message_extra_data= None) -> AgentState:
+    msg_obj = (state["siteops_conversation_log"][-1]["content"]) if state.get("siteops_conversation_log") else {}
+    # msg_obj = safe_json(msg_obj, default={})
+    msg_obj= safe_json(msg_obj, default={}) if isinstance(msg_obj, str) else ""
+    message_from_previous = msg_obj.get("message", "") if isinstance(msg_obj, dict) else ""
+    topic_to_be_covered = msg_obj.get("smart_button", "") if isinstance(msg_obj, dict) else ""
+    print("SiteOps Agent:::: new_user_flow : Started micro_lesson")
+    topic = topic_to_be_covered if topic_to_be_covered else "Construction Basics"
+    user_lang = 'Telugu'
+    # Lessons are shared across builders; only a topic nobody has asked about yet waits on the LLM.
     try:
-        response =await llm.ainvoke([
-            SystemMessage(content=micro_lesson_prompt),
-            HumanMessage(content=f"Please explain: {topic}")
-        ])
-        response_text = getattr(response, "content", str(response))
+        response_text, stale = await lesson_library.get(topic, user_lang, generate_micro_lesson)
     except Exception as e:
-        response_text = "Sorry, I couldn’t fetch the lesson right now. Try again in a bit." 
+        response_text, stale = "Sorry, I couldn’t fetch the lesson right now. Try again in a bit.", False
         print("LLM Error:", e)
+    if stale:
+        try:
+            await enqueue_lesson_refresh(topic, user_lang)
+        except Exception as e:
+            print("SiteOps Agent:::: handle_micro_lesson : could not queue lesson refresh:", e)
 
     print("Micro-lesson output:", response_text)
     print("SiteOps Agent:::: new_user_flow : user_stage is new")
@@ -412,8 +403,29 @@ async def handle_project_onboarding(state:AgentState,  crud: DatabaseCRUD, lates
     uoc_mgr = UOCManager(crud)
     return await uoc_mgr.resolve_uoc(state,uoc_last_called_by)
 
+async def _rollup_overview(project_id: str) -> Optional[str]:
+    """Today's and yesterday's rollups for the active project, or None if nothing is logged."""
+    today = site_today()
+    try:
+        async with AsyncSessionLocal() as session:
+            project = await session.get(Project, UUID(str(project_id)))
+            rollups = await get_recent_rollups(session, UUID(str(project_id)), today - timedelta(days=1))
+    except Exception as e:
+        print("SiteOps Agent:::: _rollup_overview : failed:", e)
+        return None
+    if project is None or not rollups:
+        return None
+    sections = []
+    for rollup in rollups:
+        label = "Today" if rollup.log_date == today else "Yesterday"
+        body = format_project_digest(project.name, rollup).split("\n", 1)
+        sections.append(f"{label}\n{body[1] if len(body) > 1 else 'No activity logged.'}")
+    return f"SiteOps Daily Pulse — {project.name}\n\n" + "\n\n".join(sections)
+
+
 async def handle_project_overview(state:AgentState,  crud: DatabaseCRUD, latest_response:str, uoc_next_message_extra_data= None):
-        message=""" SiteOps Daily Pulse — ASM Elite Apartments (Stilt + G + 5 Floors)
+        rollup_message = await _rollup_overview(state["active_project_id"]) if state.get("active_project_id") else None
+        message= rollup_message or """ SiteOps Daily Pulse — ASM Elite Apartments (Stilt + G + 5 Floors)
 📍 Pratap Nagar, Kakinada, Andhra Pradesh
 
 Yesterday
@@ -634,6 +646,13 @@ async def run_siteops_agent(state: AgentState, config: dict) -> AgentState:
 
     print("SiteOps Agent:::: run_siteops_agent - Intent of latest message is - ", latest_msg_intent)
 
+    # Photo updates on an active project are summarised off the reply path.
+    if state.get("msg_type") == "image" and state.get("image_path") and state.get("active_project_id"):
+        try:
+            await queue_site_update(state)
+        except Exception as e:
+            print("SiteOps Agent:::: run_siteops_agent : could not queue site update:", e)
+
     if user_stage == "new":
          print("SiteOps Agent:::: run_siteops_agent : user_stage is new")
          return await new_user_flow(state, latest_msg_intent, crud)
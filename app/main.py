@@ -1,4 +1,5 @@
 # app/main.py
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -30,7 +31,49 @@ async def lifespan(app: FastAPI):
     # dev-only: create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    yield
+
+    # Shared timer scheduler: restores persisted timers (debounces, auto-finalize, credit re-checks).
+    from app.scheduler import scheduler
+    import jobs.site_digest as site_digest  # registers the daily digest timer and job
+    await scheduler.start()
+    if os.getenv("SITE_DIGEST_ENABLED", "1") == "1":
+        site_digest.ensure_digest_scheduled()
+
+    # Vendor follow-up nudges; safe to run on every replica (rows are claimed with SKIP LOCKED).
+    followup_stop = asyncio.Event()
+    followup_task = None
+    if os.getenv("VENDOR_FOLLOWUP_SCHEDULER", "1") == "1":
+        from jobs.vendor_followup import run_vendor_followup_scheduler
+        followup_task = asyncio.create_task(run_vendor_followup_scheduler(followup_stop))
+
+    # Background job workers (post-response work such as /submit-order fan-out); rows are claimed with SKIP LOCKED.
+    from jobs.runner import job_runner
+    import jobs.order_submission  # noqa: F401  registers job handlers
+    import jobs.lesson_refresh as lesson_refresh  # registers micro-lesson generation
+    # Site-update summaries get their own bounded pool so photo bursts don't delay order jobs.
+    from jobs.site_updates import site_update_runner
+    run_jobs = os.getenv("BACKGROUND_JOB_WORKERS", "1") == "1"
+    if run_jobs:
+        await job_runner.start()
+        await site_update_runner.start()
+    if os.getenv("LESSON_PREWARM", "1") == "1":
+        # Seed topics are keyed per day, so replicas starting together queue each lesson once.
+        try:
+            await lesson_refresh.enqueue_seed_lessons()
+        except Exception as e:
+            print("main ::::: lifespan ::::: lesson seeding skipped:", e)
+    try:
+        yield
+    finally:
+        if run_jobs:
+            await site_update_runner.stop()
+            await job_runner.stop()
+        if followup_task is not None:
+            followup_stop.set()
+            await followup_task
+        await scheduler.stop()
+        from managers.plan_ingest import shutdown_pool
+        shutdown_pool()
 
 app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
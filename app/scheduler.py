@@ -0,0 +1,382 @@
+# app/scheduler.py
+"""
+One in-process scheduler for delayed work (debounces, auto-finalize, heartbeats, re-checks).
+
+Timers live in a single min-heap keyed by absolute run time and are addressed by a string
+key: scheduling a key again replaces its pending timer, cancel(key) drops it in O(1)
+(stale heap entries are skipped when they surface). One runner task sleeps until the
+earliest deadline, so thousands of pending timers cost no tasks of their own.
+
+Timers scheduled with a registered `kind` are also written to `scheduled_timers`
+(write-behind, coalesced per key) so they survive deploys. Each row is leased to the worker
+that armed or claimed it; the lease is renewed while that worker runs and released on
+shutdown. On startup, and every heartbeat after, a worker claims unowned or expired rows
+with SKIP LOCKED, so with several workers each persisted timer fires in exactly one of them.
+Persist only timers whose handler can run from its payload and the database — anything
+reading in-process state belongs on `call_later`, which holds a Python callback and is
+in-memory only.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+log = logging.getLogger("uvicorn.error")
+
+TimerHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+TIMER_LEASE_SECONDS = float(os.getenv("TIMER_LEASE_SECONDS", "60"))
+TIMER_HEARTBEAT_SECONDS = TIMER_LEASE_SECONDS / 3
+
+
+@dataclass
+class _Timer:
+    key: str
+    run_at: float
+    seq: int
+    kind: Optional[str] = None
+    payload: Dict[str, Any] = field(default_factory=dict)
+    callback: Optional[Callable[[], Awaitable[None]]] = None
+
+    @property
+    def persistent(self) -> bool:
+        return self.kind is not None
+
+
+class TimerScheduler:
+    def __init__(self, *, persist: bool = True):
+        self._persist = persist
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, TimerHandler] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._timers: Dict[str, _Timer] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._inflight: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._starting: Optional[asyncio.Task] = None
+        # key -> timer to upsert, or None to delete; drained by the writer task.
+        self._pending_writes: Dict[str, Optional[_Timer]] = {}
+        self._writes_ready: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------ API
+
+    def register(self, kind: str, handler: TimerHandler) -> None:
+        """Bind a persistent timer kind to `handler(key, payload)`; call at import time."""
+        self._handlers[kind] = handler
+
+    def schedule(
+        self,
+        key: str,
+        kind: str,
+        delay: float,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """(Re)arm a persistent timer `delay` seconds from now. Payload must be JSON-serialisable."""
+        timer = _Timer(key=key, run_at=time.time() + max(0.0, delay), seq=next(self._seq), kind=kind, payload=dict(payload or {}))
+        self._arm(timer)
+        self._queue_write(key, timer)
+
+    def call_later(self, key: str, delay: float, callback: Callable[[], Awaitable[None]]) -> None:
+        """(Re)arm an in-memory timer that awaits `callback()`; not persisted."""
+        previous = self._timers.get(key)
+        self._arm(_Timer(key=key, run_at=time.time() + max(0.0, delay), seq=next(self._seq), callback=callback))
+        if previous is not None and previous.persistent:
+            self._queue_write(key, None)
+
+    def cancel(self, key: str) -> bool:
+        """Drop the pending timer for `key` and stop its handler if it is mid-run."""
+        timer = self._timers.pop(key, None)
+        if timer is not None and timer.persistent:
+            self._queue_write(key, None)
+        task = self._running.pop(key, None)
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        return timer is not None
+
+    def pending(self, key: str) -> bool:
+        return key in self._timers
+
+    async def claim(self, key: str) -> bool:
+        """
+        Cancel `key` wherever it is armed; True only for the one caller that removed it.
+        A persisted row is removed with DELETE ... RETURNING, so when two workers race to
+        claim the same timer exactly one wins. The owner's in-memory copy may still fire, so
+        handlers of claimable timers must check whether their work is still needed.
+        """
+        armed_here = key in self._timers
+        if not self._persist or (armed_here and self._pending_writes.get(key) is not None):
+            # In memory only, or not written yet: no other worker can see it.
+            return self.cancel(key)
+
+        from app.db import get_sessionmaker
+        from database.models import ScheduledTimer
+
+        async with get_sessionmaker()() as session:
+            removed = (
+                await session.execute(
+                    delete(ScheduledTimer).where(ScheduledTimer.key == key).returning(ScheduledTimer.key)
+                )
+            ).first()
+            await session.commit()
+        if armed_here:
+            self.cancel(key)
+        return removed is not None
+
+    async def start(self) -> None:
+        if self._wakeup is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._writes_ready = asyncio.Event()
+        if self._persist:
+            await self._claim()
+            self._writer = asyncio.create_task(self._write_loop())
+        self._runner = asyncio.create_task(self._run_loop())
+        if self._pending_writes:
+            self._writes_ready.set()
+
+    async def stop(self) -> None:
+        for task in (self._runner, self._writer):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._runner = self._writer = self._starting = None
+        self._wakeup = self._writes_ready = None
+        if self._persist:
+            await self._flush_writes()
+            await self._release()
+
+    # ------------------------------------------------------------ internals
+
+    def _arm(self, timer: _Timer) -> None:
+        self._timers[timer.key] = timer
+        heapq.heappush(self._heap, (timer.run_at, timer.seq, timer.key))
+        self._ensure_started()
+        if self._wakeup is not None and self._heap[0][1] == timer.seq:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        # Callers are plain functions as often as coroutines; start lazily on the running loop.
+        if self._wakeup is not None or self._starting is not None:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._starting = asyncio.create_task(self.start())
+
+    def _queue_write(self, key: str, timer: Optional[_Timer]) -> None:
+        if not self._persist:
+            return
+        self._pending_writes[key] = timer
+        if self._writes_ready is not None:
+            self._writes_ready.set()
+
+    async def _run_loop(self) -> None:
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                timer = self._timers.get(key)
+                if timer is None or timer.seq != seq:
+                    continue  # cancelled or re-armed
+                del self._timers[key]
+                self._fire(timer)
+
+            timeout = (self._heap[0][0] - now) if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire(self, timer: _Timer) -> None:
+        task = asyncio.create_task(self._invoke(timer))
+        self._running[timer.key] = task
+        self._inflight.add(task)
+
+        def _done(t: asyncio.Task, key: str = timer.key) -> None:
+            self._inflight.discard(t)
+            if self._running.get(key) is t:
+                self._running.pop(key, None)
+
+        task.add_done_callback(_done)
+
+    async def _invoke(self, timer: _Timer) -> None:
+        try:
+            if timer.callback is not None:
+                await timer.callback()
+            else:
+                handler = self._handlers.get(timer.kind)
+                if handler is None:
+                    log.warning("scheduler: no handler registered for timer kind %s (key %s)", timer.kind, timer.key)
+                else:
+                    await handler(timer.key, timer.payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            log.exception("scheduler: timer %s failed", timer.key)
+        finally:
+            # At-least-once: the row is removed only after the handler ran, unless it re-armed itself.
+            if timer.persistent and timer.key not in self._timers:
+                self._queue_write(timer.key, None)
+
+    def _lease_until(self):
+        return func.now() + timedelta(seconds=TIMER_LEASE_SECONDS)
+
+    async def _claim(self) -> None:
+        """Take over unowned or expired rows of the kinds registered here and arm them."""
+        from app.db import get_sessionmaker
+        from database.models import ScheduledTimer
+
+        if not self._handlers:
+            return
+        claimable = (
+            select(ScheduledTimer.key)
+            .where(
+                ScheduledTimer.kind.in_(list(self._handlers)),
+                or_(ScheduledTimer.owner.is_(None), ScheduledTimer.lease_until < func.now()),
+            )
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(ScheduledTimer)
+            .where(ScheduledTimer.key.in_(claimable))
+            .values(owner=self.worker_id, lease_until=self._lease_until())
+            .returning(ScheduledTimer.key, ScheduledTimer.kind, ScheduledTimer.run_at, ScheduledTimer.payload)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with get_sessionmaker()() as session:
+                rows = (await session.execute(stmt)).all()
+                await session.commit()
+        except Exception:
+            log.exception("scheduler: could not claim persisted timers")
+            return
+        claimed = 0
+        for key, kind, run_at, payload in rows:
+            if key in self._timers or key in self._pending_writes:
+                continue  # re-armed or cancelled in this process before the claim landed
+            run_at = run_at.timestamp() if run_at else time.time()
+            self._arm(_Timer(key=key, run_at=run_at, seq=next(self._seq), kind=kind, payload=dict(payload or {})))
+            claimed += 1
+        if claimed:
+            print(f"scheduler ::::: claimed {claimed} persisted timers")
+
+    async def _heartbeat(self) -> None:
+        """Renew this worker's leases, then pick up rows left behind by workers that died."""
+        from app.db import get_sessionmaker
+        from database.models import ScheduledTimer
+
+        async with get_sessionmaker()() as session:
+            await session.execute(
+                update(ScheduledTimer)
+                .where(ScheduledTimer.owner == self.worker_id)
+                .values(lease_until=self._lease_until())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        await self._claim()
+
+    async def _release(self) -> None:
+        """Hand this worker's rows back on shutdown so the next worker claims them at once."""
+        from app.db import get_sessionmaker
+        from database.models import ScheduledTimer
+
+        try:
+            async with get_sessionmaker()() as session:
+                await session.execute(
+                    update(ScheduledTimer)
+                    .where(ScheduledTimer.owner == self.worker_id)
+                    .values(owner=None, lease_until=None)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+        except Exception:
+            log.exception("scheduler: could not release timer leases")
+
+    async def _write_loop(self) -> None:
+        next_heartbeat = time.monotonic() + TIMER_HEARTBEAT_SECONDS
+        while True:
+            try:
+                await asyncio.wait_for(self._writes_ready.wait(), max(0.0, next_heartbeat - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            self._writes_ready.clear()
+            try:
+                await self._flush_writes()
+                if time.monotonic() >= next_heartbeat:
+                    await self._heartbeat()
+                    next_heartbeat = time.monotonic() + TIMER_HEARTBEAT_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("scheduler: persisting timers failed; will retry")
+                await asyncio.sleep(1.0)
+                self._writes_ready.set()
+
+    async def _flush_writes(self) -> None:
+        if not self._pending_writes:
+            return
+        from app.db import get_sessionmaker
+        from database.models import ScheduledTimer
+
+        batch, self._pending_writes = self._pending_writes, {}
+        upserts = [
+            {
+                "key": key,
+                "kind": timer.kind,
+                "run_at": datetime.fromtimestamp(timer.run_at, tz=timezone.utc),
+                "payload": timer.payload,
+                "owner": self.worker_id,
+                "lease_until": self._lease_until(),
+            }
+            for key, timer in batch.items()
+            if timer is not None
+        ]
+        deletes = [key for key, timer in batch.items() if timer is None]
+        try:
+            async with get_sessionmaker()() as session:
+                if deletes:
+                    await session.execute(delete(ScheduledTimer).where(ScheduledTimer.key.in_(deletes)))
+                if upserts:
+                    stmt = pg_insert(ScheduledTimer).values(upserts)
+                    excluded = stmt.excluded
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[ScheduledTimer.key],
+                        set_={
+                            "kind": excluded.kind,
+                            "run_at": excluded.run_at,
+                            "payload": excluded.payload,
+                            "owner": excluded.owner,
+                            "lease_until": excluded.lease_until,
+                            "updated_at": func.now(),
+                        },
+                    )
+                    await session.execute(stmt)
+                await session.commit()
+        except Exception:
+            # Put the batch back underneath anything queued since, so newer ops still win.
+            batch.update(self._pending_writes)
+            self._pending_writes = batch
+            raise
+
+
+scheduler = TimerScheduler()
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload
  
 from database.models import User, CreditProfile, CreditTransaction, PartnerStatusHistory, CreditStatus
+from managers.credit_events import credit_events
 
 class CreditCRUD:
     def __init__(self, session: AsyncSession):
@@ -27,6 +28,11 @@ class CreditCRUD:
         res = await self.session.execute(select(User).where(User.sender_id == sender_id))
         return res.scalar_one_or_none()
 
+    def _publish_if_status_changed(self, fields, snapshot: Optional[Dict[str, Any]]) -> None:
+        # Push-based approval notifications (see managers/credit_events.py); call after commit.
+        if snapshot and credit_events.touches_status(fields):
+            credit_events.publish(snapshot)
+
     # --------- reads (return dicts) ----------
     async def get_profile_by_sender(self, sender_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -92,7 +98,10 @@ class CreditCRUD:
             .execution_options(synchronize_session="fetch")
         )
         await self.session.commit()
-        return int(result.rowcount or 0)
+        updated = int(result.rowcount or 0)
+        if updated and credit_events.touches_status(values):
+            self._publish_if_status_changed(values, await self.get_profile_by_sender(sender_id))
+        return updated
 
     async def upsert_profile(self, sender_id: str, full_name: str | None = None, **kwargs) -> Dict[str, Any]:
         """
@@ -119,7 +128,9 @@ class CreditCRUD:
             await self.session.commit()
 
         # Always return normalized dict
-        return await self.get_profile_by_sender(sender_id)
+        snapshot = await self.get_profile_by_sender(sender_id)
+        self._publish_if_status_changed(values, snapshot)
+        return snapshot
 
     # --------- transactions (return dicts) ----------
     async def log_transaction(
@@ -0,0 +1,19 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS status_events (
+    id BIGSERIAL PRIMARY KEY,
+    entity_type TEXT NOT NULL,
+    request_id UUID NOT NULL REFERENCES material_requests(id) ON DELETE CASCADE,
+    item_id UUID,
+    vendor_id UUID,
+    status TEXT NOT NULL,
+    occurred_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_status_events_request
+    ON status_events (request_id, occurred_at);
+
+CREATE INDEX IF NOT EXISTS idx_status_events_entity_status
+    ON status_events (entity_type, status, occurred_at);
+
+COMMIT;
@@ -0,0 +1,10 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS quote_comparisons (
+    quote_request_id UUID PRIMARY KEY REFERENCES material_requests(id) ON DELETE CASCADE,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMIT;
@@ -0,0 +1,26 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS order_summaries (
+    request_id UUID PRIMARY KEY REFERENCES material_requests(id) ON DELETE CASCADE,
+    sender_id TEXT NOT NULL,
+    lifecycle TEXT NOT NULL,
+    sort_at TIMESTAMP NOT NULL,
+    vendor_keys TEXT NOT NULL DEFAULT '',
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    version INTEGER NOT NULL DEFAULT 1,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_summaries_sender_sort
+    ON order_summaries (sender_id, sort_at, request_id);
+
+CREATE INDEX IF NOT EXISTS idx_order_summaries_sender_lifecycle
+    ON order_summaries (sender_id, lifecycle, sort_at, request_id);
+
+CREATE TABLE IF NOT EXISTS order_context_versions (
+    sender_id TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMIT;
@@ -0,0 +1,18 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS order_search_terms (
+    request_id UUID NOT NULL REFERENCES material_requests(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    sender_id TEXT NOT NULL,
+    weight INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (request_id, kind, term)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_search_terms_sender_term
+    ON order_search_terms (sender_id, term);
+
+-- Existing senders are indexed on their next order_summaries refresh; to backfill now,
+-- delete their order_context_versions rows so the next "My Orders" read re-projects them.
+
+COMMIT;
@@ -0,0 +1,14 @@
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS scheduled_timers (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    run_at TIMESTAMPTZ NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduled_timers_run_at
+    ON scheduled_timers (run_at);
+
+COMMIT;
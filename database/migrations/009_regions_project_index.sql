@@ -0,0 +1,6 @@
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_regions_project_id
+    ON regions (project_id);
+
+COMMIT;
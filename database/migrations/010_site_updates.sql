@@ -0,0 +1,26 @@
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS site_updates (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    source_key TEXT NOT NULL,
+    sender_id TEXT NOT NULL,
+    project_id UUID REFERENCES projects(id) ON DELETE CASCADE,
+    task_id UUID REFERENCES tasks(id) ON DELETE SET NULL,
+    message_text TEXT,
+    image_path TEXT,
+    component TEXT,
+    highlight TEXT,
+    risk TEXT,
+    summary TEXT,
+    log_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    notified_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT uq_site_updates_source_key UNIQUE (source_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_site_updates_project_date
+    ON site_updates (project_id, log_date);
+
+COMMIT;
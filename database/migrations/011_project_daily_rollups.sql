@@ -0,0 +1,26 @@
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS project_daily_rollups (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    log_date DATE NOT NULL,
+    update_count INTEGER NOT NULL DEFAULT 0,
+    photo_count INTEGER NOT NULL DEFAULT 0,
+    task_ids JSONB NOT NULL DEFAULT '[]'::jsonb,
+    components JSONB NOT NULL DEFAULT '{}'::jsonb,
+    risks JSONB NOT NULL DEFAULT '[]'::jsonb,
+    worker_count INTEGER NOT NULL DEFAULT 0,
+    worker_roles JSONB NOT NULL DEFAULT '{}'::jsonb,
+    materials JSONB NOT NULL DEFAULT '{}'::jsonb,
+    latest_summary TEXT,
+    digest_sent_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    CONSTRAINT uq_project_daily_rollups_project_date UNIQUE (project_id, log_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_project_daily_rollups_date
+    ON project_daily_rollups (log_date);
+
+COMMIT;
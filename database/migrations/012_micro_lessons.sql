@@ -0,0 +1,16 @@
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+CREATE TABLE IF NOT EXISTS micro_lessons (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    topic_key TEXT NOT NULL,
+    language TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    content TEXT NOT NULL,
+    generated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    refresh_after TIMESTAMPTZ NOT NULL,
+    CONSTRAINT uq_micro_lessons_topic_language UNIQUE (topic_key, language)
+);
+
+COMMIT;
@@ -0,0 +1,13 @@
+BEGIN;
+
+-- learn_alias upserts on (alias_text, master_sku_id); drop duplicates left by the old select-then-insert.
+DELETE FROM sku_alias a
+USING sku_alias b
+WHERE a.alias_text = b.alias_text
+  AND a.master_sku_id = b.master_sku_id
+  AND a.id < b.id;
+
+ALTER TABLE sku_alias
+    ADD CONSTRAINT uq_sku_alias_text_master UNIQUE (alias_text, master_sku_id);
+
+COMMIT;
@@ -0,0 +1,14 @@
+BEGIN;
+
+-- Each persisted timer is leased to one worker; unowned or expired rows are claimed with SKIP LOCKED.
+ALTER TABLE scheduled_timers
+    ADD COLUMN IF NOT EXISTS owner TEXT,
+    ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_scheduled_timers_owner
+    ON scheduled_timers (owner);
+
+-- Media-batch and bulk auto-finalize timers are in-memory now (their state is in-process).
+DELETE FROM scheduled_timers WHERE kind IN ('media_batch', 'bulk_auto_finalize');
+
+COMMIT;
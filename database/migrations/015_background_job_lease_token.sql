@@ -0,0 +1,7 @@
+BEGIN;
+
+-- Written on every claim; a job's outcome is recorded only by the holder of the current token.
+ALTER TABLE background_jobs
+    ADD COLUMN IF NOT EXISTS lease_token TEXT;
+
+COMMIT;
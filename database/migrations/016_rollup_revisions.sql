@@ -0,0 +1,13 @@
+BEGIN;
+
+-- apply_rollup bumps revision; the digest stores the revision it read in digest_revision.
+-- A rollup is pending for the digest while revision > digest_revision.
+ALTER TABLE project_daily_rollups
+    ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS digest_revision INTEGER NOT NULL DEFAULT 0;
+
+UPDATE project_daily_rollups
+   SET revision = 1
+ WHERE digest_sent_at IS NULL OR updated_at > digest_sent_at;
+
+COMMIT;
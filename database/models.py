@@ -104,6 +104,10 @@ class Region(Base):
     meta = Column(JSON)
     flat = relationship("Flat", back_populates="regions")
     project = relationship("Project", backref="regions")
+
+    __table_args__ = (
+        Index("idx_regions_project_id", "project_id"),
+    )
  
 class Task(Base):
     __tablename__ = "tasks"
@@ -206,6 +210,76 @@ class MaterialLog(Base):
     task = relationship("Task", backref="material_logs")
     material = relationship("Material", backref="material_logs")
 
+class SiteUpdate(Base):
+    """One summarised site update (photo and/or text), sitting alongside worker/material logs."""
+    __tablename__ = "site_updates"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_key = Column(String, nullable=False)          # inbound wamid (or job key); one row per update
+    sender_id = Column(String, nullable=False)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    task_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id", ondelete="SET NULL"), nullable=True)
+
+    message_text = Column(Text, nullable=True)
+    image_path = Column(String, nullable=True)
+    component = Column(String, nullable=True)
+    highlight = Column(Text, nullable=True)
+    risk = Column(Text, nullable=True)
+    summary = Column(Text, nullable=True)
+
+    log_date = Column(Date, nullable=False, default=date.today)
+    notified_at = Column(DateTime(timezone=True), nullable=True)   # summary pushed to the sender
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("source_key", name="uq_site_updates_source_key"),
+        Index("idx_site_updates_project_date", "project_id", "log_date"),
+    )
+
+class ProjectDailyRollup(Base):
+    """Per-project, per-day counters kept current as site updates and worker/material logs arrive."""
+    __tablename__ = "project_daily_rollups"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    log_date = Column(Date, nullable=False)
+
+    update_count = Column(Integer, nullable=False, server_default="0")
+    photo_count = Column(Integer, nullable=False, server_default="0")
+    task_ids = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))        # tasks touched
+    components = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))      # component -> updates
+    risks = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))           # distinct, capped
+    worker_count = Column(Integer, nullable=False, server_default="0")
+    worker_roles = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))    # job_role -> count
+    materials = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))       # "name|unit" -> qty used
+    latest_summary = Column(Text, nullable=True)
+
+    revision = Column(Integer, nullable=False, server_default="0")          # bumped by every apply_rollup
+    digest_revision = Column(Integer, nullable=False, server_default="0")   # revision the last digest showed
+    digest_sent_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("project_id", "log_date", name="uq_project_daily_rollups_project_date"),
+        Index("idx_project_daily_rollups_date", "log_date"),
+    )
+
+class MicroLesson(Base):
+    """Generated micro-lesson text, shared by every builder asking about the same topic and language."""
+    __tablename__ = "micro_lessons"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    topic_key = Column(String, nullable=False)       # managers.lesson_library.normalise_topic()
+    language = Column(String, nullable=False)
+    topic = Column(String, nullable=False)           # as first asked, for display/regeneration
+    content = Column(Text, nullable=False)
+    generated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    refresh_after = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("topic_key", "language", name="uq_micro_lessons_topic_language"),
+    )
+
 class RequestStatus(PyEnum):
     DRAFT = "DRAFT"
     REQUESTED = "REQUESTED"
@@ -496,6 +570,147 @@ class VendorFollowupNudge(Base):
     )
 
 
+# -------------------------------------------------------------------------
+# quote_comparisons  (maintained per-request vendor comparison payload)
+# -------------------------------------------------------------------------
+
+class QuoteComparison(Base):
+    __tablename__ = "quote_comparisons"
+
+    quote_request_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("material_requests.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # {"items": {...}, "vendors": {...}, "summary": {...}} — see ProcurementCRUD._summarise_comparison
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# -------------------------------------------------------------------------
+# order_summaries  ("My Orders" read model, one row per material request)
+# -------------------------------------------------------------------------
+
+class OrderSummaryRecord(Base):
+    __tablename__ = "order_summaries"
+
+    request_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("material_requests.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sender_id = Column(String, nullable=False)
+    lifecycle = Column(String, nullable=False)       # draft / active / fulfilled
+    sort_at = Column(DateTime, nullable=False)       # material_requests.updated_at at refresh time
+    vendor_keys = Column(Text, nullable=False, default="")  # lowercased vendor ids + names for lookups
+    # OrderSummary.to_dict() — see managers/order_context.py
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    version = Column(Integer, nullable=False, default=1)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_order_summaries_sender_sort", "sender_id", "sort_at", "request_id"),
+        Index("idx_order_summaries_sender_lifecycle", "sender_id", "lifecycle", "sort_at", "request_id"),
+    )
+
+
+class OrderContextVersion(Base):
+    __tablename__ = "order_context_versions"
+
+    # Bumped whenever any of the sender's order summaries change; cache key for OrderContextService.
+    sender_id = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+
+class OrderSearchTerm(Base):
+    __tablename__ = "order_search_terms"
+
+    # Postings for conversational order lookups ("where is my steel from Sri Balaji");
+    # rewritten with the request's order_summaries row.
+    request_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("material_requests.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    kind = Column(String, primary_key=True)   # id / vendor / category / material / status / date
+    term = Column(String, primary_key=True)
+    sender_id = Column(String, nullable=False)
+    weight = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        Index("idx_order_search_terms_sender_term", "sender_id", "term"),
+    )
+
+# -------------------------------------------------------------------------
+# scheduled_timers  (persisted timers of app/scheduler.py)
+# -------------------------------------------------------------------------
+
+class ScheduledTimer(Base):
+    __tablename__ = "scheduled_timers"
+
+    key = Column(String, primary_key=True)     # e.g. "media_batch:<sender_id>"
+    kind = Column(String, nullable=False)      # handler registered with scheduler.register()
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    owner = Column(String, nullable=True)      # TimerScheduler.worker_id holding the lease
+    lease_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("idx_scheduled_timers_run_at", "run_at"),
+        Index("idx_scheduled_timers_owner", "owner"),
+    )
+
+# -------------------------------------------------------------------------
+# background_jobs  (Postgres-backed queue drained by jobs.runner)
+# -------------------------------------------------------------------------
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False)                # handler registered with job_runner.register()
+    idempotency_key = Column(String, nullable=False)     # e.g. "quote_fanout:<request_id>"; enqueue is a no-op on repeat
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    status = Column(String, nullable=False, server_default="queued")  # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False, server_default="5")
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_until = Column(DateTime(timezone=True), nullable=True)    # lease; expired running jobs are reclaimed
+    lease_token = Column(String, nullable=True)                      # set per claim; only its holder may finish the job
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("idempotency_key", name="uq_background_jobs_idempotency_key"),
+        Index("idx_background_jobs_due", "status", "run_after"),
+    )
+
+# -------------------------------------------------------------------------
+# status_events  (append-only log of procurement status transitions)
+# -------------------------------------------------------------------------
+
+class StatusEvent(Base):
+    __tablename__ = "status_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # material_request | material_request_item | vendor_quote_item | quote_request_vendor
+    entity_type = Column(String, nullable=False)
+    request_id = Column(UUID(as_uuid=True), ForeignKey("material_requests.id", ondelete="CASCADE"), nullable=False)
+    item_id = Column(UUID(as_uuid=True), nullable=True)      # request item / vendor quote line
+    vendor_id = Column(UUID(as_uuid=True), nullable=True)
+    status = Column(String, nullable=False)
+    occurred_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_status_events_request", "request_id", "occurred_at"),
+        Index("idx_status_events_entity_status", "entity_type", "status", "occurred_at"),
+    )
+
+
 # -------------------------------------------------------------------------
 # sku_master  (canonical product list)
 # -------------------------------------------------------------------------
@@ -673,4 +888,5 @@ class SkuAlias(Base):
     __table_args__ = (
         Index("idx_sku_alias_master", "master_sku_id"),
         Index("idx_sku_alias_text", "alias_text"),
+        UniqueConstraint("alias_text", "master_sku_id", name="uq_sku_alias_text_master"),
     )
@@ -7,31 +7,66 @@ from typing import Any, Dict, List, Optional, Set
 from uuid import UUID, UUID as _UUID, uuid4
 
 from pydantic import BaseModel
-from sqlalchemy import delete, func, literal, or_, update, cast
-from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB
+from sqlalchemy import DateTime, delete, func, insert, literal, literal_column, null, or_, update, cast
+from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB, UUID as PG_UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload
 
 from database.models import (
     MaterialRequest,
     MaterialRequestItem,
     Project,
     QuoteRequestVendor,
+    QuoteComparison,
     QuoteRequestVendorStatus,
     QuoteResponse,
     QuoteStatus,
     RequestStatus,
     SkuMaster,
     SkuVendorPrice,
+    StatusEvent,
     Vendor,
     VendorQuoteItem as VendorQuoteItemDB,
     VendorFollowupNudge,
 )
 from database.sku_crud import SkuCRUD
+from managers.order_context import OrderContextService
 from managers.vendor_followup import compute_next_due
 
+# Background stage for SKU matching of vendor quotes: bounded concurrency, tasks held
+# here so they aren't garbage-collected before they finish.
+SKU_MATCH_CONCURRENCY = 4
+_sku_match_tasks: Set[asyncio.Task] = set()
+_sku_match_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def _run_sku_matching(request_id: _UUID, vendor_id: _UUID, items: List[Any]) -> None:
+    global _sku_match_semaphore
+    from app.db import get_sessionmaker
+
+    if _sku_match_semaphore is None:
+        _sku_match_semaphore = asyncio.Semaphore(SKU_MATCH_CONCURRENCY)
+    async with _sku_match_semaphore:
+        try:
+            async with get_sessionmaker()() as session:
+                crud = ProcurementCRUD(session)
+                failed = await crud._match_quote_skus(request_id, vendor_id, items)
+                await session.commit()
+            print(
+                f"procurement_crud ::::: sku matching ::::: request={request_id} vendor={vendor_id} "
+                f"lines={len(items)} failed={failed}"
+            )
+        except Exception as e:
+            print(f"procurement_crud ::::: sku matching ::::: request={request_id} vendor={vendor_id} exception : {e}")
+
+
+def queue_sku_matching(request_id: _UUID, vendor_id: _UUID, items: List[Any]) -> None:
+    task = asyncio.create_task(_run_sku_matching(request_id, vendor_id, list(items)))
+    _sku_match_tasks.add(task)
+    task.add_done_callback(_sku_match_tasks.discard)
+
+
 class ProcurementCRUD:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -131,6 +166,66 @@ class ProcurementCRUD:
                 return default
         return default
 
+    async def _transition_status(
+        self,
+        model,
+        conditions: List[Any],
+        status: Any,
+        *,
+        entity_type: str,
+        request_col,
+        item_col=None,
+        vendor_col=None,
+        when: Optional[datetime] = None,
+        extra_values: Optional[Dict[str, Any]] = None,
+        set_status: bool = True,
+    ) -> None:
+        """
+        Set-based status transition in ONE statement:
+          WITH upd AS (UPDATE <model> SET status, status_history = merge_status_history(...) WHERE ... RETURNING ...)
+          INSERT INTO status_events (...) SELECT ... FROM upd
+        Concurrent writers cannot lose each other's history keys because the merge happens in SQL.
+        With set_status=False only the history/event is recorded (e.g. a failed notification attempt).
+        """
+        key = status.value if isinstance(status, PyEnum) else str(status)
+        occurred_at = (when or datetime.utcnow()).replace(tzinfo=timezone.utc)
+        patch = {key: self._now_iso(when)}
+
+        values: Dict[str, Any] = {
+            "status_history": func.merge_status_history(model.status_history, literal(patch, JSONB)),
+        }
+        if set_status:
+            values["status"] = status
+        if extra_values:
+            values.update(extra_values)
+
+        returning = [request_col.label("request_id")]
+        returning.append((item_col if item_col is not None else cast(null(), PG_UUID(as_uuid=True))).label("item_id"))
+        returning.append((vendor_col if vendor_col is not None else cast(null(), PG_UUID(as_uuid=True))).label("vendor_id"))
+        updated = (
+            update(model)
+            .where(*conditions)
+            .values(**values)
+            .returning(*returning)
+            .cte(f"{entity_type}_transition")
+        )
+        stmt = (
+            insert(StatusEvent)
+            .from_select(
+                ["entity_type", "request_id", "item_id", "vendor_id", "status", "occurred_at"],
+                select(
+                    literal(entity_type),
+                    updated.c.request_id,
+                    updated.c.item_id,
+                    updated.c.vendor_id,
+                    literal(key),
+                    literal(occurred_at, DateTime(timezone=True)),
+                ),
+            )
+            .add_cte(updated)
+        )
+        await self.session.execute(stmt)
+
     async def _set_request_status(
         self,
         request_id: _UUID,
@@ -139,16 +234,14 @@ class ProcurementCRUD:
         extra_values: Optional[Dict[str, Any]] = None,
         when: Optional[datetime] = None,
     ) -> None:
-        result = await self.session.execute(
-            select(MaterialRequest.status_history).where(MaterialRequest.id == request_id)
-        )
-        history = result.scalar_one_or_none() or {}
-        merged = self._merge_status_history(history, status, when=when)
-        values = {"status_history": merged, "status": status}
-        if extra_values:
-            values.update(extra_values)
-        await self.session.execute(
-            update(MaterialRequest).where(MaterialRequest.id == request_id).values(**values)
+        await self._transition_status(
+            MaterialRequest,
+            [MaterialRequest.id == request_id],
+            status,
+            entity_type="material_request",
+            request_col=MaterialRequest.id,
+            when=when,
+            extra_values=extra_values,
         )
 
     async def _set_request_items_status(
@@ -158,18 +251,15 @@ class ProcurementCRUD:
         *,
         when: Optional[datetime] = None,
     ) -> None:
-        result = await self.session.execute(
-            select(MaterialRequestItem.id, MaterialRequestItem.status_history)
-            .where(MaterialRequestItem.material_request_id == request_id)
+        await self._transition_status(
+            MaterialRequestItem,
+            [MaterialRequestItem.material_request_id == request_id],
+            status,
+            entity_type="material_request_item",
+            request_col=MaterialRequestItem.material_request_id,
+            item_col=MaterialRequestItem.id,
+            when=when,
         )
-        rows = result.all()
-        for item_id, history in rows:
-            merged = self._merge_status_history(history or {}, status, when=when)
-            await self.session.execute(
-                update(MaterialRequestItem)
-                .where(MaterialRequestItem.id == item_id)
-                .values(status_history=merged, status=status)
-            )
 
     async def _set_quote_request_vendor_status(
         self,
@@ -178,29 +268,34 @@ class ProcurementCRUD:
         status: QuoteRequestVendorStatus,
         *,
         when: Optional[datetime] = None,
+        exclude_vendor: Optional[_UUID] = None,
     ) -> None:
-        result = await self.session.execute(
-            select(QuoteRequestVendor.status_history)
-            .where(
-                QuoteRequestVendor.quote_request_id == request_id,
-                QuoteRequestVendor.vendor_id == vendor_id,
-            )
-        )
-        history = result.scalar_one_or_none() or {}
-        merged = self._merge_status_history(history, status, when=when)
-        await self.session.execute(
-            update(QuoteRequestVendor)
-            .where(
-                QuoteRequestVendor.quote_request_id == request_id,
-                QuoteRequestVendor.vendor_id == vendor_id,
-            )
-            .values(status_history=merged, status=status)
+        if exclude_vendor is not None:
+            vendor_cond = QuoteRequestVendor.vendor_id != exclude_vendor
+        else:
+            vendor_cond = QuoteRequestVendor.vendor_id == vendor_id
+        await self._transition_status(
+            QuoteRequestVendor,
+            [QuoteRequestVendor.quote_request_id == request_id, vendor_cond],
+            status,
+            entity_type="quote_request_vendor",
+            request_col=QuoteRequestVendor.quote_request_id,
+            vendor_col=QuoteRequestVendor.vendor_id,
+            when=when,
         )
         if status not in (
             QuoteRequestVendorStatus.INVITED,
             QuoteRequestVendorStatus.NOTIFIED,
         ):
-            await self._clear_vendor_followup(request_id, vendor_id)
+            if exclude_vendor is not None:
+                await self.session.execute(
+                    delete(VendorFollowupNudge).where(
+                        VendorFollowupNudge.quote_request_id == request_id,
+                        VendorFollowupNudge.vendor_id != exclude_vendor,
+                    )
+                )
+            else:
+                await self._clear_vendor_followup(request_id, vendor_id)
 
     async def _set_vendor_quote_item_status(
         self,
@@ -211,23 +306,47 @@ class ProcurementCRUD:
         when: Optional[datetime] = None,
         exclude_vendor: Optional[_UUID] = None,
     ) -> None:
-        stmt = select(
-            VendorQuoteItemDB.id,
-            VendorQuoteItemDB.status_history,
-        ).where(VendorQuoteItemDB.quote_request_id == request_id)
         if exclude_vendor is not None:
-            stmt = stmt.where(VendorQuoteItemDB.vendor_id != exclude_vendor)
+            vendor_cond = VendorQuoteItemDB.vendor_id != exclude_vendor
         else:
-            stmt = stmt.where(VendorQuoteItemDB.vendor_id == vendor_id)
+            vendor_cond = VendorQuoteItemDB.vendor_id == vendor_id
+        await self._transition_status(
+            VendorQuoteItemDB,
+            [VendorQuoteItemDB.quote_request_id == request_id, vendor_cond],
+            status,
+            entity_type="vendor_quote_item",
+            request_col=VendorQuoteItemDB.quote_request_id,
+            item_col=VendorQuoteItemDB.request_item_id,
+            vendor_col=VendorQuoteItemDB.vendor_id,
+            when=when,
+        )
 
-        rows = (await self.session.execute(stmt)).all()
-        for quote_id, history in rows:
-            merged = self._merge_status_history(history or {}, status, when=when)
+    async def get_status_timeline(self, request_id: _UUID) -> List[Dict[str, Any]]:
+        """Ordered status events for a request (request, items, vendor invites, quote lines)."""
+        req_uuid = _UUID(str(request_id))
+        rows = (
             await self.session.execute(
-                update(VendorQuoteItemDB)
-                .where(VendorQuoteItemDB.id == quote_id)
-                .values(status_history=merged, status=status)
+                select(
+                    StatusEvent.entity_type,
+                    StatusEvent.item_id,
+                    StatusEvent.vendor_id,
+                    StatusEvent.status,
+                    StatusEvent.occurred_at,
+                )
+                .where(StatusEvent.request_id == req_uuid)
+                .order_by(StatusEvent.occurred_at, StatusEvent.id)
             )
+        ).all()
+        return [
+            {
+                "entity_type": entity_type,
+                "item_id": str(item_id) if item_id else None,
+                "vendor_id": str(vendor_id) if vendor_id else None,
+                "status": status,
+                "occurred_at": occurred_at.isoformat() if occurred_at else None,
+            }
+            for entity_type, item_id, vendor_id, status, occurred_at in rows
+        ]
 
     async def save_procurement_request(
         self,
@@ -280,6 +399,7 @@ class ProcurementCRUD:
 
             self.session.add(request)
             print("procurement_crud.py :::: save_procurement_request :::: session added request")
+            await self._refresh_order_context(_UUID(str(request_id)))
             await self.session.commit()
             print("procurement_crud :::: [CRUD] Procurement request saved to DB.")
             return
@@ -322,6 +442,7 @@ class ProcurementCRUD:
                     user_editable=user_editable
                 )
             )
+            await self._refresh_order_context(_UUID(str(request_id)))
             await self.session.commit()
         except SQLAlchemyError as e:
             await self.session.rollback()
@@ -377,6 +498,8 @@ class ProcurementCRUD:
                     )
                     self.session.add(new_item)
 
+            await self._invalidate_comparison(_UUID(str(request_id)))
+            await self._refresh_order_context(_UUID(str(request_id)))
             await self.session.commit()
 
         except SQLAlchemyError as e:
@@ -514,6 +637,8 @@ class ProcurementCRUD:
             else:
                 inserted = 0
                 updated = 0
+            await self._invalidate_comparison(req_uuid)
+            await self._refresh_order_context(req_uuid)
             print(f"procurement_crud ::::: sync_material_request_items_by_ids ::::: commiting session")
             await self.session.commit()
             print(f"procurement_crud ::::: sync_material_request_items_by_ids ::::: inserted : {inserted}, updated : {updated}, deleted : {deleted}")
@@ -552,6 +677,7 @@ class ProcurementCRUD:
             print(f"procurement_crud ::::: add_quote_request_vendors ::::: inserting vendors : {values}")
             await self.session.execute(stmt)
             await self._schedule_vendor_followups(req_uuid, unique_ids, invited_at)
+            await self._refresh_order_context(req_uuid)
             await self.session.commit()
             print(f"procurement_crud ::::: add_quote_request_vendors ::::: inserted count : {len(values)}")
         except Exception as e:
@@ -559,6 +685,61 @@ class ProcurementCRUD:
             print("procurement_crud ::::: add_quote_request_vendors ::::: exception :", e)
             raise
 
+    async def record_vendor_notifications(
+        self,
+        request_id: _UUID,
+        notified_vendor_ids: List[_UUID],
+        failed_vendor_ids: Optional[List[_UUID]] = None,
+    ) -> None:
+        """
+        Record a quote-request fan-out in bulk: one set-based transition moves every reached
+        vendor INVITED -> NOTIFIED, and one more logs NOTIFY_FAILED (history/event only) for the
+        rest, which stay INVITED so follow-up nudges still cover them.
+        """
+        try:
+            req_uuid = _UUID(str(request_id))
+            now = datetime.utcnow()
+            notified = {_UUID(str(v)) for v in notified_vendor_ids or []}
+            failed = {_UUID(str(v)) for v in failed_vendor_ids or []} - notified
+            if notified:
+                await self._transition_status(
+                    QuoteRequestVendor,
+                    [
+                        QuoteRequestVendor.quote_request_id == req_uuid,
+                        QuoteRequestVendor.vendor_id.in_(notified),
+                        QuoteRequestVendor.status == QuoteRequestVendorStatus.INVITED,
+                    ],
+                    QuoteRequestVendorStatus.NOTIFIED,
+                    entity_type="quote_request_vendor",
+                    request_col=QuoteRequestVendor.quote_request_id,
+                    vendor_col=QuoteRequestVendor.vendor_id,
+                    when=now,
+                )
+            if failed:
+                await self._transition_status(
+                    QuoteRequestVendor,
+                    [
+                        QuoteRequestVendor.quote_request_id == req_uuid,
+                        QuoteRequestVendor.vendor_id.in_(failed),
+                    ],
+                    "NOTIFY_FAILED",
+                    entity_type="quote_request_vendor",
+                    request_col=QuoteRequestVendor.quote_request_id,
+                    vendor_col=QuoteRequestVendor.vendor_id,
+                    when=now,
+                    set_status=False,
+                )
+            if notified or failed:
+                await self._refresh_order_context(req_uuid)
+                await self.session.commit()
+            print(
+                f"procurement_crud ::::: record_vendor_notifications ::::: notified : {len(notified)}, failed : {len(failed)}"
+            )
+        except Exception as e:
+            await self.session.rollback()
+            print("procurement_crud ::::: record_vendor_notifications ::::: exception :", e)
+            raise
+
     async def get_vendor_by_id(self, vendor_id: _UUID) -> Optional[Vendor]:
         try:
             if not vendor_id:
@@ -638,10 +819,16 @@ class ProcurementCRUD:
         request_id: _UUID,
         vendor_id: _UUID,
         items: List[VendorQuoteItemPayload],
+        *,
+        defer_sku_matching: bool = True,
     ) -> bool:
         """
-        Upsert each vendor quote line by (quote_request_id, vendor_id, request_item_id).
-        Sets created_at on insert and updated_at on both insert/update.
+        Upsert the whole vendor quote as ONE multi-row INSERT ... ON CONFLICT
+        (quote_request_id, vendor_id, request_item_id) DO UPDATE, returning (xmax = 0)
+        per line to tell inserts from updates. Sets created_at on insert and updated_at on both.
+        SKU matching runs after commit on the background stage unless defer_sku_matching=False.
+        Returns True when the vendor already had quote lines for this request (i.e. this is a
+        revised quote), whichever items the new payload covers.
         """
         print(
             "procurement_crud ::::: insert_vendor_quotes ::::: started for request_id :",
@@ -651,133 +838,388 @@ class ProcurementCRUD:
         )
 
         now = datetime.utcnow()
-        skuCRUD = SkuCRUD(self.session)
-        sku_queue: List[VendorQuoteItemPayload] = []
-
         req_uuid = _UUID(str(request_id))
         ven_uuid = _UUID(str(vendor_id))
+        new_history = self._merge_status_history({}, QuoteStatus.QUOTED, when=now)
 
-        existing_stmt = (
-            select(func.count())
-            .select_from(VendorQuoteItemDB)
-            .where(
-                VendorQuoteItemDB.quote_request_id == req_uuid,
-                VendorQuoteItemDB.vendor_id == ven_uuid,
-            )
-        )
-        existing_count = (await self.session.execute(existing_stmt)).scalar() or 0
-        had_existing = existing_count > 0
-
+        # Last line wins if the same request item is quoted twice in one payload;
+        # Postgres rejects a multi-row upsert that touches the same row twice.
+        lines: Dict[_UUID, VendorQuoteItemPayload] = {}
         for item in items:
-            try:
-                price_unit = item.price_units or "unit"
-
-                new_history = self._merge_status_history({}, QuoteStatus.QUOTED, when=now)
-                stmt = (
-                    pg_insert(VendorQuoteItemDB)
-                    .values(
-                        quote_request_id=req_uuid,
-                        vendor_id=ven_uuid,
-                        request_item_id=item.requested_item_id,
-                        quoted_price=item.quoted_price,
-                        price_unit=price_unit,
-                        delivery_days=item.delivery_days,
-                        comments=item.comments,
-                        status_history=new_history,
-                        status=QuoteStatus.QUOTED,
-                        created_at=now,
-                        updated_at=now,
-                    )
-                    .on_conflict_do_update(
-                        constraint="uq_vendor_quote_unique_line",
-                        set_={
-                            "quoted_price": item.quoted_price,
-                            "price_unit": price_unit,
-                            "delivery_days": item.delivery_days,
-                            "comments": item.comments,
-                            "status_history": func.merge_status_history(
-                                VendorQuoteItemDB.status_history,
-                                cast(literal(new_history), JSONB),
-                            ),
-                            "status": QuoteStatus.QUOTED,
-                            "updated_at": now,
-                        },
+            lines[_UUID(str(item.requested_item_id))] = item
+        rows = [
+            {
+                "quote_request_id": req_uuid,
+                "vendor_id": ven_uuid,
+                "request_item_id": item_id,
+                "quoted_price": item.quoted_price,
+                "price_unit": item.price_units or "unit",
+                "delivery_days": item.delivery_days,
+                "comments": item.comments,
+                "status_history": new_history,
+                "status": QuoteStatus.QUOTED,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for item_id, item in lines.items()
+        ]
+
+        try:
+            # Checked before the upsert, in the same transaction: a re-quote with a different
+            # item set touches no existing line but is still an update.
+            had_existing = (
+                await self.session.execute(
+                    select(VendorQuoteItemDB.id)
+                    .where(
+                        VendorQuoteItemDB.quote_request_id == req_uuid,
+                        VendorQuoteItemDB.vendor_id == ven_uuid,
                     )
+                    .limit(1)
+                )
+            ).first() is not None
+            if rows:
+                stmt = pg_insert(VendorQuoteItemDB).values(rows)
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_vendor_quote_unique_line",
+                    set_={
+                        "quoted_price": excluded.quoted_price,
+                        "price_unit": excluded.price_unit,
+                        "delivery_days": excluded.delivery_days,
+                        "comments": excluded.comments,
+                        "status_history": func.merge_status_history(
+                            VendorQuoteItemDB.status_history,
+                            excluded.status_history,
+                        ),
+                        "status": excluded.status,
+                        "updated_at": excluded.updated_at,
+                    },
+                ).returning(literal_column("(xmax = 0)").label("inserted"))
+                inserted_flags = (await self.session.execute(stmt)).scalars().all()
+                print(
+                    f"procurement_crud ::::: insert_vendor_quotes ::::: upserted {len(inserted_flags)} lines, "
+                    f"updated {sum(1 for f in inserted_flags if not f)}"
                 )
 
-                print(f"procurement_crud ::::: insert_vendor_quotes ::::: executing stmt : {stmt}")
-                await self.session.execute(stmt)
-                print(f"procurement_crud ::::: insert_vendor_quotes ::::: upsert OK for item_name={item.requested_item_id}")
-
-                sku_queue.append(item)
+            await self._set_quote_request_vendor_status(
+                req_uuid,
+                ven_uuid,
+                QuoteRequestVendorStatus.RESPONDED,
+                when=now,
+            )
+            await self._refresh_vendor_comparison(req_uuid, ven_uuid)
+            await self._refresh_order_context(req_uuid)
+            if not defer_sku_matching:
+                await self._match_quote_skus(req_uuid, ven_uuid, list(lines.values()))
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            print(f"procurement_crud ::::: insert_vendor_quotes ::::: exception : {e}")
+            raise
 
-            except Exception as e:
-                await self.session.rollback()
-                print(f"procurement_crud ::::: insert_vendor_quotes ::::: exception for item_id={item.requested_item_id} : {e}")
-                raise
+        if defer_sku_matching and lines:
+            queue_sku_matching(req_uuid, ven_uuid, list(lines.values()))
+        return had_existing
 
-        for pending_item in sku_queue:
+    async def _match_quote_skus(
+        self,
+        request_id: _UUID,
+        vendor_id: _UUID,
+        items: List[VendorQuoteItemPayload],
+    ) -> int:
+        """Run SKU matching per quoted line, each in its own savepoint so one bad line
+        doesn't discard the others. Returns the number of lines that failed."""
+        sku_crud = SkuCRUD(self.session)
+        failed = 0
+        for pending_item in items:
             try:
-                await skuCRUD.process_vendor_quote_item(str(req_uuid), str(ven_uuid), pending_item)
+                async with self.session.begin_nested():
+                    await sku_crud.process_vendor_quote_item(str(request_id), str(vendor_id), pending_item)
             except Exception as err:
-                await self.session.rollback()
+                failed += 1
                 print(
-                    "procurement_crud ::::: insert_vendor_quotes ::::: sku processing failed for item_id="
+                    "procurement_crud ::::: _match_quote_skus ::::: sku processing failed for item_id="
                     f"{getattr(pending_item, 'requested_item_id', None)} : {err}"
                 )
-                raise
+        return failed
+
+    # ------------------------------------------------------------------
+    # Quote comparison payload (quote_comparisons)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _item_entry(row: MaterialRequestItem) -> Dict[str, Any]:
+        return {
+            "material_name": row.material_name,
+            "sub_type": row.sub_type,
+            "dimensions": row.dimensions,
+            "dimension_units": row.dimension_units,
+            "quantity": row.quantity,
+            "quantity_units": row.quantity_units,
+        }
 
-        await self._set_quote_request_vendor_status(
-            req_uuid,
-            ven_uuid,
-            QuoteRequestVendorStatus.RESPONDED,
-            when=now,
+    @staticmethod
+    def _line_entry(quote: VendorQuoteItemDB) -> Dict[str, Any]:
+        return {
+            "quoted_price": quote.quoted_price,
+            "price_unit": quote.price_unit,
+            "delivery_days": quote.delivery_days,
+            "comments": quote.comments,
+            "status": quote.status.value if isinstance(quote.status, PyEnum) else quote.status,
+            "created_at": quote.created_at.isoformat() if quote.created_at else None,
+            "updated_at": quote.updated_at.isoformat() if quote.updated_at else None,
+        }
+
+    @staticmethod
+    def _summarise_comparison(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Recompute per-item best prices and per-vendor totals/coverage/delivery from the payload
+        in memory (O(vendors x items), no DB access)."""
+        items: Dict[str, Dict[str, Any]] = payload.setdefault("items", {})
+        vendors: Dict[str, Dict[str, Any]] = payload.setdefault("vendors", {})
+        item_count = len(items)
+
+        for item in items.values():
+            item.update({"best_price": None, "best_vendor_id": None, "quote_count": 0})
+
+        for vendor_id, vendor in vendors.items():
+            total = 0.0
+            delivery_days = None
+            lines = vendor.get("lines", {})
+            for item_id, line in lines.items():
+                item = items.get(item_id)
+                price = float(line.get("quoted_price") or 0)
+                total += float((item or {}).get("quantity") or 0) * price
+                if line.get("delivery_days") is not None:
+                    delivery_days = max(delivery_days or 0, line["delivery_days"])
+                if item is None:
+                    continue
+                item["quote_count"] += 1
+                if item["best_price"] is None or price < item["best_price"]:
+                    item["best_price"] = price
+                    item["best_vendor_id"] = vendor_id
+            vendor["total"] = round(total, 2)
+            vendor["items_quoted"] = len(lines)
+            vendor["coverage"] = round(len(lines) / item_count, 4) if item_count else 0.0
+            vendor["delivery_days"] = delivery_days
+
+        ranked = sorted(
+            vendors.items(),
+            key=lambda kv: (-kv[1]["coverage"], kv[1]["total"]),
         )
-        await self.session.commit()
-        return had_existing
-    
-    async def fetch_vendor_quotes_for_request(self, request_id: _UUID):
-        """
-        Return quotes grouped by vendor for a given request_id.
-        Includes material details via join to MaterialRequestItem.
+        payload["summary"] = {
+            "item_count": item_count,
+            "vendor_count": len(vendors),
+            "cheapest_vendor_id": ranked[0][0] if ranked else None,
+            "fastest_vendor_id": min(
+                (vid for vid, v in vendors.items() if v.get("delivery_days") is not None),
+                key=lambda vid: vendors[vid]["delivery_days"],
+                default=None,
+            ),
+        }
+        return payload
+
+    async def _load_comparison_for_update(self, req_uuid: _UUID) -> Optional[Dict[str, Any]]:
+        row = (
+            await self.session.execute(
+                select(QuoteComparison.payload)
+                .where(QuoteComparison.quote_request_id == req_uuid)
+                .with_for_update()
+            )
+        ).scalar_one_or_none()
+        return dict(row) if row is not None else None
+
+    async def _store_comparison(self, req_uuid: _UUID, payload: Dict[str, Any]) -> None:
+        stmt = pg_insert(QuoteComparison).values(
+            quote_request_id=req_uuid,
+            payload=payload,
+            version=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QuoteComparison.quote_request_id],
+            set_={
+                "payload": stmt.excluded.payload,
+                "version": QuoteComparison.version + 1,
+                "updated_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+
+    async def _build_comparison(self, req_uuid: _UUID) -> Dict[str, Any]:
+        """Full rebuild from source tables; used when no payload exists yet.
+        Locks the material request row so two first builds (e.g. two vendors quoting at once)
+        run one after the other and the second sees the first's quotes instead of overwriting them.
         """
-        result = await self.session.execute(
-            select(VendorQuoteItemDB)
-            .filter(VendorQuoteItemDB.quote_request_id == request_id)
-            .options(
-                joinedload(VendorQuoteItemDB.vendor),
-                joinedload(VendorQuoteItemDB.request_item),
+        approved = (
+            await self.session.execute(
+                select(MaterialRequest.approved_vendor)
+                .where(MaterialRequest.id == req_uuid)
+                .with_for_update()
+            )
+        ).scalar_one_or_none()
+        item_rows = (
+            await self.session.execute(
+                select(MaterialRequestItem).where(MaterialRequestItem.material_request_id == req_uuid)
+            )
+        ).scalars().all()
+        payload: Dict[str, Any] = {
+            "items": {str(row.id): self._item_entry(row) for row in item_rows},
+            "vendors": {},
+        }
+        quote_rows = (
+            await self.session.execute(
+                select(VendorQuoteItemDB, Vendor.name)
+                .outerjoin(Vendor, Vendor.vendor_id == VendorQuoteItemDB.vendor_id)
+                .where(VendorQuoteItemDB.quote_request_id == req_uuid)
+            )
+        ).all()
+        vendor_statuses = {
+            str(vendor_id): status
+            for vendor_id, status in (
+                await self.session.execute(
+                    select(QuoteRequestVendor.vendor_id, QuoteRequestVendor.status)
+                    .where(QuoteRequestVendor.quote_request_id == req_uuid)
+                )
+            ).all()
+        }
+        for quote, vendor_name in quote_rows:
+            status = vendor_statuses.get(str(quote.vendor_id))
+            vendor = payload["vendors"].setdefault(
+                str(quote.vendor_id),
+                {
+                    "vendor_name": vendor_name or "Unknown",
+                    "status": status.value if isinstance(status, PyEnum) else status,
+                    "lines": {},
+                },
+            )
+            vendor["lines"][str(quote.request_item_id)] = self._line_entry(quote)
+        payload["approved_vendor_id"] = str(approved) if approved else None
+        return self._summarise_comparison(payload)
+
+    async def _refresh_vendor_comparison(self, req_uuid: _UUID, ven_uuid: _UUID) -> None:
+        """Incremental update after a vendor (re)quotes: reload only that vendor's lines."""
+        payload = await self._load_comparison_for_update(req_uuid)
+        if payload is None:
+            await self._store_comparison(req_uuid, await self._build_comparison(req_uuid))
+            return
+
+        quote_rows = (
+            await self.session.execute(
+                select(VendorQuoteItemDB, Vendor.name)
+                .outerjoin(Vendor, Vendor.vendor_id == VendorQuoteItemDB.vendor_id)
+                .where(
+                    VendorQuoteItemDB.quote_request_id == req_uuid,
+                    VendorQuoteItemDB.vendor_id == ven_uuid,
+                )
             )
+        ).all()
+        vendor_name = quote_rows[0][1] if quote_rows else None
+        previous = payload.setdefault("vendors", {}).get(str(ven_uuid), {})
+        payload["vendors"][str(ven_uuid)] = {
+            "vendor_name": vendor_name or previous.get("vendor_name") or "Unknown",
+            "status": QuoteRequestVendorStatus.RESPONDED.value,
+            "lines": {str(q.request_item_id): self._line_entry(q) for q, _ in quote_rows},
+        }
+
+        items = payload.setdefault("items", {})
+        missing = [q.request_item_id for q, _ in quote_rows if str(q.request_item_id) not in items]
+        if missing:
+            for row in (
+                await self.session.execute(select(MaterialRequestItem).where(MaterialRequestItem.id.in_(missing)))
+            ).scalars().all():
+                items[str(row.id)] = self._item_entry(row)
+
+        await self._store_comparison(req_uuid, self._summarise_comparison(payload))
+
+    async def _invalidate_comparison(self, req_uuid: _UUID) -> None:
+        """Item edits change quantities/specs; drop the payload so the next read rebuilds it."""
+        await self.session.execute(
+            delete(QuoteComparison).where(QuoteComparison.quote_request_id == req_uuid)
         )
-        quotes = result.scalars().all()
 
-        response = {}
-        for quote in quotes:
-            quote_vendor_id = str(quote.vendor_id)
-            if quote_vendor_id not in response:
-                response[quote_vendor_id] = {
-                    "vendor_name": quote.vendor.name if isinstance(quote.vendor, Vendor) else "Unknown",
-                    "quotes": [],
-                }
+    async def _refresh_order_context(self, req_uuid: _UUID) -> None:
+        """Keep the sender's "My Orders" summary in step; runs inside the caller's transaction."""
+        await OrderContextService(self.session).refresh_orders([req_uuid])
 
-            material_request_item: MaterialRequestItem = quote.request_item
-            response[quote_vendor_id]["quotes"].append(
-                {
-                    "request_item_id": str(quote.request_item_id),
-                    "material_name": getattr(material_request_item, "material_name", None),
-                    "sub_type": getattr(material_request_item, "sub_type", None),
-                    "dimensions": getattr(material_request_item, "dimensions", None),
-                    "dimension_units": getattr(material_request_item, "dimension_units", None),
-                    "quantity": getattr(material_request_item, "quantity", None),
-                    "quantity_units": getattr(material_request_item, "quantity_units", None),
-                    "quoted_price": quote.quoted_price,
-                    "price_unit": quote.price_unit,
-                    "delivery_days": quote.delivery_days,
-                    "comments": quote.comments,
-                    "created_at": quote.created_at.isoformat() if quote.created_at else None,
-                    "updated_at": quote.updated_at.isoformat() if quote.updated_at else None,
-                }
+    async def _set_comparison_decision(
+        self,
+        req_uuid: _UUID,
+        ven_uuid: _UUID,
+        vendor_status: QuoteRequestVendorStatus,
+        *,
+        others_status: Optional[QuoteRequestVendorStatus] = None,
+        approved_vendor_id: Optional[_UUID] = None,
+    ) -> None:
+        payload = await self._load_comparison_for_update(req_uuid)
+        if payload is None:
+            payload = await self._build_comparison(req_uuid)
+        def _line_status(status: QuoteRequestVendorStatus) -> str:
+            return (QuoteStatus.APPROVED if status == QuoteRequestVendorStatus.APPROVED else QuoteStatus.REJECTED).value
+
+        for vendor_id, vendor in payload.get("vendors", {}).items():
+            if vendor_id == str(ven_uuid):
+                status = vendor_status
+            elif others_status is not None:
+                status = others_status
+            else:
+                continue
+            vendor["status"] = status.value
+            for line in vendor.get("lines", {}).values():
+                line["status"] = _line_status(status)
+        # Declines leave an existing approval in place.
+        if approved_vendor_id is not None:
+            payload["approved_vendor_id"] = str(approved_vendor_id)
+        await self._store_comparison(req_uuid, payload)
+
+    async def get_quote_comparison(self, request_id: _UUID) -> Dict[str, Any]:
+        """Compact comparison payload for the quote summary page; one PK lookup when maintained."""
+        req_uuid = _UUID(str(request_id))
+        payload = (
+            await self.session.execute(
+                select(QuoteComparison.payload).where(QuoteComparison.quote_request_id == req_uuid)
             )
+        ).scalar_one_or_none()
+        if payload is None:
+            payload = await self._build_comparison(req_uuid)
+            await self._store_comparison(req_uuid, payload)
+            await self.session.commit()
+        return payload
+
+    async def fetch_vendor_quotes_for_request(self, request_id: _UUID):
+        """
+        Return quotes grouped by vendor for a given request_id.
+        Served from the maintained quote comparison payload; each vendor entry also
+        carries total / coverage / delivery_days.
+        """
+        payload = await self.get_quote_comparison(request_id)
+        items = payload.get("items", {})
+        response = {}
+        for vendor_id, vendor in payload.get("vendors", {}).items():
+            quotes = []
+            for item_id, line in vendor.get("lines", {}).items():
+                item = items.get(item_id, {})
+                quotes.append(
+                    {
+                        "request_item_id": item_id,
+                        "material_name": item.get("material_name"),
+                        "sub_type": item.get("sub_type"),
+                        "dimensions": item.get("dimensions"),
+                        "dimension_units": item.get("dimension_units"),
+                        "quantity": item.get("quantity"),
+                        "quantity_units": item.get("quantity_units"),
+                        "quoted_price": line.get("quoted_price"),
+                        "price_unit": line.get("price_unit"),
+                        "delivery_days": line.get("delivery_days"),
+                        "comments": line.get("comments"),
+                        "created_at": line.get("created_at"),
+                        "updated_at": line.get("updated_at"),
+                    }
+                )
+            response[vendor_id] = {
+                "vendor_name": vendor.get("vendor_name") or "Unknown",
+                "quotes": quotes,
+                "total": vendor.get("total"),
+                "coverage": vendor.get("coverage"),
+                "delivery_days": vendor.get("delivery_days"),
+            }
 
         return response
 
@@ -855,22 +1297,20 @@ class ProcurementCRUD:
                 when=now,
             )
 
-            other_vendor_ids = (
-                await self.session.execute(
-                    select(QuoteRequestVendor.vendor_id)
-                    .where(
-                        QuoteRequestVendor.quote_request_id == req_uuid,
-                        QuoteRequestVendor.vendor_id != ven_uuid,
-                    )
-                )
-            ).scalars().all()
-            for other_vendor in other_vendor_ids:
-                await self._set_quote_request_vendor_status(
-                    req_uuid,
-                    other_vendor,
-                    QuoteRequestVendorStatus.REJECTED,
-                    when=now,
-                )
+            await self._set_quote_request_vendor_status(
+                req_uuid,
+                ven_uuid,
+                QuoteRequestVendorStatus.REJECTED,
+                when=now,
+                exclude_vendor=ven_uuid,
+            )
+            await self._set_comparison_decision(
+                req_uuid,
+                ven_uuid,
+                QuoteRequestVendorStatus.APPROVED,
+                others_status=QuoteRequestVendorStatus.REJECTED,
+                approved_vendor_id=ven_uuid,
+            )
 
             # Fetch summary rows for total computation
             q = (
@@ -928,6 +1368,7 @@ class ProcurementCRUD:
                 })
 
             summary_info = await self.get_request_summary(req_uuid)
+            await self._refresh_order_context(req_uuid)
             await self.session.commit()
 
             return {
@@ -995,6 +1436,12 @@ class ProcurementCRUD:
                 QuoteRequestVendorStatus.DECLINED,
                 when=now,
             )
+            await self._set_comparison_decision(
+                req_uuid,
+                ven_uuid,
+                QuoteRequestVendorStatus.DECLINED,
+            )
+            await self._refresh_order_context(req_uuid)
 
             await self.session.commit()
         except Exception as e:
@@ -1026,6 +1473,7 @@ class ProcurementCRUD:
                 QuoteRequestVendorStatus.APPROVED,
                 when=now,
             )
+            await self._refresh_order_context(req_uuid)
             await self.session.commit()
         except Exception as e:
             await self.session.rollback()
@@ -0,0 +1,106 @@
+# database/rollup_crud.py
+"""
+Incremental per-project, per-day rollups (`project_daily_rollups`).
+
+Writers of site updates and worker/material logs call apply_rollup() in the same
+transaction as their insert, so a day's row always matches the raw rows behind it and
+overviews/digests read one small row per project-day instead of scanning history.
+The day's row is created on first use and then updated under a row lock, so concurrent
+writers for the same project-day serialise instead of losing increments.
+"""
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import ProjectDailyRollup
+
+MAX_RISKS_PER_DAY = 10
+SITE_DIGEST_TZ = ZoneInfo(os.getenv("SITE_DIGEST_TZ", "Asia/Kolkata"))
+
+
+def site_today(now: Optional[datetime] = None) -> date:
+    """The site's calendar day in SITE_DIGEST_TZ; every rollup date, digest and overview uses it."""
+    return (now or datetime.now(timezone.utc)).astimezone(SITE_DIGEST_TZ).date()
+
+
+@dataclass
+class RollupDelta:
+    """What one incoming record adds to its project-day."""
+    updates: int = 0
+    photos: int = 0
+    task_id: Optional[str] = None
+    component: Optional[str] = None
+    risk: Optional[str] = None
+    summary: Optional[str] = None
+    workers: int = 0
+    worker_role: Optional[str] = None
+    material: Optional[str] = None
+    material_unit: Optional[str] = None
+    material_used: float = 0.0
+
+
+def _bump(counter: Optional[Dict], key: str, amount: float) -> Dict:
+    merged = dict(counter or {})
+    merged[key] = round(merged.get(key, 0) + amount, 3)
+    return merged
+
+
+async def apply_rollup(session: AsyncSession, project_id: UUID, log_date: date, delta: RollupDelta) -> None:
+    """Fold `delta` into the project-day row. Does not commit; the caller's write does."""
+    await session.execute(
+        pg_insert(ProjectDailyRollup)
+        .values(project_id=project_id, log_date=log_date)
+        .on_conflict_do_nothing(index_elements=["project_id", "log_date"])
+    )
+    row = (
+        await session.execute(
+            select(ProjectDailyRollup)
+            .where(ProjectDailyRollup.project_id == project_id, ProjectDailyRollup.log_date == log_date)
+            .with_for_update()
+        )
+    ).scalar_one()
+
+    row.revision = (row.revision or 0) + 1
+    row.update_count = (row.update_count or 0) + delta.updates
+    row.photo_count = (row.photo_count or 0) + delta.photos
+    if delta.task_id and str(delta.task_id) not in (row.task_ids or []):
+        row.task_ids = list(row.task_ids or []) + [str(delta.task_id)]
+    if delta.component:
+        row.components = _bump(row.components, delta.component.strip(), 1)
+    if delta.risk and delta.risk not in (row.risks or []) and len(row.risks or []) < MAX_RISKS_PER_DAY:
+        row.risks = list(row.risks or []) + [delta.risk]
+    if delta.summary:
+        row.latest_summary = delta.summary
+    if delta.workers:
+        row.worker_count = (row.worker_count or 0) + delta.workers
+        row.worker_roles = _bump(row.worker_roles, (delta.worker_role or "Worker").strip(), delta.workers)
+    if delta.material and delta.material_used:
+        key = f"{delta.material.strip()}|{(delta.material_unit or '').strip()}"
+        row.materials = _bump(row.materials, key, delta.material_used)
+
+
+async def get_rollups(
+    session: AsyncSession,
+    log_date: date,
+    project_ids: Optional[Sequence[UUID]] = None,
+) -> List[ProjectDailyRollup]:
+    stmt = select(ProjectDailyRollup).where(ProjectDailyRollup.log_date == log_date)
+    if project_ids is not None:
+        stmt = stmt.where(ProjectDailyRollup.project_id.in_(list(project_ids)))
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def get_recent_rollups(session: AsyncSession, project_id: UUID, since: date) -> List[ProjectDailyRollup]:
+    stmt = (
+        select(ProjectDailyRollup)
+        .where(ProjectDailyRollup.project_id == project_id, ProjectDailyRollup.log_date >= since)
+        .order_by(ProjectDailyRollup.log_date.desc())
+    )
+    return list((await session.execute(stmt)).scalars().all())
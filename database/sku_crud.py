@@ -7,16 +7,18 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional
 import re
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import select, or_, and_, case, cast, String, desc, func, text
+from sqlalchemy import select, or_, and_, case, cast, String, desc, func, text, literal_column
 from sqlalchemy.ext.asyncio import AsyncSession
 from utils.sku_normalizer import (
     normalize_type, normalize_dimension, try_infer_size_from_text,
-    parse_query, type_similarity
+    parse_query, type_similarity, normalize_text
 )
-from database.models import SkuMaster, SkuVendorPrice, MaterialRequestItem
+from database.models import SkuMaster, SkuVendorPrice, SkuAlias, MaterialRequestItem
 from sqlalchemy import update as sa_update
 
 DEFAULT_SIM_THRESHOLD = 0.12
+EXACT_MATCH_SCORE = 240.0
+ALIAS_MAX_LEN = 255
 
 SEARCH_SQL = text("""
     WITH params AS (
@@ -164,6 +166,72 @@ def _normalize_price_to_base(quoted_price: float, price_unit: str, sku: SkuMaste
     # fallback (no conversion rule known)
     return q
 
+
+def _normalize_alias(text_value: str) -> str:
+    """Alias key used for both lookup and learning: lowercased, whitespace-collapsed."""
+    return normalize_text(text_value or "")[:ALIAS_MAX_LEN]
+
+
+# Query type slug -> product type, mirroring TYPE_TO_PRODUCT in utils/transform_sku_data.py.
+_TYPE_PRODUCT = {"pipe": "Pipe", "valve": "Valve", "tap": "Tap", "hose": "Hose"}
+
+
+def _query_canonical_key(keyword: str) -> str:
+    """canonical_key for a query, in build_canonical_key's format (utils/transform_sku_data.py):
+    type slug | material | product type | size (AxB) | variant, lowercased and pipe-joined.
+    Empty when the query lacks the material, product type or size that every stored key has.
+    """
+    parsed = parse_query(keyword or "")
+    q_type = parsed.get("q_type")
+    material = parsed.get("material")
+    size_primary = parsed.get("q_p1")
+    if not q_type or not material or not size_primary:
+        return ""
+    product_type = _TYPE_PRODUCT.get(q_type, "Fitting")
+    # Plain pipes carry no type slug in the stored keys.
+    parts = [] if q_type == "pipe" else [q_type]
+    parts += [material.lower(), product_type.lower()]
+    size_block = f"{size_primary:g}"
+    if parsed.get("q_p2"):
+        size_block = f"{size_primary:g}x{parsed['q_p2']:g}"
+    parts.append(size_block)
+    if parsed.get("variant"):
+        parts.append(parsed["variant"].lower())
+    return "|".join(parts)
+
+
+def _sku_to_item(sku: SkuMaster, match: str) -> Dict[str, Any]:
+    """Shape an exact-hit SkuMaster row like a search_skus_score_sql result."""
+    attrs = sku.attributes if isinstance(sku.attributes, dict) else {}
+    return {
+        'sku_id': sku.sku_id,
+        'brand': sku.brand,
+        'category': sku.category,
+        'uom_code': sku.uom_code,
+        'pack_qty': float(sku.pack_qty) if sku.pack_qty is not None else None,
+        'pack_uom': sku.pack_uom,
+        'description': sku.description,
+        'attributes': attrs,
+        'canonical_key': sku.canonical_key,
+        'status': sku.status,
+        'ambiguous': bool(sku.ambiguous),
+        'score': EXACT_MATCH_SCORE,
+        'normalized': {
+            'type_norm': sku.type_norm,
+            'size_mm_primary': float(sku.size_mm_primary) if sku.size_mm_primary is not None else None,
+            'size_mm_secondary': float(sku.size_mm_secondary) if sku.size_mm_secondary is not None else None,
+            'primary_size_native': sku.primary_size_native,
+            'primary_size_unit': sku.primary_size_unit,
+            'secondary_size_native': sku.secondary_size_native,
+            'secondary_size_unit': sku.secondary_size_unit,
+        },
+        'search_text': sku.search_text,
+        'debug': {
+            'final_score': 1.0,
+            'match': match,
+        },
+    }
+
 class SkuCRUD:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -290,6 +358,7 @@ class SkuCRUD:
         if top and score_norm >= 0.80:
             print(f"sku_crud ::::: process_vendor_quote_item ::::: high confidence match: {top['sku_id']} with score {score} (norm {score_norm})")
             await self._upsert_price(request_id, vendor_id, req_item_id, top["sku_id"], quoted_price, price_unit, comments or query_text, True)
+            await self.learn_alias(query_text, top["sku_id"], vendor_id=vendor_id, confidence=score_norm)
             return
         if top and score_norm >= 0.50:
             k = min(3, len(candidates))
@@ -302,6 +371,75 @@ class SkuCRUD:
         sid = await self._create_ambiguous_sku(query_text)
         await self._upsert_price(request_id, vendor_id, req_item_id, sid, quoted_price, price_unit, (comments or query_text or "ambiguous"), False)
 
+    # -------------------------------------------------------------
+    # Exact lookup path (alias -> canonical_key) ahead of fuzzy search
+    # -------------------------------------------------------------
+    async def resolve_exact_sku(self, keyword: str) -> Optional[Dict[str, Any]]:
+        """Point lookups that short-circuit SEARCH_SQL.
+        1) normalised alias_text hit in sku_alias (idx_sku_alias_text)
+        2) canonical_key hit in sku_master (idx_sku_cankey)
+        Returns a search-shaped item with the max score, or None.
+        """
+        alias_key = _normalize_alias(keyword)
+        if not alias_key:
+            return None
+
+        alias_stmt = (
+            select(SkuMaster)
+            .join(SkuAlias, SkuAlias.master_sku_id == SkuMaster.sku_id)
+            .where(SkuAlias.alias_text == alias_key, SkuMaster.status == "active")
+            .order_by(SkuAlias.confidence.desc().nulls_last(), SkuAlias.updated_at.desc())
+            .limit(1)
+        )
+        sku = await self.session.scalar(alias_stmt)
+        if sku:
+            print(f"sku_crud ::::: resolve_exact_sku ::::: alias hit '{alias_key}' -> {sku.sku_id}")
+            return _sku_to_item(sku, "alias")
+
+        canonical_key = _query_canonical_key(keyword)
+        if not canonical_key:
+            return None
+        cankey_stmt = (
+            select(SkuMaster)
+            .where(SkuMaster.canonical_key == canonical_key, SkuMaster.status == "active")
+            .limit(1)
+        )
+        sku = await self.session.scalar(cankey_stmt)
+        if sku:
+            print(f"sku_crud ::::: resolve_exact_sku ::::: canonical_key hit '{canonical_key}' -> {sku.sku_id}")
+            return _sku_to_item(sku, "canonical_key")
+        return None
+
+    async def learn_alias(self, alias_text: str, master_sku_id: str, *, vendor_id=None, confidence: Optional[float] = None) -> bool:
+        """Record alias_text -> master_sku_id so the next identical query is a single indexed lookup.
+        Existing aliases for the same SKU only get their confidence refreshed. Returns True when a row was added.
+        """
+        alias_key = _normalize_alias(alias_text)
+        if not alias_key or not master_sku_id:
+            return False
+        conf = Decimal(str(round(confidence, 4))) if confidence is not None else None
+        stmt = pg_insert(SkuAlias).values(
+            master_sku_id=master_sku_id,
+            alias_text=alias_key,
+            vendor_id=vendor_id,
+            confidence=conf,
+            created_at=datetime.datetime.utcnow(),
+            updated_at=datetime.datetime.utcnow(),
+        )
+        # Concurrent learners of the same alias land on one row; GREATEST ignores a NULL confidence.
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["alias_text", "master_sku_id"],
+            set_={
+                "confidence": func.greatest(SkuAlias.confidence, stmt.excluded.confidence),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(literal_column("(xmax = 0)").label("inserted"))
+        inserted = (await self.session.execute(stmt)).scalar_one()
+        if not inserted:
+            return False
+        print(f"sku_crud ::::: learn_alias ::::: '{alias_key}' -> {master_sku_id}")
+        return True
+
     # -------------------------------------------------------------
     # Alias/reconciliation helpers (manual/admin-triggered)
     # -------------------------------------------------------------
@@ -333,6 +471,10 @@ class SkuCRUD:
         q = (keyword or '').strip()
         if not q:
             return []
+        if offset == 0:
+            exact = await self.resolve_exact_sku(q)
+            if exact:
+                return [exact]
         qinfo = parse_query(q)
         params = {
             'q_norm': qinfo.get('q_norm') or q.lower(),
@@ -496,6 +638,8 @@ class SkuCRUD:
             print(f"sku_crud ::::: insert_sku_vendor_quotes ::::: executing svp_stmt : {svp_stmt}")
             await self.session.execute(svp_stmt)
             print(f"sku_crud ::::: insert_sku_vendor_quotes ::::: upsert OK for sku_id={item.sku_id}")
+            query_text = await self._build_query_from_request_item(item.requested_item_id)
+            await self.learn_alias(query_text, item.sku_id, vendor_id=vendor_id, confidence=1.0)
         except Exception as e:
             self.session.rollback()
             print(f"sku_crud ::::: insert_sku_vendor_quotes ::::: ERROR for sku_id={item.sku_id} : {e}")
@@ -1,9 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import select, update, delete
-from typing import Optional, List
+from sqlalchemy import select, update, delete, func, literal_column, or_
+from typing import Dict, Iterable, Optional, List
 from database.models import Project, Flat, Region, WorkerLog, MaterialInventory, MaterialLog, Task
+from managers.region_catalog import RegionCatalog, cached_catalog, remember_catalog
+from managers.project_cache import project_cache
+from database.rollup_crud import RollupDelta, apply_rollup, site_today
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.types import Text
 import logging
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
@@ -15,6 +19,17 @@ Base = declarative_base()
 def to_dict(model):
     return {c.key: getattr(model, c.key) for c in model.__table__.columns}
 
+def project_summary(proj: Project) -> dict:
+    return {
+        "id": proj.id,
+        "title": proj.name,
+        "location": proj.location,
+        "no_of_blocks": proj.no_of_blocks,
+        "floors_per_block": proj.floors_per_block,
+        "flats_per_floor": proj.flats_per_floor,
+        "created_at": proj.created_at.isoformat() if proj.created_at else None
+    }
+
 class DatabaseCRUD:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -54,6 +69,7 @@ class DatabaseCRUD:
             self.session.add(db_project)
             await self.session.commit()
             await self.session.refresh(db_project)
+            project_cache.upsert(db_project.sender_id, project_summary(db_project))
             return db_project
         except Exception as e:
             await self.session.rollback()
@@ -79,7 +95,10 @@ class DatabaseCRUD:
             )
             result = await self.session.execute(query)
             await self.session.commit()
-            return result.scalar_one_or_none()
+            updated = result.scalar_one_or_none()
+            if updated is not None:
+                project_cache.upsert(updated.sender_id, project_summary(updated))
+            return updated
         except Exception as e:
             await self.session.rollback()
             logging.error(f"Error updating project: {e}")
@@ -87,33 +106,29 @@ class DatabaseCRUD:
 
     async def delete_project(self, project_id: str) -> bool:
         try:
-            query = delete(Project).where(Project.id == project_id)
+            query = delete(Project).where(Project.id == project_id).returning(Project.sender_id)
             result = await self.session.execute(query)
+            senders = result.scalars().all()
             await self.session.commit()
-            return result.rowcount > 0
+            for sender_id in senders:
+                project_cache.invalidate(sender_id)
+            return bool(senders)
         except Exception as e:
             await self.session.rollback()
             logging.error(f"Error deleting project: {e}")
             raise
 
-    async def get_projects_by_sender(self, sender_id: str) -> List[dict]:
+    async def get_projects_by_sender(self, sender_id: str, fresh: bool = False) -> List[dict]:
+        """Sender's projects, newest first; served from project_cache once loaded unless `fresh`."""
+        cached = None if fresh else project_cache.get(sender_id)
+        if cached is not None:
+            return cached
         try:
             stmt = select(Project).where(Project.sender_id == sender_id).order_by(Project.created_at.desc())
             result = await self.session.execute(stmt)
-            projects = result.scalars().all()
-
-            return [
-                {
-                    "id": proj.id,
-                    "title": proj.name,
-                    "location": proj.location,
-                    "no_of_blocks": proj.no_of_blocks,
-                    "floors_per_block": proj.floors_per_block,
-                    "flats_per_floor": proj.flats_per_floor,
-                    "created_at": proj.created_at.isoformat() if proj.created_at else None
-                }
-                for proj in projects
-            ]
+            projects = [project_summary(proj) for proj in result.scalars().all()]
+            project_cache.put(sender_id, projects)
+            return projects
         except Exception as e:
             logging.error(f"Error fetching projects by sender: {e}")
             raise
@@ -194,6 +209,55 @@ class DatabaseCRUD:
             }
         )
 
+    async def bulk_upsert_regions(self, regions: Iterable[dict], chunk_size: int = 1000) -> Dict[str, int]:
+        """
+        Upsert many regions in ONE transaction using multi-row INSERT ... ON CONFLICT (full_id).
+        Rows whose values are unchanged are left alone (no dead tuples on re-sync).
+        Returns {"total", "inserted", "updated"}.
+        """
+        counts = {"total": 0, "inserted": 0, "updated": 0}
+        fields = ("code", "project_id", "flat_id", "block_name", "floor_no", "meta")
+        try:
+            chunk: List[dict] = []
+
+            async def flush() -> None:
+                stmt = pg_insert(Region).values(chunk)
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["full_id"],
+                    set_={f: excluded[f] for f in fields},
+                    where=or_(
+                        *(getattr(Region, f).is_distinct_from(excluded[f]) for f in fields if f != "meta"),
+                        Region.meta.cast(Text).is_distinct_from(excluded.meta.cast(Text)),
+                    ),
+                ).returning(literal_column("(xmax = 0)"))
+                result = await self.session.execute(stmt)
+                for (inserted,) in result.all():
+                    counts["inserted" if inserted else "updated"] += 1
+                counts["total"] += len(chunk)
+                chunk.clear()
+
+            for region in regions:
+                chunk.append({
+                    "full_id": region["full_id"],
+                    "code": region["code"],
+                    "project_id": region["project_id"],
+                    "flat_id": region.get("flat_id"),
+                    "block_name": region.get("block_name"),
+                    "floor_no": region.get("floor_no"),
+                    "meta": region.get("meta", {}),
+                })
+                if len(chunk) >= chunk_size:
+                    await flush()
+            if chunk:
+                await flush()
+            await self.session.commit()
+            return counts
+        except Exception as e:
+            await self.session.rollback()
+            logging.error(f"Bulk region upsert error: {e}")
+            raise
+
     async def get_regions_by_project(self, project_id: str) -> List[Region]:
         try:
             query = select(Region).where(Region.project_id == project_id)
@@ -239,6 +303,22 @@ class DatabaseCRUD:
             print(f"Error fetching task for region {region_id} and scope '{scope}': {e}")
             return None
 
+    async def get_task_in_region(self, region_full_id: str, scope: str) -> Optional[Task]:
+        print(f"uoc_crud:::get_task_in_region::: --Fetching task for region {region_full_id} and scope '{scope}' --")
+        try:
+            stmt = (
+                select(Task)
+                .join(Region, Region.id == Task.region_id)
+                .where(Region.full_id == region_full_id.strip(), Task.task_type == scope)
+                .order_by(Task.created_at.desc())
+                .limit(1)
+            )
+            result = await self.session.execute(stmt)
+            return result.scalar_one_or_none()
+        except Exception as e:
+            print(f"uoc_crud:::Error fetching task for region {region_full_id} and scope '{scope}': {e}")
+            return None
+
     async def create_task(self, project_id, region_full_id: str, scope) -> Optional[Task]:
 
         print(f"uoc_crud:::create_task::: --Creating task for region {region_full_id} and scope '{scope}' --")
@@ -271,10 +351,72 @@ class DatabaseCRUD:
         task = await self.get_task(region_id, scope)
         return task if task else await self.create_task(region_id, region_id, scope)
  
+    # ----------------- Worker / Material logs -----------------
+    async def create_worker_log(self, log: dict) -> WorkerLog:
+        """Insert a worker log and fold it into the project's daily rollup in the same commit."""
+        try:
+            db_log = WorkerLog(**log)
+            db_log.log_date = db_log.log_date or site_today()
+            self.session.add(db_log)
+            await self.session.flush()
+            await apply_rollup(self.session, db_log.project_id, db_log.log_date, RollupDelta(
+                task_id=db_log.task_id,
+                workers=db_log.count or 1,
+                worker_role=db_log.job_role,
+            ))
+            await self.session.commit()
+            return db_log
+        except Exception as e:
+            await self.session.rollback()
+            logging.error(f"Error creating worker log: {e}")
+            raise
+
+    async def create_material_log(self, log: dict) -> MaterialLog:
+        """Insert a material log; only usage and wastage count as consumed in the daily rollup."""
+        try:
+            fields = dict(log)
+            material_name = fields.pop("material_name", None)   # display name for the rollup only
+            db_log = MaterialLog(**fields)
+            db_log.log_date = db_log.log_date or site_today()
+            self.session.add(db_log)
+            await self.session.flush()
+            consumed = (db_log.change_type or "").lower() in ("usage", "wastage")
+            await apply_rollup(self.session, db_log.project_id, db_log.log_date, RollupDelta(
+                task_id=db_log.task_id,
+                material=material_name or db_log.description or "Material",
+                material_unit=db_log.unit,
+                material_used=db_log.quantity if consumed else 0.0,
+            ))
+            await self.session.commit()
+            return db_log
+        except Exception as e:
+            await self.session.rollback()
+            logging.error(f"Error creating material log: {e}")
+            raise
+
     async def get_task_summary(self):
         print("uoc_crud:::get_task_summary::: --Fetching task summary --")
         return []  # implement as needed
 
+    async def get_region_catalog(self, project_id: UUID) -> Optional[RegionCatalog]:
+        """
+        Compact region layout for a project. Served from the in-process cache while the stored
+        region count still matches; otherwise rebuilt once from the stored full IDs.
+        """
+        try:
+            count_stmt = select(func.count()).select_from(Region).where(Region.project_id == project_id)
+            region_count = (await self.session.execute(count_stmt)).scalar_one()
+            if not region_count:
+                return None
+            catalog = cached_catalog(str(project_id), region_count)
+            if catalog is None:
+                catalog = RegionCatalog.from_full_ids(await self.get_region_full_ids_by_project(project_id))
+                remember_catalog(catalog, region_count)
+            return catalog
+        except Exception as e:
+            print(f"uoc_crud:::Error loading region catalog for project {project_id}: {e}")
+            return None
+
     async def get_region_full_ids_by_project(self, project_id: UUID) -> List[str]:
         print(f"uoc_crud::::::get_region_full_ids_by_project::: --Fetching region full IDs for project {project_id} --")
         try:
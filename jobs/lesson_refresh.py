@@ -0,0 +1,60 @@
+"""
+Background (re)generation of micro-lessons for managers.lesson_library.
+
+Stale lessons keep being served while a refresh job regenerates them; one job per topic,
+language and day however many builders hit the stale copy. On startup the common topics in
+LESSON_SEED_TOPICS are queued for any language that doesn't have them yet, so the first
+builder to ask gets a stored lesson instead of waiting on the LLM.
+"""
+from __future__ import annotations
+
+import os
+from datetime import date
+from typing import Any, Dict
+
+from jobs.runner import job_runner
+from managers.lesson_library import lesson_library, normalise_topic
+
+LESSON_REFRESH_JOB = "micro_lesson.generate"
+LESSON_SEED_LANGUAGES = [lang.strip() for lang in os.getenv("LESSON_SEED_LANGUAGES", "Telugu").split(",") if lang.strip()]
+LESSON_SEED_TOPICS = (
+    "Curing of concrete",
+    "Waterproofing",
+    "Rebar cover",
+    "Plastering",
+    "Brickwork",
+    "Shuttering",
+    "Concrete pouring",
+    "Tiling",
+    "Construction Basics",
+)
+
+
+async def enqueue_lesson_refresh(topic: str, language: str) -> bool:
+    return await job_runner.submit(
+        LESSON_REFRESH_JOB,
+        {"topic": topic, "language": language},
+        idempotency_key=f"{LESSON_REFRESH_JOB}:{normalise_topic(topic)}:{language}:{date.today().isoformat()}",
+    )
+
+
+async def enqueue_seed_lessons() -> int:
+    """Queue generation for seed topics not stored yet; returns how many were queued."""
+    queued = 0
+    for language in LESSON_SEED_LANGUAGES:
+        for topic in LESSON_SEED_TOPICS:
+            if not await lesson_library.has(topic, language):
+                queued += int(await enqueue_lesson_refresh(topic, language))
+    if queued:
+        print(f"lesson_refresh ::::: seed ::::: queued {queued} lessons")
+    return queued
+
+
+async def _run_lesson_refresh(payload: Dict[str, Any]) -> None:
+    from agents.siteops_agent import generate_micro_lesson
+
+    content = await generate_micro_lesson(payload["topic"], payload["language"])
+    await lesson_library.store(payload["topic"], payload["language"], content)
+
+
+job_runner.register(LESSON_REFRESH_JOB, _run_lesson_refresh)
@@ -0,0 +1,130 @@
+"""
+Post-commit work for /submit-order, run by jobs.runner instead of on the request path:
+the vendor quote fan-out and the supervisor's WhatsApp confirmation.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_sessionmaker
+from database.models import QuoteRequestVendor, QuoteRequestVendorStatus
+from jobs.runner import job_runner
+from managers.quotation_handler import handle_quote_flow
+from whatsapp.builder_out import whatsapp_output_async
+
+QUOTE_FANOUT_JOB = "submit_order.quote_fanout"
+SUPERVISOR_CONFIRMATION_JOB = "submit_order.supervisor_confirmation"
+
+
+def _id_digest(ids: List[Optional[str]]) -> str:
+    """Short, order-independent digest of a set of vendor IDs for idempotency keys."""
+    joined = ",".join(sorted(str(vendor_id) for vendor_id in ids if vendor_id))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+
+async def enqueue_quote_fanout(
+    session: AsyncSession,
+    *,
+    request_id: str,
+    sender_id: str,
+    vendors: List[Dict[str, Optional[str]]],
+    items: List[Dict[str, Any]],
+    project_name: Optional[str] = None,
+    project_location: Optional[str] = None,
+) -> bool:
+    """
+    Queue the vendor fan-out in the caller's transaction. Keyed on the request and its vendor
+    set, so a resubmit with new vendors fans out again; vendors an earlier job already reached
+    are skipped by _vendors_still_to_notify.
+    """
+    return await job_runner.enqueue(
+        session,
+        QUOTE_FANOUT_JOB,
+        {
+            "request_id": request_id,
+            "sender_id": sender_id,
+            "vendors": vendors,
+            "items": items,
+            "project_name": project_name,
+            "project_location": project_location,
+        },
+        idempotency_key=f"{QUOTE_FANOUT_JOB}:{request_id}:{_id_digest([v.get('vendor_id') for v in vendors])}",
+    )
+
+
+async def _vendors_still_to_notify(
+    request_id: str,
+    vendors: List[Dict[str, Optional[str]]],
+) -> List[Dict[str, Optional[str]]]:
+    """Drop vendors an earlier attempt already reached, so a retry only re-sends the failures."""
+    async with get_sessionmaker()() as session:
+        result = await session.execute(
+            select(QuoteRequestVendor.vendor_id).where(
+                QuoteRequestVendor.quote_request_id == UUID(request_id),
+                QuoteRequestVendor.status != QuoteRequestVendorStatus.INVITED,
+            )
+        )
+        handled = {str(vendor_id) for vendor_id in result.scalars().all()}
+    return [vendor for vendor in vendors if vendor.get("vendor_id") not in handled]
+
+
+async def _run_quote_fanout(payload: Dict[str, Any]) -> None:
+    request_id = payload["request_id"]
+    vendors = payload.get("vendors") or []
+    pending = await _vendors_still_to_notify(request_id, vendors)
+    if vendors and not pending:
+        print(f"order_submission ::::: quote_fanout ::::: all vendors already notified for {request_id}")
+        return
+
+    state = await handle_quote_flow(
+        {},
+        payload["sender_id"],
+        pending,
+        request_id,
+        payload.get("items") or [],
+        project_name=payload.get("project_name"),
+        project_location=payload.get("project_location"),
+    )
+
+    message_type = state.get("uoc_next_message_type") or "plain"
+    extra_data = state.get("uoc_next_message_extra_data")
+    if message_type == "link_cta" and not extra_data:
+        message_type = "plain"
+    fanout = state.get("quote_fanout") or {}
+    if state.get("latest_respons"):
+        # Keyed on this attempt's outcome: a retry that reaches vendors still sends its own
+        # confirmation, while retries that fail the same way don't repeat the message.
+        outcome = _id_digest(fanout.get("notified") or []) + "." + _id_digest(fanout.get("failed") or [])
+        await job_runner.submit(
+            SUPERVISOR_CONFIRMATION_JOB,
+            {
+                "sender_id": payload["sender_id"],
+                "message_text": state["latest_respons"],
+                "message_type": message_type,
+                "extra_data": extra_data,
+            },
+            idempotency_key=f"{SUPERVISOR_CONFIRMATION_JOB}:{request_id}:{outcome}",
+        )
+
+    failed = fanout.get("failed") or []
+    if failed:
+        # Raising re-queues the job with backoff; the retry only targets vendors still INVITED.
+        raise RuntimeError(f"{len(failed)} vendor notification(s) failed for request {request_id}: {failed}")
+
+
+async def _run_supervisor_confirmation(payload: Dict[str, Any]) -> None:
+    await whatsapp_output_async(
+        payload["sender_id"],
+        payload["message_text"],
+        message_type=payload.get("message_type") or "plain",
+        extra_data=payload.get("extra_data"),
+    )
+
+
+job_runner.register(QUOTE_FANOUT_JOB, _run_quote_fanout)
+job_runner.register(SUPERVISOR_CONFIRMATION_JOB, _run_supervisor_confirmation)
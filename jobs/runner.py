@@ -0,0 +1,300 @@
+"""
+In-process worker pool over a Postgres-backed job queue (`background_jobs`).
+
+Request handlers enqueue work inside their own transaction, so a job exists if and only if
+the write that produced it committed, and return without waiting for it. Each job carries
+an idempotency key: enqueueing the same key again is a no-op, so client retries of the
+same submission never fan out twice.
+
+Workers claim one due job at a time with FOR UPDATE SKIP LOCKED and hold it under a lease
+(`locked_until`); a job whose worker died mid-run is reclaimed once the lease expires.
+Every claim writes a fresh `lease_token`, and only the holder of the current token can record
+the outcome, so a worker that overran its lease cannot overwrite the re-claimer's result.
+Failures are retried with exponential backoff up to `max_attempts`, then parked as failed;
+failed rows are the dead-letter queue (dead_letters() / requeue()).
+Handlers therefore run at least once and should tolerate a repeat.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_sessionmaker
+from database.models import BackgroundJob
+
+log = logging.getLogger("uvicorn.error")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+FailureHandler = Callable[[Dict[str, Any], str], Awaitable[None]]
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = 3600.0
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class _ClaimedJob:
+    id: UUID
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    lease_token: str
+
+
+class JobRunner:
+    def __init__(
+        self,
+        *,
+        workers: int = JOB_WORKERS,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self._workers = max(1, workers)
+        self._poll_seconds = poll_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._on_failure: Dict[str, FailureHandler] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # ------------------------------------------------------------------ API
+
+    def register(self, kind: str, handler: JobHandler, on_failure: Optional[FailureHandler] = None) -> None:
+        """
+        Bind a job kind to `handler(payload)`; call at import time. A runner only claims the
+        kinds registered on it, so separate runners give separate, bounded worker pools.
+        `on_failure(payload, error)` runs once when a job is parked as failed.
+        """
+        self._handlers[kind] = handler
+        if on_failure is not None:
+            self._on_failure[kind] = on_failure
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        kind: str,
+        payload: Dict[str, Any],
+        *,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0.0,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> bool:
+        """
+        Add a job within the caller's transaction (the caller commits, then calls wake()).
+        Payload must be JSON-serialisable. Returns False when the idempotency key already exists.
+        """
+        stmt = (
+            pg_insert(BackgroundJob)
+            .values(
+                kind=kind,
+                idempotency_key=idempotency_key or f"{kind}:{uuid4()}",
+                payload=payload,
+                max_attempts=max_attempts,
+                run_after=_utcnow() + timedelta(seconds=max(0.0, delay)),
+            )
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(BackgroundJob.id)
+        )
+        created = (await session.execute(stmt)).scalar_one_or_none() is not None
+        if not created:
+            print(f"job_runner ::::: enqueue ::::: duplicate {kind} job skipped ({idempotency_key})")
+        return created
+
+    async def submit(self, kind: str, payload: Dict[str, Any], **kwargs: Any) -> bool:
+        """enqueue() in a session of its own, committed and picked up right away."""
+        async with get_sessionmaker()() as session:
+            created = await self.enqueue(session, kind, payload, **kwargs)
+            await session.commit()
+        if created:
+            self.wake()
+        return created
+
+    async def dead_letters(self, kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Jobs parked as failed (the dead-letter queue), newest first."""
+        stmt = select(BackgroundJob).where(BackgroundJob.status == "failed")
+        if kind:
+            stmt = stmt.where(BackgroundJob.kind == kind)
+        stmt = stmt.order_by(BackgroundJob.updated_at.desc()).limit(limit)
+        async with get_sessionmaker()() as session:
+            rows = (await session.execute(stmt)).scalars().all()
+        return [
+            {
+                "id": str(row.id),
+                "kind": row.kind,
+                "payload": row.payload,
+                "attempts": row.attempts,
+                "last_error": row.last_error,
+                "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            }
+            for row in rows
+        ]
+
+    async def requeue(self, job_id: UUID) -> bool:
+        """Move a dead-lettered job back to the queue with a fresh attempt budget."""
+        async with get_sessionmaker()() as session:
+            result = await session.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, BackgroundJob.status == "failed")
+                .values(status="queued", attempts=0, run_after=_utcnow(), locked_until=None, lease_token=None, updated_at=_utcnow())
+            )
+            await session.commit()
+        if result.rowcount:
+            self.wake()
+        return bool(result.rowcount)
+
+    def wake(self) -> None:
+        """Nudge idle workers to claim now rather than on their next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self._workers)]
+        print(f"job_runner ::::: started {self._workers} workers (poll every {self._poll_seconds}s)")
+
+    async def stop(self) -> None:
+        """Cancel workers; a job cut off mid-run is retried by whoever claims it after the lease."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+        print("job_runner ::::: stopped")
+
+    # ------------------------------------------------------------ internals
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("job_runner: claim failed in worker %s", n)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _claim(self) -> Optional[_ClaimedJob]:
+        if not self._handlers:
+            return None
+        now = _utcnow()
+        async with get_sessionmaker()() as session:
+            stmt = (
+                select(BackgroundJob)
+                .where(
+                    BackgroundJob.kind.in_(list(self._handlers)),
+                    or_(
+                        and_(BackgroundJob.status == "queued", BackgroundJob.run_after <= now),
+                        and_(BackgroundJob.status == "running", BackgroundJob.locked_until < now),
+                    ),
+                )
+                .order_by(BackgroundJob.run_after)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            row = (await session.execute(stmt)).scalar_one_or_none()
+            if row is None:
+                await session.rollback()
+                return None
+            row.status = "running"
+            row.attempts += 1
+            row.locked_until = now + self._lease
+            row.lease_token = uuid4().hex
+            row.updated_at = now
+            job = _ClaimedJob(
+                id=row.id,
+                kind=row.kind,
+                payload=dict(row.payload or {}),
+                attempts=row.attempts,
+                max_attempts=row.max_attempts,
+                lease_token=row.lease_token,
+            )
+            await session.commit()
+        return job
+
+    async def _run(self, job: _ClaimedJob) -> None:
+        handler = self._handlers.get(job.kind)
+        error: Optional[str] = None
+        if handler is None:
+            error = f"no handler registered for job kind {job.kind}"
+        else:
+            try:
+                await handler(job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                log.exception("job_runner: %s job %s failed (attempt %s/%s)", job.kind, job.id, job.attempts, job.max_attempts)
+                error = f"{type(exc).__name__}: {exc}"
+        try:
+            recorded = await self._finish(job, error)
+        except Exception:
+            # The lease expires and the job is reclaimed; handlers tolerate the repeat.
+            log.exception("job_runner: could not record outcome of %s job %s", job.kind, job.id)
+            return
+        if not recorded:
+            print(f"job_runner ::::: {job.kind} job {job.id} lost its lease; outcome left to the re-claimer")
+            return
+        on_failure = self._on_failure.get(job.kind)
+        if error is not None and job.attempts >= job.max_attempts and on_failure is not None:
+            try:
+                await on_failure(job.payload, error)
+            except Exception:
+                log.exception("job_runner: failure hook for %s job %s raised", job.kind, job.id)
+
+    async def _finish(self, job: _ClaimedJob, error: Optional[str]) -> bool:
+        """Record the outcome; False when the lease was lost to another claim in the meantime."""
+        now = _utcnow()
+        values: Dict[str, Any] = {"locked_until": None, "lease_token": None, "updated_at": now}
+        outcome: Optional[str] = None
+        if error is None:
+            values.update(status="done", last_error=None)
+        elif job.attempts >= job.max_attempts:
+            values.update(status="failed", last_error=error[:2000])
+            outcome = f"failed permanently : {error}"
+        else:
+            backoff = min(JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1)), JOB_RETRY_MAX_SECONDS)
+            values.update(status="queued", last_error=error[:2000], run_after=now + timedelta(seconds=backoff))
+            outcome = f"retrying in {backoff:.0f}s : {error}"
+        async with get_sessionmaker()() as session:
+            result = await session.execute(
+                update(BackgroundJob)
+                .where(
+                    BackgroundJob.id == job.id,
+                    BackgroundJob.status == "running",
+                    BackgroundJob.lease_token == job.lease_token,
+                )
+                .values(**values)
+            )
+            await session.commit()
+        if result.rowcount and outcome:
+            print(f"job_runner ::::: {job.kind} job {job.id} {outcome}")
+        return bool(result.rowcount)
+
+
+job_runner = JobRunner()
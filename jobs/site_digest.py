@@ -0,0 +1,163 @@
+"""
+Daily site digest built from `project_daily_rollups`.
+
+A persistent scheduler timer fires once a day at SITE_DIGEST_HOUR (SITE_DIGEST_TZ) and
+enqueues one digest job per builder for that day's rollups; the idempotency key
+(builder + date) keeps replicas that fire the same timer from sending twice. The digest is
+formatted straight from the rollup rows — no raw-log scans and no LLM call.
+
+Updates logged after a day's digest went out are not dropped: apply_rollup bumps a row's
+revision under its row lock, the digest records the revision it actually showed, and a row
+is pending while revision > digest_revision. The next run picks up the previous day's
+pending rows alongside today's, labelled with their date.
+"""
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select, update
+
+from app.db import get_sessionmaker
+from app.scheduler import scheduler
+from database.models import Project, ProjectDailyRollup
+from database.rollup_crud import SITE_DIGEST_TZ, site_today
+from jobs.runner import job_runner
+from whatsapp.builder_out import whatsapp_output_async
+
+SITE_DIGEST_TIMER = "site_digest.daily"
+SITE_DIGEST_JOB = "site_digest.send"
+SITE_DIGEST_HOUR = int(os.getenv("SITE_DIGEST_HOUR", "19"))
+DIGEST_TOP_ITEMS = 3
+
+
+def _fmt_qty(value: float) -> str:
+    return f"{value:g}"
+
+
+def _top(counter: Optional[Dict[str, float]], limit: int = DIGEST_TOP_ITEMS) -> List[tuple]:
+    return sorted((counter or {}).items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def format_project_digest(project_name: str, rollup: ProjectDailyRollup) -> str:
+    """A few WhatsApp lines for one project-day; empty sections are left out."""
+    lines = [f"🏗 {project_name}"]
+    activity = []
+    if rollup.update_count:
+        activity.append(f"{rollup.update_count} update{'s' if rollup.update_count != 1 else ''}")
+    if rollup.task_ids:
+        activity.append(f"{len(rollup.task_ids)} task{'s' if len(rollup.task_ids) != 1 else ''} touched")
+    if rollup.photo_count:
+        activity.append(f"📷 {rollup.photo_count}")
+    if activity:
+        lines.append("✅ " + " · ".join(activity))
+    if rollup.components:
+        lines.append("🛠 " + ", ".join(f"{name} ×{count:g}" for name, count in _top(rollup.components)))
+    if rollup.worker_count:
+        roles = ", ".join(f"{role} {count:g}" for role, count in _top(rollup.worker_roles))
+        lines.append(f"👷 {rollup.worker_count} workers" + (f" ({roles})" if roles else ""))
+    if rollup.materials:
+        used = []
+        for key, qty in _top(rollup.materials):
+            name, _, unit = key.partition("|")
+            used.append(f"{name} {_fmt_qty(qty)}{(' ' + unit) if unit else ''}")
+        lines.append("🧱 " + ", ".join(used))
+    if rollup.risks:
+        lines.append("⚠ " + "; ".join(rollup.risks[:2]))
+    return "\n".join(lines)
+
+
+def _pending():
+    """Rollups with increments the last digest didn't show."""
+    return ProjectDailyRollup.revision > ProjectDailyRollup.digest_revision
+
+
+def _seconds_until_next_digest(now: Optional[datetime] = None) -> float:
+    local_now = (now or datetime.now(timezone.utc)).astimezone(SITE_DIGEST_TZ)
+    run_at = local_now.replace(hour=SITE_DIGEST_HOUR, minute=0, second=0, microsecond=0)
+    if run_at <= local_now:
+        run_at += timedelta(days=1)
+    return (run_at - local_now).total_seconds()
+
+
+def ensure_digest_scheduled() -> None:
+    """Arm the daily timer unless one was restored from `scheduled_timers`; call after scheduler.start()."""
+    if not scheduler.pending(SITE_DIGEST_TIMER):
+        scheduler.schedule(SITE_DIGEST_TIMER, SITE_DIGEST_TIMER, _seconds_until_next_digest())
+
+
+async def _run_daily_digest(key: str, payload: Dict[str, Any]) -> None:
+    digest_day = site_today()
+    try:
+        async with get_sessionmaker()() as session:
+            rows = (
+                await session.execute(
+                    select(ProjectDailyRollup.id, Project.sender_id)
+                    .join(Project, Project.id == ProjectDailyRollup.project_id)
+                    .where(
+                        # Yesterday's rows only show up here if they changed after yesterday's digest.
+                        ProjectDailyRollup.log_date.in_([digest_day, digest_day - timedelta(days=1)]),
+                        _pending(),
+                        Project.sender_id.isnot(None),
+                    )
+                )
+            ).all()
+        by_sender: Dict[str, List[str]] = defaultdict(list)
+        for rollup_id, sender_id in rows:
+            by_sender[sender_id].append(str(rollup_id))
+        for sender_id, rollup_ids in by_sender.items():
+            await job_runner.submit(
+                SITE_DIGEST_JOB,
+                {"sender_id": sender_id, "log_date": digest_day.isoformat(), "rollup_ids": rollup_ids},
+                idempotency_key=f"{SITE_DIGEST_JOB}:{sender_id}:{digest_day.isoformat()}",
+            )
+        print(f"site_digest ::::: daily ::::: {len(by_sender)} digests queued for {digest_day}")
+    finally:
+        # Re-arm for tomorrow even if today's run failed.
+        scheduler.schedule(SITE_DIGEST_TIMER, SITE_DIGEST_TIMER, _seconds_until_next_digest())
+
+
+async def _send_digest(payload: Dict[str, Any]) -> None:
+    log_date = date.fromisoformat(payload["log_date"])
+    rollup_ids = [UUID(rollup_id) for rollup_id in payload.get("rollup_ids") or []]
+    async with get_sessionmaker()() as session:
+        rows = (
+            await session.execute(
+                select(ProjectDailyRollup, Project.name)
+                .join(Project, Project.id == ProjectDailyRollup.project_id)
+                .where(ProjectDailyRollup.id.in_(rollup_ids), _pending())
+                .order_by(ProjectDailyRollup.log_date, Project.name)
+            )
+        ).all()
+    if not rows:
+        return
+
+    sections = []
+    for rollup, name in rows:
+        title = name or "Your project"
+        if rollup.log_date != log_date:
+            title = f"{title} · {rollup.log_date:%d %b} (updated after that day's digest)"
+        sections.append(format_project_digest(title, rollup))
+    message = f"📋 Site digest — {log_date:%d %b}\n\n" + "\n\n".join(sections)
+    await whatsapp_output_async(payload["sender_id"], message, message_type="plain")
+
+    sent_at = datetime.now(timezone.utc)
+    async with get_sessionmaker()() as session:
+        for rollup, _ in rows:
+            # Record the revision this digest showed; increments committed after the read stay pending.
+            await session.execute(
+                update(ProjectDailyRollup)
+                .where(ProjectDailyRollup.id == rollup.id)
+                .values(
+                    digest_revision=func.greatest(ProjectDailyRollup.digest_revision, rollup.revision),
+                    digest_sent_at=sent_at,
+                )
+            )
+        await session.commit()
+
+
+scheduler.register(SITE_DIGEST_TIMER, _run_daily_digest)
+job_runner.register(SITE_DIGEST_JOB, _send_digest)
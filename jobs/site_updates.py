@@ -0,0 +1,155 @@
+"""
+Site-update pipeline: photo/text updates are acknowledged on the reply path and summarised here.
+
+summarise_update is a GPT-4o vision call; running it inline made the builder wait for the
+model before hearing anything back. The siteops agent now sends an instant ack and enqueues
+the update; `site_update_runner` (its own bounded pool, so peak photo hours can't starve the
+order jobs) summarises it, stores component/highlight/risk/summary in `site_updates`, then
+pushes the summary to the sender. Updates that still fail after their retries stay in
+background_jobs as failed (the dead-letter queue) and the sender is told once.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db import get_sessionmaker
+from database.models import SiteUpdate
+from database.rollup_crud import RollupDelta, apply_rollup, site_today
+from jobs.runner import JobRunner
+from whatsapp.builder_out import whatsapp_output_async
+
+SITE_UPDATE_JOB = "site_update.summarise"
+SITE_UPDATE_WORKERS = int(os.getenv("SITE_UPDATE_WORKERS", "3"))
+SITE_UPDATE_MAX_ATTEMPTS = int(os.getenv("SITE_UPDATE_MAX_ATTEMPTS", "3"))
+
+SITE_UPDATE_ACK = "Got it 👍 Logging this update — I'll send you a quick summary in a moment."
+SITE_UPDATE_FAILED = "⚠️ I couldn't analyse your last site update. Please resend it if it matters."
+
+site_update_runner = JobRunner(workers=SITE_UPDATE_WORKERS)
+
+
+def _uuid_or_none(value: Any) -> Optional[UUID]:
+    try:
+        return UUID(str(value)) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def enqueue_site_update(
+    *,
+    sender_id: str,
+    text: str,
+    image_path: Optional[str] = None,
+    project_id: Optional[str] = None,
+    task_id: Optional[str] = None,
+    source_key: Optional[str] = None,
+) -> bool:
+    """Queue one update for summarising; `source_key` (the inbound wamid) dedupes webhook redeliveries."""
+    payload = {
+        "sender_id": sender_id,
+        "text": text,
+        "image_path": image_path or None,
+        "project_id": str(project_id) if project_id else None,
+        "task_id": str(task_id) if task_id else None,
+        "source_key": source_key,
+    }
+    return await site_update_runner.submit(
+        SITE_UPDATE_JOB,
+        payload,
+        idempotency_key=f"{SITE_UPDATE_JOB}:{source_key}" if source_key else None,
+        max_attempts=SITE_UPDATE_MAX_ATTEMPTS,
+    )
+
+
+def _read_image_b64(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as fp:
+        return base64.b64encode(fp.read()).decode("utf-8")
+
+
+async def _stored_update(source_key: str) -> Optional[SiteUpdate]:
+    async with get_sessionmaker()() as session:
+        result = await session.execute(select(SiteUpdate).where(SiteUpdate.source_key == source_key))
+        return result.scalar_one_or_none()
+
+
+async def _save_summary(payload: Dict[str, Any], source_key: str, note: Dict[str, Any]) -> None:
+    values = {
+        "source_key": source_key,
+        "sender_id": payload["sender_id"],
+        "log_date": site_today(),
+        "project_id": _uuid_or_none(payload.get("project_id")),
+        "task_id": _uuid_or_none(payload.get("task_id")),
+        "message_text": payload.get("text"),
+        "image_path": payload.get("image_path"),
+        "component": note.get("component"),
+        "highlight": note.get("highlight"),
+        "risk": note.get("risk"),
+        "summary": note.get("summary"),
+    }
+    stmt = pg_insert(SiteUpdate).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source_key"],
+        set_={key: stmt.excluded[key] for key in ("component", "highlight", "risk", "summary")},
+    ).returning(SiteUpdate.log_date, literal_column("(xmax = 0)").label("inserted"))
+    async with get_sessionmaker()() as session:
+        saved = (await session.execute(stmt)).one()
+        # Only the first write of an update counts towards the day's rollup.
+        if saved.inserted and values["project_id"] is not None:
+            await apply_rollup(session, values["project_id"], saved.log_date, RollupDelta(
+                updates=1,
+                photos=1 if payload.get("image_path") else 0,
+                task_id=payload.get("task_id"),
+                component=note.get("component"),
+                risk=note.get("risk"),
+                summary=note.get("summary"),
+            ))
+        await session.commit()
+
+
+async def _run_site_update(payload: Dict[str, Any]) -> None:
+    from agents.siteops_agent import summarise_update
+
+    source_key = payload.get("source_key") or f"{payload['sender_id']}:{payload.get('image_path') or payload.get('text')}"
+    stored = await _stored_update(source_key)
+    if stored is not None and stored.notified_at is not None:
+        print(f"site_updates ::::: run ::::: {source_key} already summarised and sent")
+        return
+
+    if stored is None or not stored.summary:
+        image_b64 = await asyncio.to_thread(_read_image_b64, payload.get("image_path"))
+        note = await asyncio.to_thread(summarise_update, payload.get("text") or "", image_b64) or {}
+        if not note.get("summary"):
+            raise RuntimeError("summariser returned no summary")
+        await _save_summary(payload, source_key, note)
+        summary = note["summary"]
+    else:
+        summary = stored.summary
+
+    # A retry after this point only re-sends; the summary is already stored.
+    await whatsapp_output_async(payload["sender_id"], summary, message_type="plain")
+    async with get_sessionmaker()() as session:
+        await session.execute(
+            update(SiteUpdate)
+            .where(SiteUpdate.source_key == source_key)
+            .values(notified_at=datetime.now(timezone.utc))
+        )
+        await session.commit()
+    print(f"site_updates ::::: run ::::: summary sent to {payload['sender_id']}")
+
+
+async def _site_update_dead_lettered(payload: Dict[str, Any], error: str) -> None:
+    print(f"site_updates ::::: dead letter ::::: {payload.get('source_key')} : {error}")
+    await whatsapp_output_async(payload["sender_id"], SITE_UPDATE_FAILED, message_type="plain")
+
+
+site_update_runner.register(SITE_UPDATE_JOB, _run_site_update, on_failure=_site_update_dead_lettered)
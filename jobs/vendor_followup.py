@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
+import os
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 from sqlalchemy import delete, select
@@ -17,10 +18,20 @@ from database.models import (
     VendorFollowupNudge,
 )
 from managers.vendor_followup import compute_next_due, NUDGE_SCHEDULE
-from whatsapp.builder_out import whatsapp_output
+from whatsapp.builder_out import whatsapp_output_async
 
+NUDGE_BATCH_SIZE = int(os.getenv("VENDOR_NUDGE_BATCH_SIZE", "50"))
+NUDGE_SEND_CONCURRENCY = int(os.getenv("VENDOR_NUDGE_CONCURRENCY", "5"))
+NUDGE_POLL_SECONDS = float(os.getenv("VENDOR_NUDGE_POLL_SECONDS", "60"))
+# A failed send leaves the stage as-is and retries after this delay instead of on the next claim.
+NUDGE_RETRY_DELAY = timedelta(minutes=5)
 
-async def _load_due_entries(session: AsyncSession, now: datetime) -> List[tuple]:
+
+async def _load_due_entries(session: AsyncSession, now: datetime, limit: int = NUDGE_BATCH_SIZE) -> List[tuple]:
+    """
+    Claim up to `limit` due nudges. Rows are locked FOR UPDATE SKIP LOCKED until the
+    caller commits, so concurrent runners (other workers / replicas) take disjoint batches.
+    """
     stmt = (
         select(
             VendorFollowupNudge,
@@ -38,6 +49,9 @@ async def _load_due_entries(session: AsyncSession, now: datetime) -> List[tuple]
         .join(Vendor, Vendor.vendor_id == VendorFollowupNudge.vendor_id)
         .outerjoin(Project, Project.id == MaterialRequest.project_id)
         .where(VendorFollowupNudge.next_nudge_at <= now)
+        .order_by(VendorFollowupNudge.next_nudge_at)
+        .limit(limit)
+        .with_for_update(of=VendorFollowupNudge, skip_locked=True)
     )
     result = await session.execute(stmt)
     return result.all()
@@ -74,7 +88,7 @@ async def _send_vendor_nudge(
         f"The supervisor for {location_text} has been waiting for your quote for about {elapsed_text}.\n"
         "Please share your quotation when you can—thanks!"
     )
-    whatsapp_output(vendor_phone, message, message_type="plain")
+    await whatsapp_output_async(vendor_phone, message, message_type="plain")
 
 
 async def _notify_supervisor(
@@ -94,37 +108,33 @@ async def _notify_supervisor(
         f"FYI, we nudged {vendor_label} again for order {short_id} ({location_text}).\n"
         "We’ll notify you as soon as their quote comes in."
     )
-    whatsapp_output(supervisor_phone, message, message_type="plain")
+    await whatsapp_output_async(supervisor_phone, message, message_type="plain")
 
 
-async def process_vendor_nudges(now: Optional[datetime] = None) -> None:
+async def _process_entry(
+    entry: tuple,
+    now: datetime,
+    semaphore: asyncio.Semaphore,
+) -> bool:
     """
-    Scan for pending vendor follow-up nudges and dispatch reminders
-    to both the vendor and the requesting supervisor.
+    Send any overdue stages for one claimed nudge and advance it in place.
+    Returns True when the row is finished and should be deleted.
     """
-    now = (now or datetime.utcnow()).replace(tzinfo=timezone.utc)
-    session_factory = get_sessionmaker()
-
-    async with session_factory() as session:
-        entries = await _load_due_entries(session, now)
-        if not entries:
-            return
-
-        to_delete = []
-        for nudge, qr, request, vendor, project in entries:
-            # Skip if vendor already responded or is no longer active
-            if qr.status not in (
-                QuoteRequestVendorStatus.INVITED,
-                QuoteRequestVendorStatus.NOTIFIED,
-            ):
-                to_delete.append((nudge.quote_request_id, nudge.vendor_id))
-                continue
-
-            # Send nudges for any overdue stages
-            while (
-                nudge.nudge_stage < len(NUDGE_SCHEDULE)
-                and nudge.next_nudge_at <= now
-            ):
+    nudge, qr, request, vendor, project = entry
+    # Skip if vendor already responded or is no longer active
+    if qr.status not in (
+        QuoteRequestVendorStatus.INVITED,
+        QuoteRequestVendorStatus.NOTIFIED,
+    ):
+        return True
+
+    async with semaphore:
+        # Send nudges for any overdue stages
+        while (
+            nudge.nudge_stage < len(NUDGE_SCHEDULE)
+            and nudge.next_nudge_at <= now
+        ):
+            try:
                 await _send_vendor_nudge(
                     vendor_phone=vendor.phone_number,
                     vendor_name=vendor.name,
@@ -141,31 +151,95 @@ async def process_vendor_nudges(now: Optional[datetime] = None) -> None:
                     project_name=getattr(project, "name", None),
                     delivery_location=request.delivery_location,
                 )
-
-                nudge.nudge_stage += 1
-                nudge.last_nudged_at = now
-                next_due = compute_next_due(nudge.invited_at, nudge.nudge_stage)
-                if next_due is None:
-                    to_delete.append((nudge.quote_request_id, nudge.vendor_id))
-                    break
-                nudge.next_nudge_at = next_due
+            except Exception as e:
+                print(f"vendor_followup ::::: send failed for request {request.id} vendor {vendor.vendor_id} : {e}")
+                nudge.next_nudge_at = now + NUDGE_RETRY_DELAY
                 nudge.updated_at = now
+                return False
+
+            nudge.nudge_stage += 1
+            nudge.last_nudged_at = now
+            next_due = compute_next_due(nudge.invited_at, nudge.nudge_stage)
+            if next_due is None:
+                return True
+            nudge.next_nudge_at = next_due
+            nudge.updated_at = now
+
+    return nudge.nudge_stage >= len(NUDGE_SCHEDULE)
 
-            if (
-                nudge.nudge_stage < len(NUDGE_SCHEDULE)
-                and (nudge.quote_request_id, nudge.vendor_id) not in to_delete
-            ):
-                session.add(nudge)
-
-        for req_id, vendor_id in to_delete:
-            await session.execute(
-                delete(VendorFollowupNudge).where(
-                    VendorFollowupNudge.quote_request_id == req_id,
-                    VendorFollowupNudge.vendor_id == vendor_id,
-                )
-            )
 
-        await session.commit()
+async def _process_batch(
+    session: AsyncSession,
+    now: datetime,
+    semaphore: asyncio.Semaphore,
+    batch_size: int,
+) -> int:
+    """Claim, send and commit one batch; returns the number of rows claimed."""
+    entries = await _load_due_entries(session, now, batch_size)
+    if not entries:
+        await session.rollback()
+        return 0
+
+    finished = await asyncio.gather(
+        *(_process_entry(entry, now, semaphore) for entry in entries)
+    )
+    done_ids = [entry[0].id for entry, is_done in zip(entries, finished) if is_done]
+    if done_ids:
+        await session.execute(
+            delete(VendorFollowupNudge).where(VendorFollowupNudge.id.in_(done_ids))
+        )
+    # Advanced stages are flushed from the tracked (locked) nudge rows; committing releases the claim.
+    await session.commit()
+    return len(entries)
+
+
+async def process_vendor_nudges(
+    now: Optional[datetime] = None,
+    *,
+    batch_size: int = NUDGE_BATCH_SIZE,
+) -> int:
+    """
+    Drain due vendor follow-up nudges in claimed batches, dispatching reminders
+    to both the vendor and the requesting supervisor. Each batch commits on its own,
+    so a failure only loses the batch in flight. Returns the number of rows processed.
+    """
+    fixed_now = now.replace(tzinfo=timezone.utc) if now else None
+    session_factory = get_sessionmaker()
+    semaphore = asyncio.Semaphore(NUDGE_SEND_CONCURRENCY)
+
+    processed = 0
+    while True:
+        batch_now = fixed_now or datetime.utcnow().replace(tzinfo=timezone.utc)
+        async with session_factory() as session:
+            try:
+                claimed = await _process_batch(session, batch_now, semaphore, batch_size)
+            except Exception:
+                await session.rollback()
+                raise
+        processed += claimed
+        if claimed < batch_size:
+            return processed
+
+
+async def run_vendor_followup_scheduler(
+    stop_event: Optional[asyncio.Event] = None,
+    poll_seconds: float = NUDGE_POLL_SECONDS,
+) -> None:
+    """In-process scheduler: drain due nudges, then sleep until the next poll (or stop)."""
+    stop_event = stop_event or asyncio.Event()
+    print(f"vendor_followup ::::: scheduler started (poll every {poll_seconds}s)")
+    while not stop_event.is_set():
+        try:
+            processed = await process_vendor_nudges()
+            if processed:
+                print(f"vendor_followup ::::: processed {processed} nudges")
+        except Exception as e:
+            print(f"vendor_followup ::::: scheduler run failed : {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+    print("vendor_followup ::::: scheduler stopped")
 
 
 async def main() -> None:
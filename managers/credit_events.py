@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set
+
+log = logging.getLogger("uvicorn.error")
+
+CreditEventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# CreditProfile columns whose change can flip what the applicant should be told.
+STATUS_FIELDS = frozenset({"status", "limit", "used", "partner_status", "partner_limit_suggested"})
+
+
+class CreditStatusBus:
+    """
+    In-process status-change events for credit profiles.
+
+    CreditCRUD publishes the fresh profile snapshot after committing a write that touches
+    STATUS_FIELDS (set_final_limit, upsert_partner_snapshot, upsert_profile, ...). Listeners
+    run as background tasks so a slow WhatsApp send never holds up the writer.
+    Events only reach listeners in the process that made the write; a listener that must act
+    once across workers claims shared state first (the approval watch uses scheduler.claim).
+    """
+
+    def __init__(self) -> None:
+        self._listeners: Dict[str, CreditEventHandler] = {}
+        self._inflight: Set[asyncio.Task] = set()
+
+    def listen(self, name: str, handler: CreditEventHandler) -> None:
+        """Register (or replace) a named listener; call at import time."""
+        self._listeners[name] = handler
+
+    @staticmethod
+    def touches_status(fields: Iterable[str]) -> bool:
+        return any(field in STATUS_FIELDS for field in fields)
+
+    def publish(self, snapshot: Dict[str, Any]) -> None:
+        for name, handler in list(self._listeners.items()):
+            task = asyncio.create_task(self._dispatch(name, handler, snapshot))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    @staticmethod
+    async def _dispatch(name: str, handler: CreditEventHandler, snapshot: Dict[str, Any]) -> None:
+        try:
+            await handler(snapshot)
+        except Exception:
+            log.exception("credit_events: listener %s failed for sender %s", name, snapshot.get("sender_id"))
+
+
+credit_events = CreditStatusBus()
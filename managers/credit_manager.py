@@ -2,8 +2,6 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
-import asyncio
-import random
 from managers.trust_module import BabaiTrustModule
 import managers.credit_manager 
 from database.credit_crud import CreditCRUD
@@ -42,35 +40,6 @@ class CreditManager:
         # Optional dependencies you can inject later:
         self.partner_client = None # e.g., NBFCClient()
 
-    # ──────────────────────────────────────────────────────────────────────
-    # Public polling API: always returns a dict snapshot
-    # ──────────────────────────────────────────────────────────────────────
-    async def poll_until_approved(
-        self,
-        sender_id: str,
-        max_wait_seconds: int = 300,    # 5 minutes
-        interval_seconds: int = 20,     # poll ~ every 20s
-        jitter_seconds: int = 5,
-    ) -> Dict[str, Any]:
-        """
-        Poll partner/DB until status == 'approved' or timeout.
-        Always returns the latest status snapshot as a dict.
-        """
-        print("Credit Agent:::: polling until approved for sender_id:", sender_id)
-        waited = 0
-        while waited < max_wait_seconds:
-            status = await self.check_status(sender_id)
-            if status and status.get("status") == "approved":
-                return status
-
-            sleep_for = interval_seconds + random.randint(0, jitter_seconds)
-            await asyncio.sleep(sleep_for)
-            waited += sleep_for
-            print(f"Credit Agent:::: still waiting for approval... {waited}/{max_wait_seconds} seconds")
-
-        print("Credit Agent:::: polling timed out, returning last known status")
-        return await self.check_status(sender_id) or {"status": "pending", "sender_id": sender_id}
-
     # ──────────────────────────────────────────────────────────────────────
     # Profile snapshot helpers (always return plain dicts)
     # ──────────────────────────────────────────────────────────────────────
@@ -0,0 +1,145 @@
+"""
+Micro-lesson library: generated lessons keyed by normalised topic and language.
+
+Builders ask about the same few topics (curing, waterproofing, rebar cover) again and again,
+so a lesson is generated once, stored in `micro_lessons`, and served from an in-process LRU
+in front of the table. Concurrent requests for a lesson that isn't stored yet share one
+generation instead of each calling the LLM. Lessons past LESSON_REFRESH_DAYS are re-read
+from the table (a refresh may have landed from another replica) and otherwise served as-is;
+get() flags them stale so the caller can queue a background refresh (jobs/lesson_refresh.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db import get_sessionmaker
+from database.models import MicroLesson
+
+LESSON_REFRESH_DAYS = float(os.getenv("LESSON_REFRESH_DAYS", "30"))
+LESSON_CACHE_SIZE = 512
+
+# Words that change the phrasing of a request but not the lesson it needs.
+_FILLER_WORDS = frozenset({
+    "a", "an", "the", "of", "in", "on", "for", "about", "to", "and", "please", "explain", "tell", "me",
+    "what", "is", "are", "how", "do", "does", "why", "learn", "more", "basics", "basic", "tips", "guide",
+})
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+LessonGenerator = Callable[[str, str], Awaitable[str]]
+
+
+def normalise_topic(topic: str) -> str:
+    """'Tips for Curing of concrete!' and 'curing concrete' map to the same key."""
+    words = [word for word in _NON_WORD.sub(" ", (topic or "").lower()).split() if word not in _FILLER_WORDS]
+    return " ".join(words) or "construction"
+
+
+@dataclass
+class Lesson:
+    topic: str
+    language: str
+    content: str
+    refresh_after: datetime
+
+    @property
+    def stale(self) -> bool:
+        return datetime.now(timezone.utc) >= self.refresh_after
+
+
+class LessonLibrary:
+    def __init__(self, size: int = LESSON_CACHE_SIZE):
+        self._size = size
+        self._memory: "OrderedDict[Tuple[str, str], Lesson]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def _remember(self, key: Tuple[str, str], lesson: Lesson) -> None:
+        self._memory[key] = lesson
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._size:
+            self._memory.popitem(last=False)
+
+    async def _load(self, key: Tuple[str, str]) -> Optional[Lesson]:
+        async with get_sessionmaker()() as session:
+            row = (
+                await session.execute(
+                    select(MicroLesson).where(MicroLesson.topic_key == key[0], MicroLesson.language == key[1])
+                )
+            ).scalar_one_or_none()
+        if row is None:
+            return None
+        return Lesson(topic=row.topic, language=row.language, content=row.content, refresh_after=row.refresh_after)
+
+    async def store(self, topic: str, language: str, content: str) -> Lesson:
+        """Insert or replace a lesson (used by lazy fills, refreshes and pre-generation)."""
+        key = (normalise_topic(topic), language)
+        now = datetime.now(timezone.utc)
+        refresh_after = now + timedelta(days=LESSON_REFRESH_DAYS)
+        stmt = pg_insert(MicroLesson).values(
+            topic_key=key[0], language=language, topic=topic, content=content,
+            generated_at=now, refresh_after=refresh_after,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["topic_key", "language"],
+            set_={"content": stmt.excluded.content, "generated_at": now, "refresh_after": refresh_after},
+        )
+        async with get_sessionmaker()() as session:
+            await session.execute(stmt)
+            await session.commit()
+        lesson = Lesson(topic=topic, language=language, content=content, refresh_after=refresh_after)
+        self._remember(key, lesson)
+        return lesson
+
+    async def has(self, topic: str, language: str) -> bool:
+        key = (normalise_topic(topic), language)
+        return key in self._memory or await self._load(key) is not None
+
+    async def get(self, topic: str, language: str, generate: LessonGenerator) -> Tuple[str, bool]:
+        """
+        (lesson text, stale). Memory, then the table, then one shared `generate(topic, language)`
+        call for everyone waiting on the same key. Generation errors propagate and nothing is stored.
+        """
+        key = (normalise_topic(topic), language)
+        lesson = self._memory.get(key)
+        if lesson is not None and not lesson.stale:
+            self._memory.move_to_end(key)
+            return lesson.content, False
+        # A stale copy is re-read from the table first: another replica may have refreshed it.
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            lesson = await asyncio.shield(pending)
+            return lesson.content, lesson.stale
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            lesson = await self._load(key)
+            if lesson is not None:
+                self._remember(key, lesson)
+            else:
+                print(f"lesson_library ::::: get ::::: generating '{key[0]}' ({language})")
+                lesson = await self.store(topic, language, await generate(topic, language))
+            future.set_result(lesson)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a failure nobody else awaited doesn't log "never retrieved".
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        return lesson.content, lesson.stale
+
+
+lesson_library = LessonLibrary()
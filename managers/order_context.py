@@ -1,23 +1,30 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import copy
+import re
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import case, delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.db import get_sessionmaker
 from database.models import (
     MaterialRequest,
     MaterialRequestItem,
+    OrderContextVersion,
+    OrderSearchTerm,
+    OrderSummaryRecord,
     Project,
     QuoteRequestVendor,
     QuoteRequestVendorStatus,
     RequestStatus,
     Vendor,
-    VendorQuoteItem,
 )
 
 
@@ -53,60 +60,329 @@ class OrderSummary:
         return data
 
 
+LIFECYCLES = ("draft", "active", "fulfilled")
+# get_order_by_vendor preference when several orders match the same vendor.
+LIFECYCLE_PRIORITY = {"active": 0, "fulfilled": 1, "draft": 2}
+ORDER_CONTEXT_CACHE_SIZE = 256
+
+# (sender_id, limit) -> (sender version, buckets). Validated against order_context_versions on
+# every read, so a write from any worker invalidates it; only the LRU bound lives in-process.
+_context_cache: "OrderedDict[Tuple[str, int], Tuple[int, Dict[str, List[Dict[str, Any]]]]]" = OrderedDict()
+
+
+def _empty_buckets() -> Dict[str, List[Dict[str, Any]]]:
+    return {lifecycle: [] for lifecycle in LIFECYCLES}
+
+
+# Posting weights mirror the old per-order substring scoring: id > vendor > category > material > status/date.
+SEARCH_WEIGHTS = {"id": 5, "vendor": 4, "category": 3, "material": 2, "delivered": 2, "status": 1, "date": 1}
+SEARCH_STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "by", "did", "do", "for", "from", "has", "have", "i", "in",
+    "is", "it", "me", "my", "of", "on", "order", "orders", "our", "the", "to", "was", "what", "when",
+    "where", "which", "with",
+}
+SEARCH_POSTING_BATCH = 2000
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def search_tokens(text: Optional[str]) -> List[str]:
+    """Lowercased word tokens used on both sides of the order search index."""
+    seen: Dict[str, None] = {}
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if len(token) <= 1 or token in SEARCH_STOPWORDS:
+            continue
+        # Cheap plural folding so "steels" and "steel" share a posting.
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[-2].isdigit():
+            token = token[:-1]
+        seen.setdefault(token, None)
+    return list(seen)
+
+
 class OrderContextService:
     """
     Aggregates procurement requests for a sender into lifecycle buckets.
+
+    Reads are served from the order_summaries read model (one row per request, refreshed by
+    ProcurementCRUD whenever a request, its items or its vendor invites change), so "My Orders"
+    costs a version lookup plus one page of rows instead of re-summarising the whole history.
     """
 
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def get_orders_for_sender(self, sender_id: str, *, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        version = await self._ensure_projected(sender_id)
+        key = (sender_id, limit)
+        cached = _context_cache.get(key)
+        if cached and cached[0] == version:
+            _context_cache.move_to_end(key)
+            return copy.deepcopy(cached[1])
+
+        stmt = (
+            select(OrderSummaryRecord.lifecycle, OrderSummaryRecord.payload)
+            .where(OrderSummaryRecord.sender_id == sender_id)
+            .order_by(OrderSummaryRecord.sort_at.desc(), OrderSummaryRecord.request_id.desc())
+            .limit(limit)
+        )
+        buckets = _empty_buckets()
+        for lifecycle, payload in (await self.session.execute(stmt)).all():
+            buckets.setdefault(lifecycle, []).append(payload)
+
+        _context_cache[key] = (version, buckets)
+        _context_cache.move_to_end(key)
+        while len(_context_cache) > ORDER_CONTEXT_CACHE_SIZE:
+            _context_cache.popitem(last=False)
+        return copy.deepcopy(buckets)
+
+    async def get_order_page(
+        self,
+        sender_id: str,
+        *,
+        lifecycle: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Keyset page of order summaries, newest first. Pass the returned next_cursor back to
+        continue; each page is an index range scan regardless of how long the history is.
+        """
+        await self._ensure_projected(sender_id)
+        stmt = select(OrderSummaryRecord.sort_at, OrderSummaryRecord.request_id, OrderSummaryRecord.payload).where(
+            OrderSummaryRecord.sender_id == sender_id
+        )
+        if lifecycle:
+            stmt = stmt.where(OrderSummaryRecord.lifecycle == lifecycle)
+        if cursor:
+            sort_at, request_id = self._decode_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(OrderSummaryRecord.sort_at, OrderSummaryRecord.request_id) < tuple_(sort_at, request_id)
+            )
+        stmt = stmt.order_by(OrderSummaryRecord.sort_at.desc(), OrderSummaryRecord.request_id.desc()).limit(limit + 1)
+
+        rows = (await self.session.execute(stmt)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_sort_at, last_request_id, _ = rows[-1]
+            next_cursor = f"{last_sort_at.isoformat()}|{last_request_id}"
+        return {"orders": [payload for _, _, payload in rows], "next_cursor": next_cursor}
+
+    async def get_order_by_vendor(self, sender_id: str, vendor_identifier: str) -> Optional[Dict[str, Any]]:
+        needle = vendor_identifier.strip().lower()
+        if not needle:
+            return None
+
+        await self._ensure_projected(sender_id)
+        stmt = (
+            select(OrderSummaryRecord.payload)
+            .where(
+                OrderSummaryRecord.sender_id == sender_id,
+                OrderSummaryRecord.vendor_keys.contains(needle, autoescape=True),
+            )
+            .order_by(
+                case(LIFECYCLE_PRIORITY, value=OrderSummaryRecord.lifecycle, else_=len(LIFECYCLE_PRIORITY)),
+                OrderSummaryRecord.sort_at.desc(),
+            )
+            .limit(1)
+        )
+        return (await self.session.execute(stmt)).scalar_one_or_none()
+
+    async def search_orders(self, sender_id: str, query: str, *, limit: int = 5) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Ranked lookup over the sender's order_search_terms postings, e.g.
+        "where is my steel from Sri Balaji" -> [(score, order summary), ...], best first.
+        Ties go to active orders, then the most recently updated.
+        """
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+
+        await self._ensure_projected(sender_id)
+        score = func.sum(OrderSearchTerm.weight).label("score")
+        ranked = (
+            select(OrderSearchTerm.request_id, score)
+            .where(OrderSearchTerm.sender_id == sender_id, OrderSearchTerm.term.in_(tokens))
+            .group_by(OrderSearchTerm.request_id)
+            .subquery()
+        )
+        stmt = (
+            select(ranked.c.score, OrderSummaryRecord.payload)
+            .join(OrderSummaryRecord, OrderSummaryRecord.request_id == ranked.c.request_id)
+            .order_by(
+                ranked.c.score.desc(),
+                case(LIFECYCLE_PRIORITY, value=OrderSummaryRecord.lifecycle, else_=len(LIFECYCLE_PRIORITY)),
+                OrderSummaryRecord.sort_at.desc(),
+            )
+            .limit(limit)
+        )
+        return [(int(row_score), payload) for row_score, payload in (await self.session.execute(stmt)).all()]
+
+    async def refresh_orders(self, request_ids: Iterable[Any]) -> None:
+        """
+        Re-project the given requests into order_summaries and bump their senders' versions.
+        Runs inside the caller's transaction; the caller commits.
+        """
+        ids = {UUID(str(request_id)) for request_id in request_ids if request_id}
+        if not ids:
+            return
+        stmt = (
+            select(MaterialRequest)
+            .where(MaterialRequest.id.in_(ids))
+            .options(
+                selectinload(MaterialRequest.project),
+                selectinload(MaterialRequest.items),
+            )
+            # Status transitions are bulk UPDATEs; don't summarise stale identity-map copies.
+            .execution_options(populate_existing=True)
+        )
+        requests = (await self.session.execute(stmt)).scalars().unique().all()
+        await self._store_summaries(requests)
+
+    async def rebuild_sender(self, sender_id: str) -> int:
+        """
+        Project a sender's whole history (first access / manual repair); returns the new version.
+        Runs in its own session and transaction so read paths never commit the caller's session.
+        """
         stmt = (
             select(MaterialRequest)
             .where(MaterialRequest.sender_id == sender_id)
             .options(
                 selectinload(MaterialRequest.project),
                 selectinload(MaterialRequest.items),
-                selectinload(MaterialRequest.vendor_quote_items).selectinload(VendorQuoteItem.vendor),
             )
-            .order_by(MaterialRequest.updated_at.desc())
-            .limit(limit)
         )
+        async with get_sessionmaker()() as session:
+            projector = OrderContextService(session)
+            requests = (await session.execute(stmt)).scalars().unique().all()
+            await projector._store_summaries(requests)
+            versions = await projector._bump_versions({sender_id})
+            await session.commit()
+        return versions[sender_id]
+
+    async def _ensure_projected(self, sender_id: str) -> int:
+        version = (
+            await self.session.execute(
+                select(OrderContextVersion.version).where(OrderContextVersion.sender_id == sender_id)
+            )
+        ).scalar_one_or_none()
+        if version is None:
+            version = await self.rebuild_sender(sender_id)
+        return version
 
-        result = await self.session.execute(stmt)
-        requests = result.scalars().unique().all()
+    async def _store_summaries(self, requests: List[MaterialRequest]) -> None:
         if not requests:
-            return {"draft": [], "active": [], "fulfilled": []}
+            return
 
         request_ids = [req.id for req in requests]
         invites = await self._load_quote_requests(request_ids)
         vendor_map = await self._load_vendors(requests, invites)
         invites_by_request = self._group_invites_by_request(invites)
 
-        buckets: Dict[str, List[Dict[str, Any]]] = {"draft": [], "active": [], "fulfilled": []}
+        rows: List[Dict[str, Any]] = []
+        postings: List[Dict[str, Any]] = []
         for req in requests:
             lifecycle = self._determine_lifecycle(req)
             summary = self._summarize_request(req, lifecycle, vendor_map, invites_by_request.get(req.id, []))
-            buckets[lifecycle].append(summary.to_dict())
-
-        return buckets
-
-    async def get_order_by_vendor(self, sender_id: str, vendor_identifier: str) -> Optional[Dict[str, Any]]:
-        orders = await self.get_orders_for_sender(sender_id)
-        needle = vendor_identifier.strip().lower()
+            postings.extend(self._search_postings(req, summary))
+            rows.append(
+                {
+                    "request_id": req.id,
+                    "sender_id": req.sender_id,
+                    "lifecycle": lifecycle,
+                    "sort_at": req.updated_at or req.created_at or datetime.utcnow(),
+                    "vendor_keys": self._vendor_keys(summary),
+                    "payload": summary.to_dict(),
+                    "version": 1,
+                }
+            )
 
-        for lifecycle in ("active", "fulfilled", "draft"):
-            for record in orders[lifecycle]:
-                approved = record.get("approved_vendor")
-                if approved and self._matches_vendor(approved, needle):
-                    return record
+        stmt = pg_insert(OrderSummaryRecord).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OrderSummaryRecord.request_id],
+            set_={
+                "sender_id": excluded.sender_id,
+                "lifecycle": excluded.lifecycle,
+                "sort_at": excluded.sort_at,
+                "vendor_keys": excluded.vendor_keys,
+                "payload": excluded.payload,
+                "version": OrderSummaryRecord.version + 1,
+                "refreshed_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+
+        await self.session.execute(delete(OrderSearchTerm).where(OrderSearchTerm.request_id.in_(request_ids)))
+        # Chunked to stay under the bind-parameter limit when a whole history is (re)projected.
+        for start in range(0, len(postings), SEARCH_POSTING_BATCH):
+            chunk = postings[start:start + SEARCH_POSTING_BATCH]
+            await self.session.execute(pg_insert(OrderSearchTerm).values(chunk).on_conflict_do_nothing())
+        await self._bump_versions({req.sender_id for req in requests})
+
+    async def _bump_versions(self, sender_ids: Iterable[str]) -> Dict[str, int]:
+        senders = sorted({sender_id for sender_id in sender_ids if sender_id})
+        if not senders:
+            return {}
+        stmt = pg_insert(OrderContextVersion).values([{"sender_id": s, "version": 1} for s in senders])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OrderContextVersion.sender_id],
+            set_={"version": OrderContextVersion.version + 1, "updated_at": func.now()},
+        ).returning(OrderContextVersion.sender_id, OrderContextVersion.version)
+        return {sender_id: version for sender_id, version in (await self.session.execute(stmt)).all()}
+
+    def _search_postings(self, req: MaterialRequest, summary: OrderSummary) -> List[Dict[str, Any]]:
+        """order_search_terms rows for one request; the highest weight wins per (kind, term)."""
+        terms: Dict[Tuple[str, str], int] = {}
+
+        def add(kind: str, text: Optional[str], weight_kind: Optional[str] = None) -> None:
+            for token in search_tokens(text):
+                key = (kind, token)
+                terms[key] = max(terms.get(key, 0), SEARCH_WEIGHTS[weight_kind or kind])
+
+        add("id", summary.request_id.split("-", 1)[0])
+        vendors = list(summary.vendors)
+        if summary.approved_vendor is not None:
+            vendors.append(summary.approved_vendor)
+        for vendor in vendors:
+            add("vendor", vendor.name)
+        for category in summary.vendor_categories:
+            add("category", category)
+        # All item names, not just the sample shown in the summary.
+        for item in req.items:
+            add("material", self._clean_material_name(item))
+        add("status", f"{summary.status} {summary.lifecycle}")
+        if summary.delivered_at:
+            add("status", "delivered arrived", "delivered")
+        created = req.created_at or req.updated_at
+        if created:
+            # Date buckets: month name (full and short) and year, e.g. "january jan 2025".
+            add("date", created.strftime("%B %b %Y"))
+
+        return [
+            {"request_id": req.id, "kind": kind, "term": term, "sender_id": req.sender_id, "weight": weight}
+            for (kind, term), weight in terms.items()
+        ]
 
-                for vendor in record.get("vendors", []):
-                    if self._matches_vendor(vendor, needle):
-                        return record
+    @staticmethod
+    def _vendor_keys(summary: OrderSummary) -> str:
+        vendors = list(summary.vendors)
+        if summary.approved_vendor is not None:
+            vendors.append(summary.approved_vendor)
+        parts: List[str] = []
+        for vendor in vendors:
+            parts.append(vendor.vendor_id.lower())
+            if vendor.name:
+                parts.append(vendor.name.lower())
+        # Newline-separated so a needle can't match across two vendors.
+        return "\n".join(parts)
 
-        return None
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+        try:
+            sort_at, request_id = cursor.split("|", 1)
+            return datetime.fromisoformat(sort_at), UUID(request_id)
+        except ValueError as exc:
+            raise ValueError(f"Invalid order cursor: {cursor!r}") from exc
 
     def _summarize_request(
         self,
@@ -235,12 +511,6 @@ class OrderContextService:
             categories=categories,
         )
 
-    @staticmethod
-    def _matches_vendor(vendor: Dict[str, Any], needle: str) -> bool:
-        vendor_id = vendor.get("vendor_id", "")
-        vendor_name = vendor.get("name") or ""
-        return needle in vendor_id.lower() or needle in vendor_name.lower()
-
     @staticmethod
     def _iso_dt(value: Optional[datetime]) -> Optional[str]:
         if not value:
@@ -0,0 +1,220 @@
+"""
+Plan ingestion for uploaded PDFs.
+
+Architectural sets run to hundreds of pages, of which only a few are floor plans. Instead of
+reading the whole PDF on the event loop and carrying its text in conversation state, the
+upload is streamed to disk and its pages are extracted in a process pool in fixed-size
+ranges. Each page's text is written next to the PDF and scored for floor-plan signals (room
+labels, dimension strings, BHK/carpet-area wording; elevations, sections and schedules count
+against). State only holds a small manifest; process_plan_file reads back the best pages, or
+rasterises them when the drawing carries too little text to go on.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+PLAN_INGEST_PROCESSES = int(os.getenv("PLAN_INGEST_PROCESSES", "2"))
+PLAN_PAGES_PER_CHUNK = int(os.getenv("PLAN_PAGES_PER_CHUNK", "16"))
+PLAN_MAX_PAGES = int(os.getenv("PLAN_MAX_PAGES", "400"))
+PLAN_SELECTED_PAGES = 4                 # pages handed to the model at most
+PLAN_TEXT_CHAR_BUDGET = 24000           # total characters of page text per prompt
+PLAN_MIN_TEXT_SCORE = 4.0               # below this the text alone is not a usable plan
+PLAN_RENDER_DPI = int(os.getenv("PLAN_RENDER_DPI", "110"))
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+ROOM_LABELS = (
+    "bed", "m.bed", "master bed", "bedroom", "kitchen", "kit", "toilet", "bath", "wc", "living",
+    "dining", "hall", "drawing", "balcony", "sit out", "sitout", "utility", "pooja", "foyer",
+    "lobby", "dress", "store",
+)
+PLAN_WORDS = ("floor plan", "typical floor", "unit plan", "flat plan", "bhk", "carpet area", "sft", "sqft", "sq.ft", "furniture layout")
+NON_PLAN_WORDS = (
+    "elevation", "section", "specification", "schedule", "footing", "column", "beam", "reinforcement",
+    "bar bending", "site plan", "location plan", "index", "contents", "drawing list", "notes",
+)
+
+_ROOM_PATTERN = re.compile(r"\b(" + "|".join(re.escape(label) for label in ROOM_LABELS) + r")\b")
+_DIMENSION_PATTERN = re.compile(r"\d{1,2}\s*'\s*-?\s*\d{0,2}\s*\"?\s*[x×X]\s*\d{1,2}\s*'|\d{3,5}\s*[x×X]\s*\d{3,5}")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, PLAN_INGEST_PROCESSES))
+    return _executor
+
+
+def shutdown_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def score_plan_page(text: str) -> float:
+    """How much a page's text looks like a floor plan; <= 0 means it almost certainly isn't."""
+    lowered = (text or "").lower()
+    if not lowered.strip():
+        return 0.0
+    rooms = len(_ROOM_PATTERN.findall(lowered))
+    dimensions = len(_DIMENSION_PATTERN.findall(text))
+    plan_words = sum(lowered.count(word) for word in PLAN_WORDS)
+    non_plan = sum(lowered.count(word) for word in NON_PLAN_WORDS)
+    return rooms + 1.5 * min(dimensions, 40) + 3 * plan_words - 2 * non_plan
+
+
+# ---------------------------------------------------------------- worker side
+# These run in the process pool and must stay module-level (picklable).
+
+def _page_count(pdf_path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def _extract_range(pdf_path: str, text_dir: str, start: int, stop: int) -> List[Dict[str, Any]]:
+    import pymupdf
+
+    pages = []
+    with pymupdf.open(pdf_path) as doc:
+        for index in range(start, min(stop, doc.page_count)):
+            page = doc.load_page(index)
+            text = page.get_text()
+            text_path = Path(text_dir) / f"page_{index + 1:04d}.txt"
+            text_path.write_text(text, encoding="utf-8")
+            score = round(score_plan_page(text), 2)
+            pages.append({
+                "page": index + 1,
+                "chars": len(text),
+                # Only the no-text fallback ranks by drawings; counting paths on dense CAD sheets
+                # costs more than the text extraction, so scored pages skip it.
+                "drawings": len(page.get_cdrawings()) if score <= 0 else 0,
+                "score": score,
+            })
+    return pages
+
+
+def _render_pages(pdf_path: str, pages: List[int], dpi: int) -> List[str]:
+    import pymupdf
+
+    images = []
+    with pymupdf.open(pdf_path) as doc:
+        for number in pages:
+            pixmap = doc.load_page(number - 1).get_pixmap(dpi=dpi)
+            images.append(base64.b64encode(pixmap.tobytes("png")).decode("utf-8"))
+    return images
+
+
+# ---------------------------------------------------------------- loop side
+
+def _stream_to_file(url: str, path: Path, headers: Optional[Dict[str, str]]) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(path.suffix + ".part")
+    size = 0
+    with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        with open(partial, "wb") as fp:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if chunk:
+                    fp.write(chunk)
+                    size += len(chunk)
+    os.replace(partial, path)
+    return size
+
+
+async def download_to_file(url: str, path: Path, headers: Optional[Dict[str, str]] = None) -> int:
+    """Stream a media download to `path` off the event loop; returns the byte count."""
+    return await asyncio.to_thread(_stream_to_file, url, Path(path), headers)
+
+
+async def ingest_plan_pdf(pdf_path: str) -> Dict[str, Any]:
+    """
+    Extract and score every page of `pdf_path` in the process pool. Page text lands in a
+    `<name>_pages/` directory beside the PDF along with manifest.json; the returned summary
+    (paths, page count, best plan pages) is what goes into conversation state.
+    """
+    pdf = Path(pdf_path)
+    text_dir = pdf.with_name(f"{pdf.stem}_pages")
+    text_dir.mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+
+    page_count = await loop.run_in_executor(_pool(), _page_count, str(pdf))
+    limit = min(page_count, PLAN_MAX_PAGES)
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(_pool(), _extract_range, str(pdf), str(text_dir), start, start + PLAN_PAGES_PER_CHUNK)
+        for start in range(0, limit, PLAN_PAGES_PER_CHUNK)
+    ))
+    pages = [page for chunk in chunks for page in chunk]
+
+    ranked = sorted(pages, key=lambda p: p["score"], reverse=True)
+    plan_pages = [p["page"] for p in ranked if p["score"] > 0][:PLAN_SELECTED_PAGES]
+    if not plan_pages:
+        # Scanned or vector-only sets: fall back to the most drawing-heavy pages.
+        by_drawings = sorted(pages, key=lambda p: p["drawings"], reverse=True)
+        plan_pages = [p["page"] for p in by_drawings if p["drawings"]][:PLAN_SELECTED_PAGES] or [1]
+
+    manifest = {
+        "pdf_path": str(pdf),
+        "text_dir": str(text_dir),
+        "page_count": page_count,
+        "pages_read": limit,
+        "plan_pages": plan_pages,
+        "pages": pages,
+    }
+    manifest_path = text_dir / "manifest.json"
+    await asyncio.to_thread(manifest_path.write_text, json.dumps(manifest), "utf-8")
+    best_score = max((p["score"] for p in pages if p["page"] in plan_pages), default=0.0)
+    print(f"plan_ingest ::::: ingest_plan_pdf ::::: {pdf.name}: {page_count} pages, plan pages {plan_pages} (best score {best_score})")
+    return {
+        "pdf_path": str(pdf),
+        "manifest_path": str(manifest_path),
+        "page_count": page_count,
+        "plan_pages": plan_pages,
+        "best_score": best_score,
+    }
+
+
+def _read_page_texts(summary: Dict[str, Any]) -> List[Tuple[int, str]]:
+    text_dir = Path(summary["manifest_path"]).parent
+    texts, budget = [], PLAN_TEXT_CHAR_BUDGET
+    for number in summary.get("plan_pages") or []:
+        if budget <= 0:
+            break
+        path = text_dir / f"page_{number:04d}.txt"
+        if not path.exists():
+            continue
+        text = path.read_text(encoding="utf-8")[:budget]
+        budget -= len(text)
+        texts.append((number, text))
+    return texts
+
+
+async def plan_page_content(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What to show the model for an ingested plan: {"text": "..."} built from the selected
+    pages when they carry a readable plan, otherwise {"images": [base64 png, ...]}.
+    """
+    if summary.get("best_score", 0.0) >= PLAN_MIN_TEXT_SCORE:
+        texts = await asyncio.to_thread(_read_page_texts, summary)
+        if texts:
+            return {
+                "text": "\n\n".join(f"--- Page {number} of {summary['page_count']} ---\n{text}" for number, text in texts),
+                "pages": [number for number, _ in texts],
+            }
+    pages = (summary.get("plan_pages") or [])[:PLAN_SELECTED_PAGES]
+    loop = asyncio.get_running_loop()
+    images = await loop.run_in_executor(_pool(), _render_pages, summary["pdf_path"], pages, PLAN_RENDER_DPI)
+    return {"images": images, "pages": pages}
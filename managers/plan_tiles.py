@@ -0,0 +1,276 @@
+"""
+Tiled vision analysis for large floor-plan images.
+
+A dense CAD export sent as one image gets downscaled until room labels and dimensions are
+unreadable. Sheets above PLAN_TILE_TRIGGER_PX are cut into an overlapping grid; every tile
+is analysed concurrently for the flats it shows, alongside one low-resolution overview of
+the whole sheet for sheet-level facts (project/block names, floor, compass). Tile
+detections are mapped back to sheet coordinates, flats seen twice in an overlap are merged,
+and the result is returned in the same project-structure schema as the single-image path.
+Each tile has its own timeout, so the slowest tile bounds the latency; failed tiles are
+dropped rather than failing the sheet.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import io
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from PIL import Image
+
+PLAN_TILE_TRIGGER_PX = int(os.getenv("PLAN_TILE_TRIGGER_PX", "2200"))
+PLAN_TILE_PX = int(os.getenv("PLAN_TILE_PX", "1400"))
+PLAN_TILE_OVERLAP = 0.15
+PLAN_MAX_TILES = int(os.getenv("PLAN_MAX_TILES", "12"))
+PLAN_OVERVIEW_PX = 1024
+PLAN_TILE_CONCURRENCY = int(os.getenv("PLAN_TILE_CONCURRENCY", "6"))
+PLAN_TILE_TIMEOUT_SECONDS = float(os.getenv("PLAN_TILE_TIMEOUT_SECONDS", "60"))
+DUPLICATE_IOU = 0.3
+
+Box = Tuple[float, float, float, float]
+
+TILE_PROMPT = """You are reading ONE tile cut from a larger architectural floor plan. Neighbouring tiles overlap this one.
+
+List every flat (dwelling unit) visible in this tile. A flat is a group of rooms around exactly one kitchen.
+For each flat return:
+- "label": the flat number/name if written on the drawing, else null
+- "bedrooms": rooms labelled BED, M.BED, BEDROOM or similar (integer)
+- "kitchens": number of kitchens (integer)
+- "facing": "East", "West", "North", "South" (or combinations) from compass/road/entry, else "unknown"
+- "carpet_area": total carpet area in sqft summed from room sizes (convert feet-inches), or null if sizes are unreadable
+- "bbox": [x0, y0, x1, y1] of the flat within this tile as fractions 0-1 of the tile width/height
+- "complete": false if the flat is cut off by the tile edge, else true
+
+Return only JSON: {"flats": [...]}. If no flat is visible return {"flats": []}. No markdown, no explanations."""
+
+OVERVIEW_PROMPT = """This is a downscaled view of a whole architectural floor-plan sheet. Do not count rooms.
+Read only sheet-level information and return JSON:
+{"project_name": string or null, "block_names": [strings], "floor": integer or null, "no_of_floors": integer or "unknown", "facing_hint": string or null}
+Use the title block, headings and compass. No markdown, no explanations."""
+
+
+@dataclass
+class PlanTile:
+    index: int
+    box: Box                    # pixel box on the full sheet
+    image_b64: str
+
+
+def _png_b64(image: Image.Image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def needs_tiling(path: str) -> bool:
+    with Image.open(path) as image:
+        return max(image.size) > PLAN_TILE_TRIGGER_PX
+
+
+def _grid(length: int, tile: int, step: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_plan_image(path: str) -> Tuple[Tuple[int, int], str, List[PlanTile]]:
+    """(sheet size, overview png, overlapping tiles); tiles grow to keep within PLAN_MAX_TILES."""
+    with Image.open(path) as source:
+        image = source.convert("RGB")
+    width, height = image.size
+    tile = PLAN_TILE_PX
+    while True:
+        step = max(1, int(tile * (1 - PLAN_TILE_OVERLAP)))
+        xs, ys = _grid(width, tile, step), _grid(height, tile, step)
+        if len(xs) * len(ys) <= PLAN_MAX_TILES:
+            break
+        tile = int(tile * 1.25)
+
+    tiles = []
+    for y in ys:
+        for x in xs:
+            box = (x, y, min(x + tile, width), min(y + tile, height))
+            tiles.append(PlanTile(index=len(tiles), box=box, image_b64=_png_b64(image.crop(box))))
+
+    overview = image.copy()
+    overview.thumbnail((PLAN_OVERVIEW_PX, PLAN_OVERVIEW_PX))
+    return (width, height), _png_b64(overview), tiles
+
+
+def _parse_json(raw: str) -> Dict[str, Any]:
+    text = raw.strip().replace("```json", "").replace("```", "")
+    start, end = text.find("{"), text.rfind("}")
+    return json.loads(text[start:end + 1]) if start != -1 and end > start else {}
+
+
+async def _ask(llm, prompt: str, image_b64: str, instruction: str) -> Dict[str, Any]:
+    response = await llm.ainvoke([
+        SystemMessage(content=prompt),
+        HumanMessage(content=[
+            {"type": "text", "text": instruction},
+            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_b64}"}},
+        ]),
+    ])
+    return _parse_json(response.content)
+
+
+def _to_sheet_box(tile: PlanTile, bbox: Any) -> Optional[Box]:
+    try:
+        fx0, fy0, fx1, fy1 = (min(max(float(v), 0.0), 1.0) for v in bbox)
+    except (TypeError, ValueError):
+        return None
+    x0, y0, x1, y1 = tile.box
+    w, h = x1 - x0, y1 - y0
+    return (x0 + fx0 * w, y0 + fy0 * h, x0 + fx1 * w, y0 + fy1 * h)
+
+
+def _iou(a: Box, b: Box) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _contains_centre(outer: Box, inner: Box) -> bool:
+    cx, cy = (inner[0] + inner[2]) / 2, (inner[1] + inner[3]) / 2
+    return outer[0] <= cx <= outer[2] and outer[1] <= cy <= outer[3]
+
+
+def _has_kitchen(flat: Dict[str, Any]) -> bool:
+    try:
+        return flat.get("kitchens") is None or int(flat["kitchens"]) >= 1
+    except (TypeError, ValueError):
+        return True
+
+
+def merge_flat_detections(detections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Collapse flats reported by more than one tile. Complete, larger detections win; a flat
+    is a duplicate when it overlaps a kept one or its centre falls inside it (or both carry
+    the same label). Output is ordered top-to-bottom, left-to-right.
+    """
+    ordered = sorted(
+        (d for d in detections if d.get("box") and _has_kitchen(d)),
+        key=lambda d: (bool(d.get("complete", True)), (d["box"][2] - d["box"][0]) * (d["box"][3] - d["box"][1])),
+        reverse=True,
+    )
+    kept: List[Dict[str, Any]] = []
+    for flat in ordered:
+        duplicate = False
+        for other in kept:
+            same_label = flat.get("label") and flat.get("label") == other.get("label")
+            if same_label or _iou(flat["box"], other["box"]) >= DUPLICATE_IOU or _contains_centre(other["box"], flat["box"]):
+                duplicate = True
+                if not (other.get("complete", True) and flat.get("complete", True)):
+                    # Pieces of a flat cut by tile edges: grow the kept box to cover both.
+                    a, b = other["box"], flat["box"]
+                    other["box"] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                for key in ("label", "carpet_area"):
+                    if not other.get(key) and flat.get(key):
+                        other[key] = flat[key]
+                if other.get("facing") in (None, "", "unknown") and flat.get("facing"):
+                    other["facing"] = flat["facing"]
+                break
+        if not duplicate:
+            kept.append(dict(flat))
+    row_height = max((d["box"][3] - d["box"][1] for d in kept), default=1.0) or 1.0
+    kept.sort(key=lambda d: (math.floor((d["box"][1] + d["box"][3]) / 2 / row_height), d["box"][0]))
+    return kept
+
+
+async def analyse_plan_tiles(llm, path: str) -> Dict[str, Any]:
+    """Run the overview and every tile concurrently; returns {"sheet": {...}, "flats": [...], "tiles": n, "failed": n}."""
+    size, overview_b64, tiles = await asyncio.to_thread(tile_plan_image, path)
+    print(f"plan_tiles ::::: analyse_plan_tiles ::::: {size[0]}x{size[1]} sheet -> {len(tiles)} tiles")
+    semaphore = asyncio.Semaphore(max(1, PLAN_TILE_CONCURRENCY))
+
+    async def bounded(prompt: str, image_b64: str, instruction: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await asyncio.wait_for(_ask(llm, prompt, image_b64, instruction), PLAN_TILE_TIMEOUT_SECONDS)
+
+    results = await asyncio.gather(
+        bounded(OVERVIEW_PROMPT, overview_b64, "Read the sheet-level information."),
+        *(bounded(TILE_PROMPT, tile.image_b64, "List the flats in this tile.") for tile in tiles),
+        return_exceptions=True,
+    )
+    overview, tile_results = results[0], results[1:]
+    sheet = overview if isinstance(overview, dict) else {}
+    if not isinstance(overview, dict):
+        print("plan_tiles ::::: analyse_plan_tiles ::::: overview failed:", overview)
+
+    detections, failed = [], 0
+    for tile, result in zip(tiles, tile_results):
+        if not isinstance(result, dict):
+            failed += 1
+            print(f"plan_tiles ::::: analyse_plan_tiles ::::: tile {tile.index} failed:", repr(result))
+            continue
+        for flat in result.get("flats") or []:
+            if not isinstance(flat, dict):
+                continue
+            box = _to_sheet_box(tile, flat.get("bbox"))
+            if box is not None:
+                detections.append({**flat, "box": box})
+    flats = merge_flat_detections(detections)
+    print(f"plan_tiles ::::: analyse_plan_tiles ::::: {len(detections)} detections -> {len(flats)} flats ({failed} tiles failed)")
+    return {"sheet": sheet, "flats": flats, "tiles": len(tiles), "failed": failed}
+
+
+def _flat_type(flat: Dict[str, Any]) -> Optional[str]:
+    """"2BHK" from the bedroom count, or None when the tile couldn't read any bedrooms."""
+    try:
+        bedrooms = int(flat.get("bedrooms") or 0)
+    except (TypeError, ValueError):
+        bedrooms = 0
+    return f"{bedrooms}BHK" if bedrooms > 0 else None
+
+
+def plan_structure(analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The merged tile analysis in the single-image output schema
+    ({"blocks": [{"floors": [{"floor": n, "flats": [{type, facing, carpet_area}]}]}]}), so
+    the region catalog reads both the same way. Flats without a readable bedroom count are
+    left out; None when none are left.
+    """
+    sheet, detected = analysis.get("sheet") or {}, analysis.get("flats") or []
+    facing_hint = sheet.get("facing_hint") or "unknown"
+    flats = []
+    for flat in detected:
+        flat_type = _flat_type(flat)
+        if flat_type is None:
+            continue
+        facing = flat.get("facing")
+        entry = {"type": flat_type, "facing": facing if facing and facing != "unknown" else facing_hint}
+        if flat.get("carpet_area"):
+            entry["carpet_area"] = str(flat["carpet_area"])
+        flats.append(entry)
+    if not flats:
+        return None
+    if len(flats) < len(detected):
+        print(f"plan_tiles ::::: plan_structure ::::: {len(detected) - len(flats)} flats without a bedroom count left out")
+
+    block_names = [name.strip() for name in sheet.get("block_names") or [] if isinstance(name, str) and name.strip()]
+    try:
+        floor_no = int(sheet.get("floor") or 1)
+    except (TypeError, ValueError):
+        floor_no = 1
+    no_of_floors = sheet.get("no_of_floors")
+    return {
+        "project_name": sheet.get("project_name") or "Unnamed Project",
+        "blocks": [
+            {
+                "block_name": block_names[0] if block_names else "Block 1",
+                "no_of_floors": no_of_floors if no_of_floors not in (None, "") else "unknown",
+                "flats_per_floor": len(flats),
+                "floors": [{"floor": floor_no, "flats": flats}],
+            }
+        ],
+    }
@@ -0,0 +1,102 @@
+"""
+Sender -> projects cache for project selection.
+
+select_or_create_project runs on most builder messages, and used to reload every project of
+the sender from the DB and fuzz-match the name against each one in a Python loop. Entries
+here hold the sender's project summaries (the get_projects_by_sender shape) together with a
+prebuilt, normalised name index that rapidfuzz's process.extractOne scans in one call.
+
+DatabaseCRUD writes through on create/update/delete, so this process never serves its own
+stale writes; PROJECT_CACHE_TTL_SECONDS bounds how long another replica's change can go
+unseen.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+PROJECT_CACHE_TTL_SECONDS = float(os.getenv("PROJECT_CACHE_TTL_SECONDS", "300"))
+PROJECT_CACHE_SIZE = 4096
+PROJECT_MATCH_SCORE = 85
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalise_project_name(name: Optional[str]) -> str:
+    return _NON_WORD.sub(" ", (name or "").lower()).strip()
+
+
+class _SenderProjects:
+    __slots__ = ("loaded_at", "projects", "names")
+
+    def __init__(self, projects: List[Dict[str, Any]]):
+        self.loaded_at = time.monotonic()
+        self.projects = [dict(project) for project in projects]
+        self.names = [normalise_project_name(project.get("title")) for project in self.projects]
+
+
+class ProjectCache:
+    def __init__(self, ttl: float = PROJECT_CACHE_TTL_SECONDS, size: int = PROJECT_CACHE_SIZE):
+        self._ttl = ttl
+        self._size = size
+        self._entries: "OrderedDict[str, _SenderProjects]" = OrderedDict()
+
+    def _live(self, sender_id: str) -> Optional[_SenderProjects]:
+        entry = self._entries.get(sender_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at >= self._ttl:
+            del self._entries[sender_id]
+            return None
+        self._entries.move_to_end(sender_id)
+        return entry
+
+    def get(self, sender_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached projects (newest first) as copies, or None when the sender must be loaded."""
+        entry = self._live(sender_id)
+        return [dict(project) for project in entry.projects] if entry is not None else None
+
+    def put(self, sender_id: str, projects: List[Dict[str, Any]]) -> None:
+        self._entries[sender_id] = _SenderProjects(projects)
+        self._entries.move_to_end(sender_id)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def upsert(self, sender_id: Optional[str], project: Dict[str, Any]) -> None:
+        """Write-through for a created or updated project; senders not loaded yet are left alone."""
+        if not sender_id:
+            return
+        entry = self._entries.get(sender_id)
+        if entry is None:
+            return
+        projects = list(entry.projects)
+        ids = [str(p.get("id")) for p in projects]
+        key = str(project.get("id"))
+        if key in ids:
+            projects[ids.index(key)] = project
+        else:
+            projects.insert(0, project)
+        self.put(sender_id, projects)
+
+    def invalidate(self, sender_id: Optional[str]) -> None:
+        if sender_id:
+            self._entries.pop(sender_id, None)
+
+    def match(self, sender_id: str, text: str, score_cutoff: int = PROJECT_MATCH_SCORE) -> Optional[Dict[str, Any]]:
+        """Best project by name for a loaded sender, or None below `score_cutoff`."""
+        entry = self._live(sender_id)
+        query = normalise_project_name(text)
+        if entry is None or not query or not entry.names:
+            return None
+        best: Optional[Tuple[str, float, int]] = process.extractOne(
+            query, entry.names, scorer=fuzz.ratio, score_cutoff=score_cutoff
+        )
+        return dict(entry.projects[best[2]]) if best else None
+
+
+project_cache = ProjectCache()
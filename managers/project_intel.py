@@ -9,8 +9,17 @@ import os
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 from database.uoc_crud import DatabaseCRUD
+from managers.region_catalog import RegionCatalog
+from managers.region_index import REGION_CONTEXT_MESSAGES, resolve_region
+from managers.scope_matcher import match_scope, scope_cache
 from langchain_core.messages import SystemMessage, HumanMessage
 load_dotenv()
+
+SCOPE_CONFIRM_BUTTONS = [
+    {"id": "scope_confirm", "title": "✅ Same task"},
+    {"id": "scope_new", "title": "➕ New task"},
+]
+
 llm = ChatOpenAI(
     model="gpt-4o",
     temperature=0,
@@ -37,9 +46,19 @@ def parse_json(response):
 
 
 
-async def validate_scope_via_llm(message: str, region: str,existing_scopes: list[str]) -> dict:
+async def validate_scope_via_llm(message: str, region: str,existing_scopes: list[str], *, allow_confirm: bool = True) -> dict:
     print(f"project_intel:::validate_scope_via_llm::: --Entering validate_scope_via_llm with message --: {message}")
-    formatted_scopes = ", ".join(f'"{s}"' for s in existing_scopes) if existing_scopes else "None"
+    # Obvious continuations of an existing task are assigned locally; the LLM only sees a shortlist.
+    local = match_scope(message, existing_scopes)
+    if local.scope:
+        print(f"project_intel:::validate_scope_via_llm::: --Scope matched locally --: {local.scope} ({local.score})")
+        return {"scope_fit": local.scope, "new_scope_title": ""}
+    if local.confirm and allow_confirm:
+        # Same trade, different surface (floor vs wall): the user knows which task this is.
+        print(f"project_intel:::validate_scope_via_llm::: --Scope needs confirmation --: {local.confirm} ({local.score})")
+        return {"scope_fit": local.confirm, "new_scope_title": "", "needs_confirmation": True}
+    candidate_scopes = local.shortlist
+    formatted_scopes = ", ".join(f'"{s}"' for s in candidate_scopes) if candidate_scopes else "None"
     
     prompt = f"""
 You are an expert assistant for construction project management. Your job is to classify a user's job update message into the most appropriate task scope for a given region.
@@ -129,7 +148,35 @@ class TaskHandler:
         message = (
         state.get("messages", [])[-1].get("content", "").strip().lower()
         if state.get("messages") else "")
-        region_candidates = state.get("region_candidates", [])
+        region_candidates: List[str] = []
+        catalog = None
+        if state.get("region_catalog"):
+            catalog = RegionCatalog.from_state(state["region_catalog"])
+        elif state.get("region_candidates"):
+            # Conversations saved before the compact catalog existed.
+            catalog = RegionCatalog.from_full_ids(state.pop("region_candidates"))
+            state["region_catalog"] = catalog.to_state()
+
+        # Resolve locally first; the LLM only ever sees a short, pre-filtered candidate list.
+        user_texts = [
+            m.get("content", "") for m in chat_history
+            if m.get("role", "user") == "user" and isinstance(m.get("content"), str)
+        ][-REGION_CONTEXT_MESSAGES:]
+        if catalog is not None and len(catalog):
+            resolution = resolve_region(user_texts, catalog)
+            print(f"project_intel:::get_region_via_llm::: --Local region hints --: {resolution.hints}")
+            if resolution.region:
+                print(f"project_intel:::get_region_via_llm::: --Region resolved locally --: {resolution.region}")
+                state["uoc_confidence"] = "high"
+                state["latest_respons"] = f"Identified region: {resolution.region}"
+                await self.handle_job_update(state)
+                return state
+            if not resolution.shortlist:
+                print("project_intel:::get_region_via_llm::: --Too many regions match, asking follow-up --")
+                state["uoc_confidence"] = "low"
+                state["latest_respons"] = resolution.followup
+                return state
+            region_candidates = resolution.shortlist
 
         prompt = """
     You are a construction site assistant helping identify the correct region ID for a job update based on a user's message.
@@ -197,6 +244,16 @@ class TaskHandler:
         region = result.get("region", "uncertain")
         if not isinstance(region, str) or not region:
          region = "uncertain"
+        # Only the shortlist we sent is acceptable; the whole catalog only when none was sent.
+        if region_candidates:
+            out_of_bounds = region not in region_candidates
+        else:
+            out_of_bounds = catalog is not None and region not in catalog
+        if region != "uncertain" and out_of_bounds:
+            print(f"project_intel:::get_region_via_llm::: --LLM returned a region outside the candidates it was given --: {region}")
+            region = "uncertain"
+            result["uoc_confidence"] = "low"
+            result["followup"] = result.get("followup") or "Which room or area is this work in?"
         extracted_context = result.get("extracted_context")
         followup = result.get("followup", "")
         confidence = result.get("uoc_confidence", "low" if region == "uncertain" else "high")
@@ -238,9 +295,11 @@ class TaskHandler:
         print(f"project_intel:::handle_job_update::: --Entering handle_job_update with project_id --:", project_id)
         print(f"project_intel:::handle_job_update::: --Received message --:", message)
         try:
-            regions = await self.crud.get_region_full_ids_by_project(UUID(project_id))
-            state["region_candidates"] = regions
-            print(f"project_intel:::handle_job_update::: --Fetched region candidates --: {regions}")
+            catalog = await self.crud.get_region_catalog(UUID(project_id))
+            state.pop("region_candidates", None)
+            if catalog is not None:
+                state["region_catalog"] = catalog.to_state()
+            print(f"project_intel:::handle_job_update::: --Loaded region catalog --: {len(catalog) if catalog else 0} regions")
         except Exception as e:
             print(f"Error fetching region candidates for project {project_id}: {e}")
         
@@ -272,10 +331,59 @@ class TaskHandler:
             return state
         
         print(f"project_intel:::handle_job_update::: --Identified region --:", selected_region)
-        existing_scopes = await self.crud.get_scopes_in_region(selected_region)
+        existing_scopes = await scope_cache.get_or_load(
+            selected_region, lambda: self.crud.get_scopes_in_region(selected_region)
+        )
         print(f"project_intel:::handle_job_update::: --Existing scopes in region {selected_region} --:", existing_scopes)
         scope_result = await validate_scope_via_llm(message, selected_region, existing_scopes)
         print(f"project_intel:::handle_job_update::: --Scope validation result --:", scope_result)
+        if scope_result.get("needs_confirmation"):
+            state["pending_scope"] = {
+                "project_id": project_id,
+                "region": selected_region,
+                "scope": scope_result["scope_fit"],
+                "message": message,
+            }
+            state.update({
+                "latest_respons": f"Is this update part of the task \"{scope_result['scope_fit']}\", or a new task?",
+                "needs_clarification": True,
+                "uoc_question_type": "task_scope_confirmation",
+                "uoc_next_message_type": "button",
+                "uoc_next_message_extra_data": SCOPE_CONFIRM_BUTTONS,
+            })
+            return state
+        await self._log_job_in_scope(state, project_id, selected_region, message, existing_scopes, scope_result)
+
+    async def confirm_scope(self, state: dict):
+        """Reply to the task_scope_confirmation question asked by handle_job_update."""
+        pending = state.pop("pending_scope", None) or {}
+        reply = (
+            state.get("messages", [])[-1].get("content", "").strip()
+            if state.get("messages") else "")
+        if not pending:
+            return await self.handle_job_update(state)
+        region, message = pending["region"], pending["message"]
+        existing_scopes = await scope_cache.get_or_load(region, lambda: self.crud.get_scopes_in_region(region))
+        if reply == "scope_confirm":
+            scope_result = {"scope_fit": pending["scope"], "new_scope_title": ""}
+        else:
+            others = [scope for scope in existing_scopes if scope != pending["scope"]]
+            scope_result = await validate_scope_via_llm(message, region, others, allow_confirm=False)
+            if scope_result["scope_fit"] == "new":
+                # Don't let the duplicate check below fold it back into the rejected task.
+                existing_scopes = others
+        state["uoc_next_message_type"] = "plain"
+        state["uoc_next_message_extra_data"] = []
+        # handle_job reads the update from the latest user message, which is now the button reply.
+        messages = state.get("messages", [])
+        state["messages"] = messages + [{"role": "user", "content": message}]
+        try:
+            await self._log_job_in_scope(state, pending["project_id"], region, message, existing_scopes, scope_result)
+        finally:
+            state["messages"] = messages
+        return state
+
+    async def _log_job_in_scope(self, state: dict, project_id, selected_region: str, message: str, existing_scopes: list, scope_result: dict):
         if scope_result["scope_fit"] == "new":
             print(f"project_intel:::handle_job_update::: --Creating new task for region {selected_region} with scope {scope_result['new_scope_title']} --")
             scope = scope_result["new_scope_title"]
@@ -285,19 +393,33 @@ class TaskHandler:
                 scope = f"{scope} in {region_parts[-2]} "
             elif len(region_parts) <= 3:
                 scope = f"{scope} in {region_parts[-1]}"
-            try:
-                task = await self.crud.create_task(UUID(project_id), selected_region, scope)
-            except Exception as e:
-                print(f"Error creating new task for region {selected_region} with scope {scope}: {e}")
-                return {"error": "Failed to create new task"}
+            # The scope cache is per worker; another worker may have just opened this task.
+            fresh_scopes = await self.crud.get_scopes_in_region(selected_region)
+            scope_cache.put(selected_region, fresh_scopes)
+            unseen = [s for s in fresh_scopes if s not in existing_scopes]
+            same_title = next((s for s in fresh_scopes if s.strip().lower() == scope.strip().lower()), None)
+            rematch = match_scope(message, unseen) if unseen else None
+            existing = same_title or (rematch.scope if rematch else None)
+            if existing:
+                print(f"project_intel:::handle_job_update::: --Task already opened elsewhere, reusing --: {existing}")
+                scope = existing
+                task = await self.crud.get_task_in_region(selected_region, scope)
+            else:
+                try:
+                    task = await self.crud.create_task(UUID(project_id), selected_region, scope)
+                except Exception as e:
+                    print(f"Error creating new task for region {selected_region} with scope {scope}: {e}")
+                    return {"error": "Failed to create new task"}
+                if task:
+                    scope_cache.add(selected_region, scope)
         else: 
             print(f"project_intel:::handle_job_update::: --Using existing task for region {selected_region} with scope {scope_result['scope_fit']} --")
             scope = scope_result["scope_fit"]
-            #task = await self.crud.create_task(UUID(project_id), selected_region, scope)
+            task = await self.crud.get_task_in_region(selected_region, scope)
         print(f"project_intel:::handle_job_update::: --Task retrieved or created --: {task.id if task else 'None'}")
         print(f"project_intel:::handle_job_update::: --Validating Job--")
         state["task_id"] = str(task.id) if task else None
         from managers.job_handler import handle_job 
         # Validate and handle the job update
         job_update = await handle_job(state) 
-       
\ No newline at end of file
+       
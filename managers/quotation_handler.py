@@ -1,18 +1,20 @@
 """Utilities for notifying supervisors and vendors about quote status."""
 
+import asyncio
 import os
 import json
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 from urllib.parse import quote
 
-from whatsapp.builder_out import whatsapp_output
+from whatsapp.builder_out import whatsapp_output, whatsapp_output_async
 
 load_dotenv()
 
 VENDOR_QUOTE_URL_BASE = os.getenv("VENDOR_QUOTE_URL_BASE")
 QUOTE_SUMMARY_URL = os.getenv("QUOTE_SUMMARY_URL")
 VENDOR_ORDER_CONFIRMATION_URL_BASE = os.getenv("VENDOR_ORDER_CONFIRMATION_URL_BASE")
+QUOTE_FANOUT_CONCURRENCY = max(1, int(os.getenv("QUOTE_FANOUT_CONCURRENCY", "10")))
 
 
 def _format_project_line(name: Optional[str], location: Optional[str]) -> str:
@@ -49,25 +51,22 @@ def _vendor_quote_button_param(request_id: str, vendor_id: str) -> str:
     # compact JSON to keep URL short
     return quote(json.dumps(data, separators=(",", ":")))
 
-async def send_quote_request_to_vendor(
+def _vendor_quote_request_messages(
     vendor_id: str,
     request_id: str,
-    contact_number: Optional[str],
+    contact_number: str,
     *,
     project_name: Optional[str] = None,
     project_location: Optional[str] = None,
     item_count: Optional[int] = None,
-
-    # (recommended so your template gets rich, correct values)
-    vendor_display_name: Optional[str] = None,   # for {{1}}
-    builder_name: Optional[str] = None,          # for {{2}}
-    company_name: Optional[str] = None           # for {{3}}
-) -> None:
-    """Send an initial quote request to a vendor via WhatsApp Template (Utility)."""
-    if not contact_number:
-        print("quotation_handler ::::: send_quote_request_to_vendor ::::: missing contact for vendor", vendor_id)
-        return
-
+    vendor_display_name: Optional[str] = None,
+    builder_name: Optional[str] = None,
+    company_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build the whatsapp_output kwargs for a vendor quote request, in send order:
+    the approved template first, then the link_cta fallback.
+    """
     # --- Compose body params for the approved template ---
     # Template body:
     # Hi Mr. {{1}},
@@ -87,34 +86,25 @@ async def send_quote_request_to_vendor(
     proj   = project_name or "Project"
     loc    = project_location or "Location"
 
-    # Build the dynamic button param (URL-encoded JSON)
-    encoded = _vendor_quote_button_param(request_id, vendor_id)
-
-    # Try template first; fall back to link_cta if anything goes wrong
-    try:
-        whatsapp_output(
-            to_number=contact_number,
-            message_text="",  # not used for template
-            message_type="template",
-            extra_data={
-                "template_name": "vendor_quote_request_notification",
-                "language_code": "en",
-                "body_params": [
-                    v_name,  # {{1}} Vendor display name (renders after "Hi Mr.")
-                    b_name,  # {{2}} Builder name (… garu)
-                    c_name,  # {{3}} Company
-                    proj,    # {{4}} Project
-                    loc      # {{5}} Delivery location
-                ],
-                "button_param": encoded,   # appended to base URL set in the template
-                "button_index": 0          # first (only) button
-            }
-        )
-        return
-    except Exception as e:
-        print("Template send failed, falling back to link CTA:", e)
+    template = {
+        "to_number": contact_number,
+        "message_text": "",  # not used for template
+        "message_type": "template",
+        "extra_data": {
+            "template_name": "vendor_quote_request_notification",
+            "language_code": "en",
+            "body_params": [
+                v_name,  # {{1}} Vendor display name (renders after "Hi Mr.")
+                b_name,  # {{2}} Builder name (… garu)
+                c_name,  # {{3}} Company
+                proj,    # {{4}} Project
+                loc      # {{5}} Delivery location
+            ],
+            "button_param": _vendor_quote_button_param(request_id, vendor_id),  # appended to base URL set in the template
+            "button_index": 0          # first (only) button
+        },
+    }
 
-    # --- Fallback: your existing link_cta path (kept as-is) ---
     project_line = _format_project_line(project_name, project_location)
     message_lines = [
         "👷 Thirtee procurement request",
@@ -124,16 +114,124 @@ async def send_quote_request_to_vendor(
         message_lines.append(f"Materials requested: {item_count}")
     message_lines.append("Tap below to review the details and share your prices.")
 
-    whatsapp_output(
-        to_number=contact_number,
-        message_text="\n".join(message_lines),
-        message_type="link_cta",
-        extra_data={
+    link_cta = {
+        "to_number": contact_number,
+        "message_text": "\n".join(message_lines),
+        "message_type": "link_cta",
+        "extra_data": {
             "display_text": "Review & Respond",
             "url": _vendor_quote_url(request_id, vendor_id),
         },
+    }
+    return [template, link_cta]
+
+
+async def send_quote_request_to_vendor(
+    vendor_id: str,
+    request_id: str,
+    contact_number: Optional[str],
+    *,
+    project_name: Optional[str] = None,
+    project_location: Optional[str] = None,
+    item_count: Optional[int] = None,
+
+    # (recommended so your template gets rich, correct values)
+    vendor_display_name: Optional[str] = None,   # for {{1}}
+    builder_name: Optional[str] = None,          # for {{2}}
+    company_name: Optional[str] = None           # for {{3}}
+) -> bool:
+    """
+    Send an initial quote request to a vendor via WhatsApp Template (Utility), falling back
+    to a link CTA. Returns True once either message is accepted; raises if both fail.
+    """
+    if not contact_number:
+        print("quotation_handler ::::: send_quote_request_to_vendor ::::: missing contact for vendor", vendor_id)
+        return False
+
+    messages = _vendor_quote_request_messages(
+        vendor_id,
+        request_id,
+        contact_number,
+        project_name=project_name,
+        project_location=project_location,
+        item_count=item_count,
+        vendor_display_name=vendor_display_name,
+        builder_name=builder_name,
+        company_name=company_name,
     )
 
+    # Try template first; fall back to link_cta if anything goes wrong
+    last_error: Optional[Exception] = None
+    for message in messages:
+        try:
+            await whatsapp_output_async(**message)
+            return True
+        except Exception as e:
+            last_error = e
+            print(
+                "quotation_handler ::::: send_quote_request_to_vendor ::::: vendor", vendor_id,
+                message["message_type"], "send failed :", e,
+            )
+    raise last_error
+
+
+async def _fan_out_quote_requests(
+    vendors: List[Dict[str, Optional[str]]],
+    request_id: str,
+    **message_kwargs: Any,
+) -> Dict[str, List[Dict[str, Optional[str]]]]:
+    """
+    Send the quote request to every vendor concurrently. A semaphore bounds how many sends
+    are in flight and the shared outbound limiter paces them against the WhatsApp rate limit;
+    one vendor's failure never blocks the others.
+    """
+    outcomes: Dict[str, List[Dict[str, Optional[str]]]] = {"notified": [], "no_contact": [], "failed": []}
+    semaphore = asyncio.Semaphore(QUOTE_FANOUT_CONCURRENCY)
+
+    async def _notify(vendor: Dict[str, Optional[str]]) -> None:
+        vendor_id = vendor["vendor_id"]
+        async with semaphore:
+            try:
+                sent = await send_quote_request_to_vendor(
+                    vendor_id,
+                    request_id,
+                    vendor.get("phone"),
+                    **message_kwargs,
+                )
+            except Exception as exc:  # pragma: no cover - notification best effort
+                print(
+                    "quotation_handler ::::: handle_quote_flow ::::: vendor",
+                    vendor_id,
+                    "notification failed :",
+                    exc,
+                )
+                outcomes["failed"].append(vendor)
+                return
+        outcomes["notified" if sent else "no_contact"].append(vendor)
+
+    await asyncio.gather(*(_notify(vendor) for vendor in vendors))
+    return outcomes
+
+
+async def _record_vendor_notifications(
+    request_id: str,
+    notified: List[Dict[str, Optional[str]]],
+    failed: List[Dict[str, Optional[str]]],
+) -> None:
+    if not notified and not failed:
+        return
+    from app.db import get_sessionmaker  # noqa: WPS433  (lazy import to avoid cycle)
+    from database.procurement_crud import ProcurementCRUD  # noqa: WPS433
+
+    try:
+        async with get_sessionmaker()() as session:
+            await ProcurementCRUD(session).record_vendor_notifications(
+                request_id,
+                [vendor["vendor_id"] for vendor in notified],
+                [vendor["vendor_id"] for vendor in failed],
+            )
+    except Exception as exc:  # pragma: no cover - bookkeeping must not undo the sends
+        print("quotation_handler ::::: handle_quote_flow ::::: failed to record vendor outcomes :", exc)
 
 
 async def notify_user_quote_ready(
@@ -144,18 +242,23 @@ async def notify_user_quote_ready(
     project_name: Optional[str] = None,
     project_location: Optional[str] = None,
     vendor_labels: Optional[List[str]] = None,
+    unreached_labels: Optional[List[str]] = None,
 ) -> dict:
     """Let the supervisor know that their request has been sent to vendors."""
     if not user_id:
-        return
+        return state
 
     project_line = _format_project_line(project_name, project_location)
     vendors_text = ", ".join(vendor_labels) if vendor_labels else "your vendor list"
     message_lines = [
         f"✅ Request logged for {project_line}.",
         f"Quotes requested from: {vendors_text}.",
-        "We'll notify you as each vendor responds. Track progress below.",
     ]
+    if unreached_labels:
+        message_lines.append(
+            f"⚠️ Could not reach: {', '.join(unreached_labels)}. We'll keep trying and remind them."
+        )
+    message_lines.append("We'll notify you as each vendor responds. Track progress below.")
 
     url = _quote_summary_url(request_id)
     state.update(
@@ -192,7 +295,13 @@ async def handle_quote_flow(
     project_name: Optional[str] = None,
     project_location: Optional[str] = None,
 ) -> dict:
-    """Notify vendors and supervisor after a request is submitted."""
+    """
+    Notify vendors and supervisor after a request is submitted.
+
+    Vendors are messaged concurrently; reached vendors move to NOTIFIED in one bulk update and
+    failures are logged on their quote_request_vendors history. The outcome is left on
+    state["quote_fanout"] and unreached vendors are called out in the supervisor message.
+    """
     print(
         f"Requesting quotes from vendors: {vendors} for request {request_id} with items: {items}"
     )
@@ -201,67 +310,50 @@ async def handle_quote_flow(
         len(vendors),
     )
 
-    notified_labels: List[str] = []
-    notified_ids: List[str] = []
-    item_count = len(items) if items is not None else None
-
+    targets: List[Dict[str, Optional[str]]] = []
     for vendor in vendors:
-        vendor_id = vendor.get("vendor_id")
-        contact_number = vendor.get("phone")
-        vendor_label = vendor.get("name") or vendor_id
-
-        if not vendor_id:
+        if not vendor.get("vendor_id"):
             print(
                 "quotation_handler ::::: handle_quote_flow ::::: skipping vendor entry without vendor_id:",
                 vendor,
             )
             continue
+        targets.append(vendor)
+
+    outcomes = await _fan_out_quote_requests(
+        targets,
+        request_id,
+        project_name=project_name,
+        project_location=project_location,
+        item_count=len(items) if items is not None else None,
+        #Dummy data for template params
+        vendor_display_name="Likhitha",
+        builder_name="Chandu Babu",
+        company_name="Briklay Constructions",
+    )
+    # Keep the caller's vendor order in the supervisor message.
+    order = {vendor["vendor_id"]: index for index, vendor in enumerate(targets)}
+    for bucket in outcomes.values():
+        bucket.sort(key=lambda vendor: order[vendor["vendor_id"]])
 
-        try:
-            print(
-                "quotation_handler ::::: handle_quote_flow ::::: notifying vendor",
-                vendor_id,
-                "on",
-                contact_number,
-            )
-            await send_quote_request_to_vendor(
-                vendor_id,
-                request_id,
-                contact_number,
-                project_name=project_name,
-                project_location=project_location,
-                item_count=item_count,
-                #Dummy data for template params
-                vendor_display_name="Likhitha",
-                builder_name="Chandu Babu",
-                company_name="Briklay Constructions",
-
-            )
-            notified_labels.append(vendor_label or vendor_id)
-            notified_ids.append(vendor_id)
-            print(
-                "quotation_handler ::::: handle_quote_flow : notified vendor",
-                vendor_id,
-                vendor_display_name="Likhitha",
-                builder_name="Chandu Babu",
-                company_name="Briklay Constructions",
-
-            )
-            notified_labels.append(vendor_label or vendor_id)
-            notified_ids.append(vendor_id)
-            print(
-                "quotation_handler ::::: handle_quote_flow : notified vendor",
-                vendor_id,
-            )
-        except Exception as exc:  # pragma: no cover - notification best effort
-            print(
-                "quotation_handler ::::: handle_quote_flow ::::: vendor",
-                vendor_id,
-                "notification failed :",
-                exc,
-            )
+    await _record_vendor_notifications(request_id, outcomes["notified"], outcomes["failed"])
 
+    notified_ids = [vendor["vendor_id"] for vendor in outcomes["notified"]]
+    notified_labels = [vendor.get("name") or vendor["vendor_id"] for vendor in outcomes["notified"]]
+    unreached = outcomes["failed"] + outcomes["no_contact"]
+    unreached_labels = [vendor.get("name") or vendor["vendor_id"] for vendor in unreached]
     print("quotation_handler ::::: handle_quote_flow ::::: notified vendors :", notified_ids)
+    if unreached:
+        print(
+            "quotation_handler ::::: handle_quote_flow ::::: unreached vendors :",
+            [vendor["vendor_id"] for vendor in unreached],
+        )
+
+    state["quote_fanout"] = {
+        "notified": notified_ids,
+        "failed": [vendor["vendor_id"] for vendor in outcomes["failed"]],
+        "no_contact": [vendor["vendor_id"] for vendor in outcomes["no_contact"]],
+    }
     state["uoc_next_message_type"] = "plain"
     state["uoc_question_type"] = "quote_request"
 
@@ -271,11 +363,14 @@ async def handle_quote_flow(
             f"{_format_project_line(project_name, project_location)} to: "
             f"{', '.join(notified_labels)}. We'll let you know as responses arrive."
         )
+        if unreached_labels:
+            state["latest_respons"] += f" Could not reach: {', '.join(unreached_labels)}."
     else:
         state["latest_respons"] = (
             "We could not reach any vendors for this request yet. "
             "We'll notify you as soon as we do."
         )
+        return state
 
     print("quotation_handler ::::: handle_quote_flow :::: notify user", user_id)
     print("quotation_handler ::::: handle_quote_flow :::: request id", request_id)
@@ -287,6 +382,7 @@ async def handle_quote_flow(
             project_name=project_name,
             project_location=project_location,
             vendor_labels=notified_labels,
+            unreached_labels=unreached_labels,
         )
     except Exception as exc:  # pragma: no cover - notification best effort
         print(
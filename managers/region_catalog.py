@@ -0,0 +1,435 @@
+"""
+Compact project layout from which region IDs are generated and checked on demand.
+
+A project's regions follow from a handful of numbers: per block, the floor count, the flat
+templates repeated on every floor (flat no = floor * 100 + index) and the block/floor common
+zones implied by the height. RegionCatalog stores just that (kilobytes in conversation state
+instead of thousands of ID strings) and answers "is this a region?" arithmetically.
+
+Full ID formats (unchanged, see UOCManager.map_region_ids):
+
+    <project>::<Block>::F<floor>::Flat<no>::<ROOM>
+    <project>::<Block>::F<floor>::<ZONE>
+    <project>::<Block>::<ZONE>
+"""
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+LOW_RISE_ZONES = [
+    "STAIR_CORE",
+    "COMMON_CORRIDOR",
+    "OH_WATER_TANK",
+    "SITE_BOUNDARY",
+    "DRIVEWAY",
+]
+
+MID_RISE_ZONES = [
+    "PASSENGER_LIFT",
+    "FIRE_ESCAPE_STAIR",
+    "PUMP_ROOM",
+    "DG_ROOM",
+    "TRANSFORMER_YARD",
+    "FIRE_RISER_SHAFT",
+]
+
+HIGH_RISE_ZONES = [
+    "SERVICE_LIFT",
+    "REFUGE_FLOOR",
+    "PRESSURIZED_LOBBY",
+    "HVAC_PLANT_ROOM",
+    "BMS_SERVER_ROOM",
+    "STP_PLANT",
+    "FACADE_ZONE",
+]
+
+BEDROOM_LABELS = ["MBR", "GBR", "CBR", "BR4", "BR5", "BR6"]
+
+REGION_CATALOG_CACHE_SIZE = 128
+
+_FLOOR_PART = re.compile(r"^F(\d+)$")
+_FLAT_PART = re.compile(r"^Flat(\d+)$")
+
+
+def block_zones_for(floors: int) -> Tuple[str, ...]:
+    if floors <= 3:
+        return tuple(LOW_RISE_ZONES)
+    if floors <= 5:
+        return tuple(LOW_RISE_ZONES + MID_RISE_ZONES)
+    return tuple(LOW_RISE_ZONES + MID_RISE_ZONES + HIGH_RISE_ZONES)
+
+
+def floor_zones_for(floors: int) -> Tuple[str, ...]:
+    if floors >= 4:
+        return ("STAIR_CORE", "COMMON_CORRIDOR", "PASSENGER_LIFT")
+    return ("STAIR_CORE", "COMMON_CORRIDOR")
+
+
+def flat_rooms_for(bhk_type: str) -> Tuple[str, ...]:
+    bhk = int("".join(filter(str.isdigit, bhk_type)))
+    rooms = ["LIV", "KIT"]
+    rooms += BEDROOM_LABELS[:bhk]
+    rooms += [f"TOILET{i}" for i in range(1, bhk + 1)]
+    rooms.append("BAL1")
+    return tuple(rooms)
+
+
+class RegionKey:
+    """One region, parsed. Cheap to build and compare; full_id is rendered on demand."""
+
+    __slots__ = ("project_id", "block", "floor", "flat", "code")
+
+    def __init__(self, project_id: str, block: str, floor: Optional[int], flat: Optional[int], code: str):
+        self.project_id = project_id
+        self.block = block
+        self.floor = floor
+        self.flat = flat
+        self.code = code
+
+    @classmethod
+    def parse(cls, full_id: str) -> Optional["RegionKey"]:
+        parts = full_id.split("::")
+        if len(parts) < 3:
+            return None
+        project_id, block, rest = parts[0], parts[1], parts[2:]
+        floor = flat = None
+        if len(rest) > 1:
+            match = _FLOOR_PART.match(rest[0])
+            if match:
+                floor = int(match.group(1))
+                rest = rest[1:]
+        if floor is not None and len(rest) > 1:
+            match = _FLAT_PART.match(rest[0])
+            if match:
+                flat = int(match.group(1))
+                rest = rest[1:]
+        return cls(project_id, block, floor, flat, "::".join(rest))
+
+    @property
+    def full_id(self) -> str:
+        parts = [self.project_id, self.block]
+        if self.floor is not None:
+            parts.append(f"F{self.floor}")
+        if self.flat is not None:
+            parts.append(f"Flat{self.flat}")
+        parts.append(self.code)
+        return "::".join(parts)
+
+    def _tuple(self) -> Tuple[str, str, Optional[int], Optional[int], str]:
+        return (self.project_id, self.block, self.floor, self.flat, self.code)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, RegionKey) and self._tuple() == other._tuple()
+
+    def __hash__(self) -> int:
+        return hash(self._tuple())
+
+    def __repr__(self) -> str:
+        return f"RegionKey({self.full_id!r})"
+
+
+class FlatTemplate:
+    __slots__ = ("type", "rooms", "facing", "area")
+
+    def __init__(self, type: str, rooms: Tuple[str, ...], facing: Optional[str] = None, area: Any = None):
+        self.type = type
+        self.rooms = tuple(rooms)
+        self.facing = facing
+        self.area = area
+
+
+class BlockLayout:
+    __slots__ = ("name", "floors", "flats", "block_zones", "floor_zones")
+
+    def __init__(
+        self,
+        name: str,
+        floors: int,
+        flats: List[FlatTemplate],
+        block_zones: Tuple[str, ...],
+        floor_zones: Tuple[str, ...],
+    ):
+        self.name = name
+        self.floors = floors
+        self.flats = list(flats)
+        self.block_zones = tuple(block_zones)
+        self.floor_zones = tuple(floor_zones)
+
+    def flat_template(self, flat: int) -> Optional[Tuple[int, FlatTemplate]]:
+        """(floor, template) for a flat number, or None if this block has no such flat."""
+        floor, index = divmod(flat, 100)
+        if 1 <= floor <= self.floors and 1 <= index <= len(self.flats):
+            return floor, self.flats[index - 1]
+        return None
+
+    def region_count(self) -> int:
+        per_floor = len(self.floor_zones) + sum(len(t.rooms) for t in self.flats)
+        return len(self.block_zones) + self.floors * per_floor
+
+
+class RegionCatalog:
+    def __init__(
+        self,
+        project_id: str,
+        blocks: Iterable[BlockLayout],
+        *,
+        extras: Iterable[str] = (),
+        missing: Iterable[str] = (),
+    ):
+        self.project_id = str(project_id)
+        self.blocks: Dict[str, BlockLayout] = {b.name: b for b in blocks}
+        # Irregular leftovers when compressed from stored IDs; both are empty for generated layouts.
+        self.extras: Set[str] = set(extras)
+        self.missing: Set[str] = set(missing)
+
+    # ------------------------------------------------------------ building
+
+    @classmethod
+    def from_structure(cls, project: Dict) -> "RegionCatalog":
+        """Layout from a project_structure dict (the input map_region_ids takes)."""
+        layouts: List[BlockLayout] = []
+        for block in project.get("blocks", []):
+            block_name = block["block_name"]
+            if block.get("floors"):
+                template_flats = block["floors"][0].get("flats", [])
+                floors = len(block["floors"])
+            else:
+                template_flats = block.get("flats", [])
+                floors = block.get("no_of_floors", 0)
+            if not template_flats:
+                raise ValueError(f"{block_name} has no flats template")
+            flats = [
+                FlatTemplate(flat["type"], flat_rooms_for(flat["type"]), flat.get("facing"), flat.get("carpet_area"))
+                for flat in template_flats
+            ]
+            layouts.append(BlockLayout(block_name, floors, flats, block_zones_for(floors), floor_zones_for(floors)))
+        return cls(str(project["id"]), layouts)
+
+    @classmethod
+    def from_full_ids(cls, full_ids: Iterable[str]) -> "RegionCatalog":
+        """Compress stored region IDs back into a layout (anything irregular is kept verbatim)."""
+        keys = [key for key in (RegionKey.parse(fid) for fid in full_ids) if key is not None]
+        project_id = keys[0].project_id if keys else ""
+        grouped: "OrderedDict[str, List[RegionKey]]" = OrderedDict()
+        for key in keys:
+            if key.project_id == project_id:
+                grouped.setdefault(key.block, []).append(key)
+
+        layouts: List[BlockLayout] = []
+        for block, block_keys in grouped.items():
+            floors = max((k.floor for k in block_keys if k.floor is not None), default=0)
+            block_zones = _ordered(k.code for k in block_keys if k.floor is None)
+            template_floor = min((k.floor for k in block_keys if k.flat is not None), default=None)
+            floor_zone_floor = min((k.floor for k in block_keys if k.floor is not None and k.flat is None), default=None)
+            floor_zones = _ordered(
+                k.code for k in block_keys if k.floor == floor_zone_floor and k.floor is not None and k.flat is None
+            )
+            rooms_by_index: "OrderedDict[int, List[str]]" = OrderedDict()
+            for k in block_keys:
+                if k.flat is not None and k.floor == template_floor:
+                    rooms_by_index.setdefault(k.flat - k.floor * 100, []).append(k.code)
+            flats = []
+            for index in range(1, max(rooms_by_index, default=0) + 1):
+                rooms = tuple(rooms_by_index.get(index, ()))
+                bedrooms = sum(1 for r in rooms if r in BEDROOM_LABELS)
+                flats.append(FlatTemplate(f"{bedrooms}BHK", rooms))
+            layouts.append(BlockLayout(block, floors, flats, block_zones, floor_zones))
+
+        catalog = cls(project_id, layouts)
+        actual = {key.full_id for key in keys}
+        generated = set(catalog.full_ids())
+        catalog.extras = actual - generated
+        catalog.missing = generated - actual
+        return catalog
+
+    # ------------------------------------------------------------ state
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "project_id": self.project_id,
+            "blocks": [
+                {
+                    "name": b.name,
+                    "floors": b.floors,
+                    "flats": [[t.type, list(t.rooms), t.facing, t.area] for t in b.flats],
+                    "block_zones": list(b.block_zones),
+                    "floor_zones": list(b.floor_zones),
+                }
+                for b in self.blocks.values()
+            ],
+            "extras": sorted(self.extras),
+            "missing": sorted(self.missing),
+        }
+
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "RegionCatalog":
+        layouts = [
+            BlockLayout(
+                b["name"],
+                int(b["floors"]),
+                [FlatTemplate(t[0], tuple(t[1]), t[2], t[3]) for t in b.get("flats", [])],
+                tuple(b.get("block_zones", ())),
+                tuple(b.get("floor_zones", ())),
+            )
+            for b in data.get("blocks", [])
+        ]
+        return cls(data.get("project_id", ""), layouts, extras=data.get("extras", ()), missing=data.get("missing", ()))
+
+    # ------------------------------------------------------------ queries
+
+    def key_for(self, full_id: Union[str, RegionKey]) -> Optional[RegionKey]:
+        """Parsed key if `full_id` is a region of this project, else None."""
+        if isinstance(full_id, RegionKey):
+            key, text = full_id, None
+        else:
+            key, text = RegionKey.parse(full_id), full_id
+        if key is None:
+            return None
+        text = text or key.full_id
+        if text in self.extras:
+            return key
+        if text in self.missing or key.project_id != self.project_id:
+            return None
+        layout = self.blocks.get(key.block)
+        if layout is None:
+            return None
+        if key.floor is None:
+            return key if key.code in layout.block_zones else None
+        if not 1 <= key.floor <= layout.floors:
+            return None
+        if key.flat is None:
+            return key if key.code in layout.floor_zones else None
+        found = layout.flat_template(key.flat)
+        if found is None or found[0] != key.floor:
+            return None
+        return key if key.code in found[1].rooms else None
+
+    def __contains__(self, full_id: object) -> bool:
+        if not isinstance(full_id, (str, RegionKey)):
+            return False
+        return self.key_for(full_id) is not None
+
+    def __len__(self) -> int:
+        return sum(b.region_count() for b in self.blocks.values()) + len(self.extras) - len(self.missing)
+
+    def codes(self) -> Set[str]:
+        found: Set[str] = set()
+        for b in self.blocks.values():
+            found.update(b.block_zones)
+            found.update(b.floor_zones)
+            for t in b.flats:
+                found.update(t.rooms)
+        found.update(k.code for k in (RegionKey.parse(fid) for fid in self.extras) if k is not None)
+        return found
+
+    def has_flat(self, flat: int, block: Optional[str] = None) -> bool:
+        layouts = [self.blocks[block]] if block in self.blocks else self.blocks.values()
+        return any(layout.flat_template(flat) is not None for layout in layouts)
+
+    def keys(
+        self,
+        *,
+        block: Optional[str] = None,
+        floor: Optional[int] = None,
+        flat: Optional[int] = None,
+        codes: Optional[Iterable[str]] = None,
+    ) -> Iterator[RegionKey]:
+        """Generate region keys lazily, optionally narrowed by block / floor / flat / codes."""
+        wanted = set(codes) if codes else None
+        layouts = [self.blocks[block]] if block in self.blocks else list(self.blocks.values())
+        for layout in layouts:
+            for key in self._layout_keys(layout, floor, flat):
+                if wanted is not None and key.code not in wanted:
+                    continue
+                if key.full_id in self.missing:
+                    continue
+                yield key
+        for full_id in sorted(self.extras):
+            key = RegionKey.parse(full_id)
+            if key is None or (block in self.blocks and key.block != block):
+                continue
+            if (floor is not None and key.floor != floor) or (flat is not None and key.flat != flat):
+                continue
+            if wanted is not None and key.code not in wanted:
+                continue
+            yield key
+
+    def _layout_keys(self, layout: BlockLayout, floor: Optional[int], flat: Optional[int]) -> Iterator[RegionKey]:
+        pid, name = self.project_id, layout.name
+        if flat is not None:
+            found = layout.flat_template(flat)
+            if found is None or (floor is not None and found[0] != floor):
+                return
+            for code in found[1].rooms:
+                yield RegionKey(pid, name, found[0], flat, code)
+            return
+        if floor is None:
+            for code in layout.block_zones:
+                yield RegionKey(pid, name, None, None, code)
+            floor_range: Iterable[int] = range(1, layout.floors + 1)
+        elif 1 <= floor <= layout.floors:
+            floor_range = (floor,)
+        else:
+            return
+        for floor_no in floor_range:
+            for code in layout.floor_zones:
+                yield RegionKey(pid, name, floor_no, None, code)
+            for index, template in enumerate(layout.flats, start=1):
+                flat_no = floor_no * 100 + index
+                for code in template.rooms:
+                    yield RegionKey(pid, name, floor_no, flat_no, code)
+
+    def full_ids(self) -> Iterator[str]:
+        for key in self.keys():
+            yield key.full_id
+
+    def region_groups(self) -> Iterator[Dict[str, Any]]:
+        """The per-block / per-floor / per-flat groups map_region_ids has always returned."""
+        pid = self.project_id
+        for layout in self.blocks.values():
+            name = layout.name
+            for code in layout.block_zones:
+                yield {
+                    "block": name, "floor": None, "flat_number": None, "type": "COMMON",
+                    "facing": None, "area": None, "region_ids": [f"{pid}::{name}::{code}"],
+                }
+            for floor_no in range(1, layout.floors + 1):
+                yield {
+                    "block": name, "floor": floor_no, "flat_number": None, "type": "FLOOR_COMMON",
+                    "facing": None, "area": None,
+                    "region_ids": [f"{pid}::{name}::F{floor_no}::{code}" for code in layout.floor_zones],
+                }
+                for index, template in enumerate(layout.flats, start=1):
+                    flat_no = floor_no * 100 + index
+                    base = f"{pid}::{name}::F{floor_no}::Flat{flat_no}"
+                    yield {
+                        "block": name, "floor": floor_no, "flat_number": flat_no, "type": template.type,
+                        "facing": template.facing, "area": template.area,
+                        "region_ids": [f"{base}::{code}" for code in template.rooms],
+                    }
+
+
+def _ordered(codes: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(OrderedDict.fromkeys(codes))
+
+
+# project_id -> (stored region count, catalog); validated against the DB count before use.
+_catalog_cache: "OrderedDict[str, Tuple[int, RegionCatalog]]" = OrderedDict()
+
+
+def cached_catalog(project_id: str, region_count: int) -> Optional[RegionCatalog]:
+    entry = _catalog_cache.get(str(project_id))
+    if entry is None or entry[0] != region_count:
+        return None
+    _catalog_cache.move_to_end(str(project_id))
+    return entry[1]
+
+
+def remember_catalog(catalog: RegionCatalog, region_count: Optional[int] = None) -> None:
+    key = catalog.project_id
+    _catalog_cache[key] = (len(catalog) if region_count is None else region_count, catalog)
+    _catalog_cache.move_to_end(key)
+    while len(_catalog_cache) > REGION_CATALOG_CACHE_SIZE:
+        _catalog_cache.popitem(last=False)
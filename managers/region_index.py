@@ -0,0 +1,305 @@
+"""
+Local region resolver for job updates.
+
+Region full IDs (see UOCManager.map_region_ids) are hierarchical:
+
+    <project>::<Block>::F<floor>::Flat<no>::<ROOM>     flat rooms
+    <project>::<Block>::F<floor>::<ZONE>               floor common zones
+    <project>::<Block>::<ZONE>                         block/site common zones
+
+RegionIndex walks a project's RegionCatalog as a block -> floor -> flat -> code hierarchy,
+generating IDs only along the branches that match. resolve_region() pulls block / floor /
+flat / room hints out of the recent chat messages (room names go through a synonym table:
+"kitchen", "master bedroom", "lift lobby", ...) and narrows the walk with them. A flat only
+counts as stated after a keyword ("flat 704", "unit #704"); a bare number that happens to
+be a flat ("used 102 bags") just moves that flat's rooms to the front of the shortlist.
+One match resolves locally; a handful becomes the shortlist for the LLM; anything broader
+turns into a targeted follow-up question instead of pasting every ID into a prompt.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from managers.region_catalog import BEDROOM_LABELS, RegionCatalog
+
+REGION_SHORTLIST_SIZE = 12
+REGION_CONTEXT_MESSAGES = 4
+
+BEDROOM_CODES = tuple(BEDROOM_LABELS)
+TOILET_CODES = tuple(f"TOILET{i}" for i in range(1, 7))
+
+# Human labels, used for follow-up questions.
+CODE_LABELS: Dict[str, str] = {
+    "LIV": "living room",
+    "KIT": "kitchen",
+    "MBR": "master bedroom",
+    "GBR": "guest bedroom",
+    "CBR": "children's bedroom",
+    "BR4": "bedroom 4",
+    "BR5": "bedroom 5",
+    "BR6": "bedroom 6",
+    "BAL1": "balcony",
+    "STAIR_CORE": "staircase",
+    "COMMON_CORRIDOR": "corridor",
+    "OH_WATER_TANK": "overhead water tank",
+    "SITE_BOUNDARY": "site boundary",
+    "DRIVEWAY": "driveway",
+    "PASSENGER_LIFT": "passenger lift",
+    "FIRE_ESCAPE_STAIR": "fire escape stair",
+    "PUMP_ROOM": "pump room",
+    "DG_ROOM": "DG room",
+    "TRANSFORMER_YARD": "transformer yard",
+    "FIRE_RISER_SHAFT": "fire riser shaft",
+    "SERVICE_LIFT": "service lift",
+    "REFUGE_FLOOR": "refuge floor",
+    "PRESSURIZED_LOBBY": "lift lobby",
+    "HVAC_PLANT_ROOM": "HVAC plant room",
+    "BMS_SERVER_ROOM": "BMS server room",
+    "STP_PLANT": "STP plant",
+    "FACADE_ZONE": "facade",
+}
+CODE_LABELS.update({code: f"toilet {code[-1]}" for code in TOILET_CODES})
+
+# Phrase -> region codes, most likely first. Ambiguous phrases list several codes and are
+# narrowed by whatever the project actually has.
+ROOM_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "kitchen": ("KIT",),
+    "cooking area": ("KIT",),
+    "living": ("LIV",),
+    "living room": ("LIV",),
+    "living area": ("LIV",),
+    "hall": ("LIV",),
+    "drawing room": ("LIV",),
+    "lounge": ("LIV",),
+    "master bedroom": ("MBR",),
+    "master bed room": ("MBR",),
+    "master room": ("MBR",),
+    "main bedroom": ("MBR",),
+    "guest bedroom": ("GBR",),
+    "guest room": ("GBR",),
+    "children bedroom": ("CBR",),
+    "childrens bedroom": ("CBR",),
+    "kids bedroom": ("CBR",),
+    "kids room": ("CBR",),
+    "bedroom": BEDROOM_CODES,
+    "bed room": BEDROOM_CODES,
+    "toilet": TOILET_CODES,
+    "bathroom": TOILET_CODES,
+    "washroom": TOILET_CODES,
+    "restroom": TOILET_CODES,
+    "balcony": ("BAL1",),
+    "sit out": ("BAL1",),
+    "sitout": ("BAL1",),
+    "staircase": ("STAIR_CORE", "FIRE_ESCAPE_STAIR"),
+    "stairs": ("STAIR_CORE", "FIRE_ESCAPE_STAIR"),
+    "stair": ("STAIR_CORE", "FIRE_ESCAPE_STAIR"),
+    "fire escape": ("FIRE_ESCAPE_STAIR",),
+    "fire stair": ("FIRE_ESCAPE_STAIR",),
+    "corridor": ("COMMON_CORRIDOR",),
+    "passage": ("COMMON_CORRIDOR",),
+    "lobby": ("PRESSURIZED_LOBBY", "COMMON_CORRIDOR"),
+    "lift lobby": ("PRESSURIZED_LOBBY", "COMMON_CORRIDOR"),
+    "lift": ("PASSENGER_LIFT", "SERVICE_LIFT"),
+    "elevator": ("PASSENGER_LIFT", "SERVICE_LIFT"),
+    "lift shaft": ("PASSENGER_LIFT", "SERVICE_LIFT"),
+    "service lift": ("SERVICE_LIFT",),
+    "goods lift": ("SERVICE_LIFT",),
+    "water tank": ("OH_WATER_TANK",),
+    "overhead tank": ("OH_WATER_TANK",),
+    "oht": ("OH_WATER_TANK",),
+    "boundary": ("SITE_BOUNDARY",),
+    "boundary wall": ("SITE_BOUNDARY",),
+    "compound wall": ("SITE_BOUNDARY",),
+    "drive way": ("DRIVEWAY",),
+    "ramp": ("DRIVEWAY",),
+    "generator": ("DG_ROOM",),
+    "dg": ("DG_ROOM",),
+    "transformer": ("TRANSFORMER_YARD",),
+    "riser": ("FIRE_RISER_SHAFT",),
+    "shaft": ("FIRE_RISER_SHAFT",),
+    "refuge": ("REFUGE_FLOOR",),
+    "hvac": ("HVAC_PLANT_ROOM",),
+    "ahu": ("HVAC_PLANT_ROOM",),
+    "plant room": ("HVAC_PLANT_ROOM",),
+    "bms": ("BMS_SERVER_ROOM",),
+    "server room": ("BMS_SERVER_ROOM",),
+    "stp": ("STP_PLANT",),
+    "sewage treatment": ("STP_PLANT",),
+    "facade": ("FACADE_ZONE",),
+    "elevation": ("FACADE_ZONE",),
+    "cladding": ("FACADE_ZONE",),
+    "exterior": ("FACADE_ZONE",),
+}
+# Codes typed as-is ("KIT", "stair core", "pump room") match themselves.
+for _code in CODE_LABELS:
+    ROOM_SYNONYMS.setdefault(_code.lower(), (_code,))
+    ROOM_SYNONYMS.setdefault(_code.lower().replace("_", " "), (_code,))
+    ROOM_SYNONYMS.setdefault(CODE_LABELS[_code].lower(), (_code,))
+
+_ROOM_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(ROOM_SYNONYMS, key=len, reverse=True)) + r")\b"
+)
+_NUMBERED_ROOM = re.compile(r"\b(bed\s?room|br|toilet|bathroom|washroom|bath)\s*(?:no\.?\s*)?(\d)\b")
+_FLAT_PATTERN = re.compile(
+    r"(?:\b(?:flat|unit|apartment|apt|house|door)\s*(?:no\.?|number|#)?|#|\bno\.)\s*-?\s*(\d{3,4})\b"
+)
+_BARE_NUMBER = re.compile(r"\b(\d{3,4})\b")
+_FLOOR_PATTERNS = (
+    re.compile(r"\b(\d{1,2})\s*(?:st|nd|rd|th)?\s*floor\b"),
+    re.compile(r"\bfloor\s*(?:no\.?\s*)?-?\s*(\d{1,2})\b"),
+    re.compile(r"\bf(\d{1,2})\b"),
+)
+_BLOCK_WORDS = ("block", "tower", "wing", "blk")
+
+@dataclass
+class RegionHints:
+    block: Optional[str] = None
+    floor: Optional[int] = None
+    flat: Optional[int] = None
+    codes: Tuple[str, ...] = ()
+    flat_guess: Optional[int] = None    # bare number that matches a flat; ranks, never resolves
+
+
+@dataclass
+class RegionResolution:
+    region: Optional[str] = None                           # resolved locally
+    shortlist: List[str] = field(default_factory=list)     # ambiguous: let the LLM pick among these
+    followup: str = ""                                     # too broad: ask the user instead
+    hints: RegionHints = field(default_factory=RegionHints)
+
+
+class RegionIndex:
+    def __init__(self, catalog: RegionCatalog):
+        self.catalog = catalog
+        self.codes = catalog.codes()
+        self._block_patterns = {block: _block_pattern(block) for block in catalog.blocks}
+
+    # ------------------------------------------------------------ parsing
+
+    def hints_from_text(self, text: str) -> RegionHints:
+        text = text.lower()
+        hints = RegionHints()
+
+        for block, pattern in self._block_patterns.items():
+            if pattern.search(text):
+                hints.block = block
+                break
+
+        match = _FLAT_PATTERN.search(text)
+        if match:
+            hints.flat = int(match.group(1))
+        else:
+            # "102 bags" is as likely a quantity as a flat; only remember it as a guess.
+            for match in _BARE_NUMBER.finditer(text):
+                number = int(match.group(1))
+                if self.catalog.has_flat(number):
+                    hints.flat_guess = number
+                    break
+
+        for pattern in _FLOOR_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                hints.floor = int(match.group(1))
+                break
+
+        codes: List[str] = []
+        numbered_spans: List[Tuple[int, int]] = []
+        for numbered in _NUMBERED_ROOM.finditer(text):
+            kind, number = numbered.group(1), int(numbered.group(2))
+            family = TOILET_CODES if kind in ("toilet", "bathroom", "washroom", "bath") else BEDROOM_CODES
+            if 1 <= number <= len(family) and family[number - 1] in self.codes:
+                codes.append(family[number - 1])
+                numbered_spans.append(numbered.span())
+        for match in _ROOM_PATTERN.finditer(text):
+            # "bedroom 2" is specific; don't widen it back to every bedroom.
+            if any(start <= match.start() < end for start, end in numbered_spans):
+                continue
+            for code in ROOM_SYNONYMS[match.group(1)]:
+                if code in self.codes and code not in codes:
+                    codes.append(code)
+        hints.codes = tuple(codes)
+        return hints
+
+    def hints_from_messages(self, messages: Sequence[str]) -> RegionHints:
+        """Merge hints oldest -> newest so a later answer ("it's 704") refines earlier ones."""
+        merged = RegionHints()
+        for text in messages:
+            hints = self.hints_from_text(text)
+            merged.block = hints.block or merged.block
+            merged.flat = hints.flat if hints.flat is not None else merged.flat
+            merged.flat_guess = hints.flat_guess if hints.flat_guess is not None else merged.flat_guess
+            merged.floor = hints.floor if hints.floor is not None else merged.floor
+            merged.codes = hints.codes or merged.codes
+        return merged
+
+    # ------------------------------------------------------------ lookup
+
+    def candidates(self, hints: RegionHints, limit: Optional[int] = None) -> List[str]:
+        """Matching full IDs, generated from the catalog; stops after `limit` matches."""
+        keys = self.catalog.keys(block=hints.block, floor=hints.floor, flat=hints.flat, codes=hints.codes or None)
+        return [key.full_id for key in islice(keys, limit)]
+
+    def resolve(self, messages: Sequence[str], shortlist_size: int = REGION_SHORTLIST_SIZE) -> RegionResolution:
+        hints = self.hints_from_messages(messages)
+        found = self.candidates(hints, shortlist_size + 1)
+        if hints.flat is None and hints.flat_guess is not None:
+            guessed = self.candidates(replace(hints, flat=hints.flat_guess), shortlist_size)
+            if guessed:
+                # Never resolved locally: the LLM sees the guessed flat first, next to the alternatives.
+                shortlist = guessed + [region for region in found if region not in guessed]
+                return RegionResolution(shortlist=shortlist[:shortlist_size], hints=hints)
+        if len(found) == 1:
+            return RegionResolution(region=found[0], hints=hints)
+        if 1 < len(found) <= shortlist_size:
+            return RegionResolution(shortlist=found, hints=hints)
+        if not found and (hints.codes or hints.flat is not None or hints.floor is not None):
+            # Something didn't line up (e.g. a room this flat doesn't have); give the LLM the nearby options.
+            for relaxed in (
+                RegionHints(hints.block, hints.floor, hints.flat, ()),
+                RegionHints(hints.block, None, None, hints.codes),
+            ):
+                nearby = self.candidates(relaxed, shortlist_size + 1)
+                if 0 < len(nearby) <= shortlist_size:
+                    return RegionResolution(shortlist=nearby, hints=hints)
+        return RegionResolution(followup=self._followup(hints, found), hints=hints)
+
+    def _followup(self, hints: RegionHints, found: List[str]) -> str:
+        if hints.flat is not None and not found:
+            return f"I couldn't find flat {hints.flat} in this project. Could you check the flat number?"
+        if len(self.catalog.blocks) > 1 and hints.block is None:
+            return f"Which block is this update for? ({', '.join(sorted(self.catalog.blocks))})"
+        if hints.flat is None and (not hints.codes or any(not _is_common(code) for code in hints.codes)):
+            return "Which flat is this work in (e.g. flat 704), or is it a common area like the staircase or lift?"
+        if hints.floor is None:
+            area = CODE_LABELS.get(hints.codes[0], hints.codes[0]) if hints.codes else "area"
+            return f"Which floor is the {area} on?"
+        return "Which room or area is this work in (e.g. kitchen, master bedroom, balcony)?"
+
+
+def _is_common(code: str) -> bool:
+    return code not in BEDROOM_CODES and code not in TOILET_CODES and code not in ("LIV", "KIT", "BAL1")
+
+
+def _block_pattern(block: str) -> "re.Pattern[str]":
+    name = block.lower().strip()
+    core = name
+    for word in _BLOCK_WORDS:
+        core = re.sub(rf"\b{word}\b", "", core).strip(" -_")
+    core = core or name
+    words = "|".join(_BLOCK_WORDS)
+    options = [
+        rf"\b(?:{words})\s*-?\s*{re.escape(core)}\b",
+        rf"\b{re.escape(core)}\s*-?\s*(?:{words})\b",
+    ]
+    if len(core) > 2:
+        options.append(rf"\b{re.escape(core)}\b")
+    if name != core:
+        options.append(rf"\b{re.escape(name)}\b")
+    return re.compile("|".join(options))
+
+
+def resolve_region(messages: Sequence[str], catalog: RegionCatalog) -> RegionResolution:
+    return RegionIndex(catalog).resolve(messages)
@@ -0,0 +1,195 @@
+"""
+Local scope matching for job updates.
+
+A job update usually continues a task already open in its region ("2nd coat of putty done"
+against "wall putty application in Flat704"). Both sides are reduced to construction
+concepts through a synonym table, with location words dropped since every scope in a region
+shares them, and scored on concept overlap plus a fuzzy token score. A clear winner is
+assigned locally; only new or ambiguous updates go to the LLM, and then with a shortlist.
+A clear winner that names a different surface than the update ("floor tiling" against
+"wall dado tiling") is not assigned; it comes back as `confirm` so the user decides.
+
+ScopeCache keeps each region's scope titles in-process so the lookup doesn't hit the DB on
+every update; entries expire after SCOPE_CACHE_TTL_SECONDS and are appended to on create.
+The cache is per worker, so callers re-read the region before creating a new task.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from rapidfuzz import fuzz
+
+SCOPE_AUTO_MATCH_SCORE = 0.6
+SCOPE_AUTO_MATCH_MARGIN = 0.15
+SCOPE_SHORTLIST_SIZE = 5
+SCOPE_CACHE_TTL_SECONDS = float(os.getenv("SCOPE_CACHE_TTL_SECONDS", "300"))
+SCOPE_CACHE_SIZE = 2048
+
+# Canonical concept -> phrases that mean it on site.
+CONSTRUCTION_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "plastering": ("plaster", "plastering", "plastered", "render", "rendering", "cement plaster"),
+    "putty": ("putty", "wall putty", "skim coat"),
+    "painting": ("paint", "painting", "painted", "primer", "priming", "emulsion", "distemper", "texture"),
+    "tiling": ("tile", "tiles", "tiling", "tiled", "dado", "skirting", "vitrified", "ceramic"),
+    "flooring": ("flooring", "floor finish", "marble", "kota", "ips"),
+    "granite": ("granite", "platform", "counter top", "countertop", "kitchen slab"),
+    "masonry": ("brick", "bricks", "brickwork", "block work", "blockwork", "masonry", "aac"),
+    "concreting": ("concrete", "concreting", "casting", "cast", "rcc", "pcc", "pour", "pouring"),
+    "slab": ("slab", "roof slab", "floor slab"),
+    "shuttering": ("shuttering", "formwork", "centering", "centring"),
+    "reinforcement": ("rebar", "reinforcement", "steel binding", "bar bending", "binding"),
+    "electrical": ("electrical", "electric", "wiring", "wire", "conduit", "switch", "socket", "db box"),
+    "plumbing": ("plumbing", "plumber", "pipe", "pipes", "piping", "pipeline", "cpvc", "upvc", "pvc", "drainage"),
+    "sanitary": ("sanitary", "cp fittings", "wash basin", "commode", "wc", "closet"),
+    "waterproofing": ("waterproofing", "waterproof", "water proofing", "damp proofing", "leak proofing"),
+    "carpentry": ("carpentry", "carpenter", "woodwork", "door", "doors", "frame", "shutter", "wardrobe"),
+    "windows": ("window", "windows", "upvc window", "aluminium window", "grill", "grills"),
+    "false_ceiling": ("false ceiling", "gypsum", "pop", "ceiling board"),
+    "fabrication": ("fabrication", "railing", "ms work", "welding", "grill work"),
+    "excavation": ("excavation", "digging", "earthwork", "earth work"),
+    "curing": ("curing",),
+    "installation": ("installation", "install", "installed", "fixing", "fix", "fixed", "fitting"),
+    "repair": ("repair", "repairs", "rework", "patch", "patching", "touch up"),
+    "demolition": ("demolition", "demolish", "breaking", "chipping", "hacking"),
+}
+
+# Words that describe *where*, not *what* — every scope in a region shares them.
+LOCATION_WORDS = frozenset({
+    "in", "at", "on", "of", "the", "a", "an", "and", "for", "to", "with", "done", "completed", "complete",
+    "started", "start", "work", "works", "today", "yesterday", "ongoing", "progress", "is", "are", "was",
+    "has", "have", "been", "we", "our", "site", "flat", "floor", "block", "tower", "room", "area",
+    "kitchen", "bedroom", "master", "guest", "bathroom", "toilet", "balcony", "living", "hall", "lobby",
+    "corridor", "staircase", "stair", "lift",
+})
+_LOCATION_TOKEN = re.compile(r"^(?:flat\d+|f\d+|\d+(?:st|nd|rd|th)?|toilet\d|bal\d|br\d|kit|liv|mbr|gbr|cbr)$")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Surfaces the same trade can apply to; an update and a scope naming different ones are different tasks.
+SURFACE_WORDS: Dict[str, Tuple[str, ...]] = {
+    "floor": ("floor", "floors", "flooring"),
+    "wall": ("wall", "walls", "dado"),
+    "ceiling": ("ceiling", "ceilings"),
+}
+_SURFACE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(w) for words in SURFACE_WORDS.values() for w in words) + r")\b"
+)
+_WORD_TO_SURFACE = {word: surface for surface, words in SURFACE_WORDS.items() for word in words}
+# "3rd floor", "floor 3", "ground floor" say where, not which surface.
+_FLOOR_LEVEL = re.compile(
+    r"\b(?:\d{1,2}\s*(?:st|nd|rd|th)?|ground|first|second|third|fourth|fifth|top|terrace)\s*floor\b"
+    r"|\bfloor\s*(?:no\.?\s*)?-?\s*\d{1,2}\b"
+)
+
+_PHRASE_TO_CONCEPT: Dict[str, str] = {
+    phrase: concept for concept, phrases in CONSTRUCTION_SYNONYMS.items() for phrase in phrases
+}
+_PHRASE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(_PHRASE_TO_CONCEPT, key=len, reverse=True)) + r")\b"
+)
+
+
+@dataclass
+class ScopeMatch:
+    scope: Optional[str] = None                            # confident local match
+    score: float = 0.0
+    shortlist: List[str] = field(default_factory=list)     # best candidates to show the LLM
+    confirm: Optional[str] = None                          # strong match on a different surface; ask the user
+
+
+def scope_signature(text: str) -> Tuple[FrozenSet[str], str]:
+    """(construction concepts, remaining activity words) for a message or scope title."""
+    text = (text or "").lower().replace("_", " ")
+    concepts = set()
+    remainder = _PHRASE_PATTERN.sub(lambda m: concepts.add(_PHRASE_TO_CONCEPT[m.group(1)]) or " ", text)
+    words = [
+        tok for tok in _TOKEN.findall(remainder)
+        if tok not in LOCATION_WORDS and not _LOCATION_TOKEN.match(tok)
+    ]
+    return frozenset(concepts), " ".join(words)
+
+
+def scope_surfaces(text: str) -> FrozenSet[str]:
+    """Surfaces named in a message or scope title, ignoring floor levels ("3rd floor")."""
+    text = _FLOOR_LEVEL.sub(" ", (text or "").lower().replace("_", " "))
+    return frozenset(_WORD_TO_SURFACE[m.group(1)] for m in _SURFACE_PATTERN.finditer(text))
+
+
+def _score(message_sig: Tuple[FrozenSet[str], str], scope_sig: Tuple[FrozenSet[str], str]) -> float:
+    m_concepts, m_words = message_sig
+    s_concepts, s_words = scope_sig
+    # Generic verbs (install/repair) only count when the trade matches too.
+    generic = {"installation", "repair"}
+    m_trade, s_trade = m_concepts - generic, s_concepts - generic
+    if m_trade and s_trade and not (m_trade & s_trade):
+        return 0.0
+    concept_score = 0.0
+    if m_concepts and s_concepts:
+        shared = len(m_concepts & s_concepts)
+        # Half Jaccard, half "how much of the scope does the update cover".
+        concept_score = 0.5 * shared / len(m_concepts | s_concepts) + 0.5 * shared / len(s_concepts)
+    word_score = fuzz.token_set_ratio(m_words, s_words) / 100.0 if m_words and s_words else 0.0
+    if m_concepts and s_concepts:
+        return 0.75 * concept_score + 0.25 * word_score
+    return 0.6 * word_score
+
+
+def match_scope(message: str, scopes: Sequence[str]) -> ScopeMatch:
+    if not scopes:
+        return ScopeMatch()
+    message_sig = scope_signature(message)
+    ranked = sorted(
+        ((round(_score(message_sig, scope_signature(scope)), 4), scope) for scope in scopes),
+        key=lambda pair: pair[0],
+        reverse=True,
+    )
+    best_score, best = ranked[0]
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+    shortlist = [scope for score, scope in ranked[:SCOPE_SHORTLIST_SIZE] if score > 0] or [
+        scope for _, scope in ranked[:SCOPE_SHORTLIST_SIZE]
+    ]
+    if best_score >= SCOPE_AUTO_MATCH_SCORE and best_score - runner_up >= SCOPE_AUTO_MATCH_MARGIN:
+        message_surfaces = scope_surfaces(message)
+        if message_surfaces and message_surfaces != scope_surfaces(best):
+            return ScopeMatch(score=best_score, shortlist=shortlist, confirm=best)
+        return ScopeMatch(scope=best, score=best_score, shortlist=shortlist)
+    return ScopeMatch(score=best_score, shortlist=shortlist)
+
+
+class ScopeCache:
+    """region full_id -> scope titles, with a TTL so other workers' new tasks show up."""
+
+    def __init__(self, ttl: float = SCOPE_CACHE_TTL_SECONDS, size: int = SCOPE_CACHE_SIZE):
+        self._ttl = ttl
+        self._size = size
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    async def get_or_load(self, region: str, loader: Callable[[], Awaitable[List[str]]]) -> List[str]:
+        entry = self._entries.get(region)
+        if entry is not None and time.monotonic() - entry[0] < self._ttl:
+            self._entries.move_to_end(region)
+            return list(entry[1])
+        scopes = list(await loader())
+        self.put(region, scopes)
+        return list(scopes)
+
+    def put(self, region: str, scopes: List[str]) -> None:
+        self._entries[region] = (time.monotonic(), list(scopes))
+        self._entries.move_to_end(region)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def add(self, region: str, scope: str) -> None:
+        entry = self._entries.get(region)
+        if entry is not None and scope not in entry[1]:
+            entry[1].append(scope)
+
+    def invalidate(self, region: str) -> None:
+        self._entries.pop(region, None)
+
+
+scope_cache = ScopeCache()
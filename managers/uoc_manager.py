@@ -1,11 +1,11 @@
 import os
 import json
+import asyncio
 import base64
 from typing import Dict, Optional, List
 import random
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from rapidfuzz import fuzz
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from whatsapp.builder_out import whatsapp_output
@@ -14,35 +14,13 @@ from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 import json, uuid
 from database.uoc_crud import DatabaseCRUD
+from managers.region_catalog import RegionCatalog, remember_catalog
+from managers.project_cache import project_cache
+from managers.plan_ingest import plan_page_content
+from managers.plan_tiles import analyse_plan_tiles, needs_tiling, plan_structure
 
 
 load_dotenv()
-LOW_RISE_ZONES = [
-    "STAIR_CORE",
-    "COMMON_CORRIDOR",
-    "OH_WATER_TANK",
-    "SITE_BOUNDARY",
-    "DRIVEWAY",
-]
-
-MID_RISE_ZONES = [
-    "PASSENGER_LIFT",
-    "FIRE_ESCAPE_STAIR",
-    "PUMP_ROOM",
-    "DG_ROOM",
-    "TRANSFORMER_YARD",
-    "FIRE_RISER_SHAFT",
-]
-
-HIGH_RISE_ZONES = [
-    "SERVICE_LIFT",
-    "REFUGE_FLOOR",
-    "PRESSURIZED_LOBBY",
-    "HVAC_PLANT_ROOM",
-    "BMS_SERVER_ROOM",
-    "STP_PLANT",
-    "FACADE_ZONE",
-]
 llm = ChatOpenAI(
     model="gpt-4o",
     temperature=0,
@@ -71,41 +49,6 @@ def encode_image_base64(path: str) -> str:
 def clean_llm_response(raw_text: str) -> str:
     return raw_text.strip().replace("```json", "").replace  ("```", "")
 
-class ProjectDatabase:
-    def __init__(self):
-        self.user_projects = {}  # Temporary in-memory DB
-
-    def get_projects_for_user(self, sender_id: str) -> List[Dict]:
-        return self.user_projects.get(sender_id, [])
-
-    def save_project_for_user(self, sender_id: str, project_id: str, project_structure: dict):
-        print("UOC Manager:::::: save_project_for_user::::: -- Saved Project, details: --", sender_id, "Project ID:", project_id)
-        if sender_id not in self.user_projects:
-            self.user_projects[sender_id] = []
-        self.user_projects[sender_id].append({
-            "id": project_id,
-            "title": project_structure.get("project_name", "Unnamed Project"),
-            "structure": project_structure
-        })
-
-    def get_project_structure(self, sender_id: str, project_id: str) -> Optional[dict]:
-        for project in self.user_projects.get(sender_id, []):
-            if project["id"] == project_id:
-                return project["structure"]
-        return None
-
-
-def fuzzy_match_project_name(user_text: str, project_list: List[Dict]) -> Optional[Dict]:
-    best_match = None
-    highest_score = 0
-    for project in project_list:
-        score = fuzz.ratio(user_text.lower(), project["title"].lower())
-        if score > highest_score:
-            highest_score = score
-            best_match = project
-    return best_match if highest_score >= 85 else None
-
-
 class UOCManager:
     def __init__(self, crud: DatabaseCRUD, openai_api_key: Optional[str] = None):
         self.crud = crud
@@ -133,13 +76,21 @@ class UOCManager:
                     tree["blocks"].append(node)
 
             elif typ == "floor":
-                floors = {f["floor_number"]: f for f in node.setdefault("floors", [])}
+                floor_list = node.setdefault("floors", [])
+                floors = {f["floor_number"]: f for f in floor_list if "floor_number" in f}
                 num = int(name)
-                node = floors.setdefault(num, {"floor_number": num, "flats": []})
+                if num not in floors:
+                    floors[num] = {"floor_number": num, "flats": []}
+                    floor_list.append(floors[num])
+                node = floors[num]
 
             elif typ == "flat":
-                flats = {f["flat_label"]: f for f in node.setdefault("flats", [])}
-                node = flats.setdefault(name, {"flat_label": name, "tasks": []})
+                flat_list = node.setdefault("flats", [])
+                flats = {f["flat_label"]: f for f in flat_list if "flat_label" in f}
+                if name not in flats:
+                    flats[name] = {"flat_label": name, "tasks": []}
+                    flat_list.append(flats[name])
+                node = flats[name]
 
         # coerce simple digit strings → int
         val = patch["value"]
@@ -188,7 +139,7 @@ class UOCManager:
         if state.get("needs_clarification"):
             print("UOC Manager:::::: select_or_create_project:::::  -- Is project ifrom the list    --", possible_project_name)
             selected_id = user_message
-            if selected_id in [proj["id"] for proj in user_projects]:
+            if selected_id in [str(proj["id"]).lower() for proj in user_projects]:
                 state["active_project_id"] = selected_id
                 state["needs_clarification"] = False
                 return state
@@ -200,7 +151,12 @@ class UOCManager:
     # 3. First attempt: try fuzzy match from possible name
         if possible_project_name:
             print("UOC Manager:::::: select_or_create_project:::::  --  fuzzy match from possible name    --", possible_project_name)
-            match = fuzzy_match_project_name(possible_project_name, user_projects)
+            match = project_cache.match(sender_id, possible_project_name)
+            if not match:
+                # The cache may predate a project created on another replica; check the DB before
+                # falling through to the list / onboarding.
+                user_projects = await self.crud.get_projects_by_sender(sender_id, fresh=True)
+                match = project_cache.match(sender_id, possible_project_name)
             if match:
                 state["fuzzy_project_suggestion"] = match
                 state["needs_clarification"] = True
@@ -215,6 +171,9 @@ class UOCManager:
                 
 
     # 4. No fuzzy match or possible name → show project list (if any)
+        if not user_projects and not possible_project_name:
+            # An empty cached list must not send the sender into onboarding; confirm with the DB.
+            user_projects = await self.crud.get_projects_by_sender(sender_id, fresh=True)
         if user_projects:
             project_titles = [proj.get("title") for proj in user_projects]
             state["needs_clarification"] = True
@@ -379,17 +338,36 @@ Let’s begin with your site plan 👇"""
         print(f"UOC Manager:::::: process_plan_file:::::: -- GPT-4o Vision processing for {file_type}: {file_url}")
         sender_id = state["sender_id"]
         if file_type.lower() == "image":
+            # Large CAD sheets are read tile by tile instead of being downscaled into one shot.
+            try:
+                tiled = await asyncio.to_thread(needs_tiling, file_url)
+            except Exception as e:
+                print("UOC Manager:::::: process_plan_file:::::: -- Could not inspect image size:", str(e))
+                tiled = False
+            if tiled:
+                structure = await self.structure_from_plan_tiles(file_url)
+                if structure:
+                    state["project_structure"] = structure
+                    state["needs_clarification"] = True
+                    state["uoc_confidence"] = "low"
+                    return await self.collect_project_structure_interactively(state)
+                print("UOC Manager:::::: process_plan_file:::::: -- Tiled analysis found no flats, falling back to single image --")
             # Download and encode image to base64
             image_b64 = encode_image_base64(file_url)
             print("UOC Manager:::::: process_plan_file:::::: -- Image encoded to base64 --")
         elif file_type.lower() == "pdf":
-            # Assume PDF text was extracted and stored in state
-            pdf_text = state.get("pdf_text")
-            if not pdf_text:
+            # The webhook extracted the pages to disk; only the likely floor-plan pages are sent.
+            manifest = state.get("plan_manifest")
+            try:
+                plan_content = await plan_page_content(manifest) if manifest else None
+            except Exception as e:
+                print("UOC Manager:::::: process_plan_file:::::: -- Could not load plan pages:", str(e))
+                plan_content = None
+            if not plan_content or not (plan_content.get("text") or plan_content.get("images")):
                 state["latest_respons"] = "⚠️ Sorry, I couldn’t read your PDF. Please try with a clearer version."
                 state["needs_clarification"] = True
                 return state
-            print("UOC Manager:::::: process_plan_file:::::: -- PDF text extracted --")
+            print("UOC Manager:::::: process_plan_file:::::: -- PDF plan pages selected --", plan_content.get("pages"))
         else:
             raise ValueError("Unsupported file type")
         try:
@@ -507,13 +485,23 @@ OUTPUT RULES
         ] 
     }
 ]
+            elif file_type.lower() == "pdf" and plan_content.get("text"):
+                message = [
+                    SystemMessage(content=vision_prompt),
+                    HumanMessage(content=plan_content["text"]),
+                ]
             elif file_type.lower() == "pdf":
-                # extract text (use pdfplumber/pdfminer upstream, or assume text was extracted)
-                pdf_text = state.get("pdf_text") or "Text content from PDF not found."
+                # Drawing pages without usable text go in as rendered images.
                 message = [
                     SystemMessage(content=vision_prompt),
-                    HumanMessage(content=pdf_text),
-                ] 
+                    HumanMessage(content=[
+                        {"type": "text", "text": "Extract the building project structure from these floor plan pages."},
+                        *(
+                            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image}"}}
+                            for image in plan_content["images"]
+                        ),
+                    ]),
+                ]
             else:
                 raise ValueError("Unsupported file type")
 
@@ -538,6 +526,19 @@ OUTPUT RULES
             state["needs_clarification"] = True
             return state
         
+    async def structure_from_plan_tiles(self, file_url: str) -> Optional[Dict]:
+        """Tiled vision pass over a large plan image, in the same schema as the single-image pass."""
+        try:
+            analysis = await analyse_plan_tiles(llm, file_url)
+        except Exception as e:
+            print("UOC Manager:::::: structure_from_plan_tiles:::::: -- Tiled analysis failed:", str(e))
+            return None
+        structure = plan_structure(analysis)
+        if structure is None:
+            return None
+        print("UOC Manager:::::: structure_from_plan_tiles:::::: -- Structure from", analysis["tiles"], "tiles --", structure)
+        return structure
+
     async def collect_project_structure_interactively(self, state: Dict) -> Dict:
         """
         One-turn loop to collect building structure over WhatsApp:
@@ -694,8 +695,8 @@ OUTPUT RULES
             print("UOC Manager:::::: collect_project_structure_interactively:::::: -- Project structure finalized and saved --",state["project_structure"] )
             if state["uoc_confidence"]=="high":
                try:
-                   ids_list=  await self.map_region_ids(state.get("project_structure"))
-                   print("UOC Manager:::::: collect_project_structure_interactively:::::: -- list of IDs --", ids_list)
+                   region_count = len(RegionCatalog.from_structure(state.get("project_structure")))
+                   print("UOC Manager:::::: collect_project_structure_interactively:::::: -- regions mapped --", region_count)
                except Exception as e:
                    print("UOC Manager:::::: collect_project_structure_interactively:::::: -- Error mapping region IDs --", str(e))
                    state["latest_respons"] = "An error occurred while mapping region IDs. Please try again."
@@ -709,113 +710,10 @@ OUTPUT RULES
     async def map_region_ids(project: Dict) -> List[Dict]:
 
         """Generate region-ID map for flats **and** building/common zones."""
-        project_id = project["id"]
-        output: List[Dict] = []
-
-        def build_region_ids_for_flat(
-        project_id: str,
-        block: str,
-        floor: int,
-        flat_number: int,
-        bhk_type: str,
-    ) -> List[str]:
-            base = f"{project_id}::{block}::F{floor}::Flat{flat_number}"
-            ids  = [f"{base}::LIV", f"{base}::KIT"] 
-
-            bhk  = int(''.join(filter(str.isdigit,bhk_type)))
-            for label in ["MBR", "GBR", "CBR", "BR4", "BR5", "BR6"][:bhk]:
-               ids.append(f"{base}::{label}")
-
-            for i in range(1, bhk + 1):                           # toilets
-               ids.append(f"{base}::TOILET{i}")
-
-            ids.append(f"{base}::BAL1")                           # balcony
-            return ids
-    
-        def common_zone_ids(project_id: str, block: str, floor: int | None, zones: List[str]) -> List[str]:
-            if floor is None:
-                base = f"{project_id}::{block}"
-            else:
-                base = f"{project_id}::{block}::F{floor}"
-            return [f"{base}::{z}" for z in zones]
-        
-        for block in project.get("blocks", []):
-            block_name      = block["block_name"]
-            template_flats  = []
-            floors_to_make  = 0
-
-            if block.get("floors"):
-                template_flats = block["floors"][0].get("flats", [])
-                floors_to_make = len(block["floors"])
-            else:
-                template_flats = block.get("flats", [])
-                floors_to_make = block.get("no_of_floors", 0)
-            if not template_flats:
-                raise ValueError(f"{block_name} has no flats template")
-            
-            if floors_to_make <= 3:
-                global_zones = LOW_RISE_ZONES
-            elif floors_to_make <= 5:
-                global_zones = LOW_RISE_ZONES + MID_RISE_ZONES
-            else:
-                global_zones = LOW_RISE_ZONES + MID_RISE_ZONES + HIGH_RISE_ZONES
-  
-            for zid in common_zone_ids(project_id, block_name, None, global_zones):
-                output.append(
-                {
-                    "block":       block_name,
-                    "floor":       None,
-                    "flat_number": None,
-                    "type":        "COMMON",
-                    "facing":      None,
-                    "area":        None,
-                    "region_ids":  [zid],   # single-item list for consistency
-                }
-            )
-
-             
-            for floor_no in range(1, floors_to_make + 1):
-                floor_zone_ids = common_zone_ids(
-                project_id,
-                block_name,
-                floor_no,
-                ["STAIR_CORE", "COMMON_CORRIDOR", "PASSENGER_LIFT"]
-                if floors_to_make >= 4
-                else ["STAIR_CORE", "COMMON_CORRIDOR"],
-            )
-                output.append(
-                {
-                    "block":       block_name,
-                    "floor":       floor_no,
-                    "flat_number": None,
-                    "type":        "FLOOR_COMMON",
-                    "facing":      None,
-                    "area":        None,
-                    "region_ids":  floor_zone_ids,
-                }
-            )
-                for idx, flat in enumerate(template_flats, start=1):
-                    bhk_type = flat["type"]
-                    flat_number = floor_no * 100 + idx
-                    region_ids = build_region_ids_for_flat(
-                    project_id, block_name, floor_no, flat_number, bhk_type
-                )
-                    output.append(
-                    {
-                        "block":       block_name,
-                        "floor":       floor_no,
-                        "flat_number": flat_number,
-                        "type":        bhk_type,
-                        "facing":      flat.get("facing"),
-                        "area":        flat.get("carpet_area"),
-                        "region_ids":  region_ids,
-                    }
-                )
-        return output
+        return list(RegionCatalog.from_structure(project).region_groups())
 
-    
-    async def sync_structure_to_db(self, ps: dict):
-        """Upsert project, blocks, floors, flats, and regions."""
+    async def sync_structure_to_db(self, ps: dict) -> dict:
+        """Upsert the project and all of its regions; returns region counts (total / inserted / updated)."""
         blocks = ps.get("blocks", [])
         project_data = {
         "name": ps["project_name"],
@@ -838,38 +736,25 @@ OUTPUT RULES
         else:
             await self.crud.update_project(ps["id"], project_data)
 
-        for block in ps["blocks"]:
-             block_name = block["block_name"]
-
-            #  for floor in range(1, block["no_of_floors"] + 1):
-            #       for idx, flat in enumerate(block.get("flats", []), start=1):
-            #            flat_no = floor * 100 + idx
-            #            flat_data = {
-            #     "project_id": ps["id"],
-            #     "block_name": block_name,
-            #     "floor_no": floor,
-            #     "flat_no": flat_no,
-            #     "bhk_type": flat["type"],
-            #     "facing": flat.get("facing"),
-            #     "carpet_sft": flat.get("carpet_area")
-            # }
-            #       await self.crud.upsert_flat(flat_data)
-             region_list = await self.map_region_ids(ps)
-             for region in region_list:
-                   for region_id in region["region_ids"]:  
-                       region_data = {
-    "full_id": region_id,
-    "code": region["type"],
-    "project_id": ps["id"],
-    "flat_id": None,
-    "block_name": region.get("block_name"),
-    "floor_no": region.get("floor_no"),
-    "meta": {}
-}
-                       await self.crud.upsert_region(region_data)
-    
-
-
+        # Generate the region map once for the whole project and write it in one bulk transaction.
+        catalog = RegionCatalog.from_structure(ps)
+        region_rows = (
+            {
+                "full_id": region_id,
+                "code": region["type"],
+                "project_id": ps["id"],
+                "flat_id": None,
+                "block_name": region.get("block"),
+                "floor_no": region.get("floor"),
+                "meta": {},
+            }
+            for region in catalog.region_groups()
+            for region_id in region["region_ids"]
+        )
+        counts = await self.crud.bulk_upsert_regions(region_rows)
+        remember_catalog(catalog)
+        print("UOC Manager:::::: sync_structure_to_db:::::: -- Regions synced --", counts)
+        return counts
 
 
     def build_region_id(self, block: str, floor: int, flat_number: int, region_type: str) -> str:
@@ -11,6 +11,8 @@ class AgentState(TypedDict):
     sender_id: str
     intent: Optional[str]
     image_path: Optional[str]
+    file_local_path: Optional[str]
+    plan_manifest: Optional[dict]           # managers.plan_ingest summary; page text stays on disk
     msg_type: Optional[str]
     media_id: Optional[str]
     caption: Optional[str]
@@ -31,7 +33,8 @@ class AgentState(TypedDict):
     fuzzy_project_suggestion:Optional[dict]
     active_project_id: Optional[str]         
     siteops_conversation_log: Optional[List[dict]]
-    region_candidates: Optional[List[str]]
+    region_candidates: Optional[List[str]]  # legacy; superseded by region_catalog
+    region_catalog: Optional[dict]          # RegionCatalog.to_state()
     task_id: Optional[str]
     active_material_request_id: Optional[str]         
     procurement_details: Optional[dict]
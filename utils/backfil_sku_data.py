@@ -3,6 +3,11 @@
 Run locally with DATABASE_URL pointing to the Postgres instance.  The script populates
 `type_norm`, size fields (mm + native/unit pairs), and bumps `updated_at` so the trigger
 refreshes `search_text` and `tsv`.
+
+Rows are paged by keyset on `sku_id`, per-row updates are computed in a process pool and
+written back with one `UPDATE ... FROM (VALUES ...)` per batch.  Progress is checkpointed
+to CHECKPOINT_PATH after every committed batch, so an interrupted run resumes where it
+stopped; the checkpoint is removed once the backfill completes.
 """
 
 from __future__ import annotations
@@ -20,11 +25,12 @@ import copy
 import json
 import math
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from sqlalchemy import select, text, update
+from sqlalchemy import column, select, text, update, values
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from database.models import SkuMaster
@@ -35,6 +41,7 @@ from utils.sku_normalizer import (
 )
 
 BATCH_SIZE = 500
+CHECKPOINT_PATH = Path(os.getenv("SKU_BACKFILL_CHECKPOINT", ROOT / "outputs" / "backfil_sku_data.checkpoint.json"))
 
 
 def _load_attrs(raw: Any) -> Dict[str, Any]:
@@ -227,8 +234,8 @@ def _require_db_url() -> str:
     return url
 
 
-def _select_stmt(offset: int, limit: int):
-    return (
+def _select_stmt(after_sku_id: Optional[str], limit: int):
+    stmt = (
         select(
             SkuMaster.sku_id,
             SkuMaster.category,
@@ -244,17 +251,70 @@ def _select_stmt(offset: int, limit: int):
         )
         .where(SkuMaster.status == "active")
         .order_by(SkuMaster.sku_id)
-        .offset(offset)
         .limit(limit)
     )
+    if after_sku_id is not None:
+        stmt = stmt.where(SkuMaster.sku_id > after_sku_id)
+    return stmt
 
 
-async def _fetch_batch(engine: AsyncEngine, offset: int, limit: int):
+async def _fetch_batch(engine: AsyncEngine, after_sku_id: Optional[str], limit: int):
     async with engine.connect() as conn:
-        result = await conn.execute(_select_stmt(offset, limit))
-        return result.mappings().all()
-
-
+        result = await conn.execute(_select_stmt(after_sku_id, limit))
+        return [dict(row) for row in result.mappings().all()]
+
+
+def _compute_batch(rows: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Pool worker: (sku_id, updates) for every row that needs a change."""
+    changes: List[Tuple[str, Dict[str, Any]]] = []
+    for row in rows:
+        updates = _compute_updates(row)
+        if updates:
+            changes.append((row["sku_id"], updates))
+    return changes
+
+
+async def _apply_updates(engine: AsyncEngine, changes: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """One UPDATE ... FROM (VALUES ...) per distinct set of changed columns (usually one or two)."""
+    if not changes:
+        return 0
+    groups: Dict[Tuple[str, ...], List[Tuple[str, Dict[str, Any]]]] = {}
+    for sku_id, updates in changes:
+        groups.setdefault(tuple(sorted(updates)), []).append((sku_id, updates))
+
+    table = SkuMaster.__table__
+    now = datetime.utcnow()
+    async with engine.begin() as conn:
+        for cols, group in groups.items():
+            vals = values(
+                column("sku_id", table.c.sku_id.type),
+                *(column(c, table.c[c].type) for c in cols),
+                name="v",
+            ).data([(sku_id, *(updates[c] for c in cols)) for sku_id, updates in group])
+            stmt = (
+                update(SkuMaster)
+                .where(SkuMaster.sku_id == vals.c.sku_id)
+                .values({**{c: vals.c[c] for c in cols}, "updated_at": now})
+            )
+            await conn.execute(stmt)
+    return len(changes)
+
+
+def _load_checkpoint() -> Dict[str, Any]:
+    if not CHECKPOINT_PATH.exists():
+        return {"last_sku_id": None, "total": 0, "touched": 0}
+    with CHECKPOINT_PATH.open("r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    print(f"Resuming from checkpoint after sku_id={data.get('last_sku_id')!r}")
+    return data
+
+
+def _save_checkpoint(state: Dict[str, Any]) -> None:
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT_PATH.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(tmp, CHECKPOINT_PATH)
 
 async def _ensure_native_columns_text(engine: AsyncEngine) -> None:
     async with engine.connect() as conn:
@@ -316,35 +376,33 @@ async def _prune_bad_reducers(engine: AsyncEngine) -> int:
     return len(deleted)
 
 
-async def backfill(engine: AsyncEngine) -> None:
-    offset = 0
-    total = 0
-    touched = 0
-
-    while True:
-        rows = await _fetch_batch(engine, offset, BATCH_SIZE)
-        if not rows:
-            break
-
-        total += len(rows)
-
-        async with engine.begin() as conn:
-            for row in rows:
-                updates = _compute_updates(row)
-                if not updates:
-                    continue
-                updates["updated_at"] = datetime.utcnow()
-                await conn.execute(
-                    update(SkuMaster)
-                    .where(SkuMaster.sku_id == row["sku_id"])
-                    .values(**updates)
-                )
-                touched += 1
-
-        offset += BATCH_SIZE
-
-    print(f"Processed {total} rows; updated {touched} rows.")
-
+async def backfill(engine: AsyncEngine, workers: Optional[int] = None) -> None:
+    state = _load_checkpoint()
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = await _fetch_batch(engine, state["last_sku_id"], BATCH_SIZE)
+        while rows:
+            last_sku_id = rows[-1]["sku_id"]
+            # Compute this batch in the pool while the next keyset page is fetched.
+            compute = loop.run_in_executor(pool, _compute_batch, rows)
+            prefetch = asyncio.create_task(_fetch_batch(engine, last_sku_id, BATCH_SIZE))
+            try:
+                changes = await compute
+                touched = await _apply_updates(engine, changes)
+            except BaseException:
+                prefetch.cancel()
+                raise
+
+            state["total"] += len(rows)
+            state["touched"] += touched
+            state["last_sku_id"] = last_sku_id
+            _save_checkpoint(state)
+            rows = await prefetch
+
+    if CHECKPOINT_PATH.exists():
+        CHECKPOINT_PATH.unlink()
+    print(f"Processed {state['total']} rows; updated {state['touched']} rows.")
 
 async def main() -> None:
     url = _require_db_url()
@@ -6,6 +6,7 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine
 
 load_dotenv()
@@ -55,32 +56,116 @@ TRIGGER_SQL = [
     END;
     $$;
     """,
-    "CREATE TRIGGER sku_master_search_update BEFORE INSERT OR UPDATE ON public.sku_master FOR EACH ROW EXECUTE FUNCTION public.sku_master_search_update();",
+    # Only fire on the trigger's inputs, so writes that touch search_text/tsv (or sizes, prices, status) don't re-run it.
+    "CREATE TRIGGER sku_master_search_update BEFORE INSERT OR UPDATE OF brand, category, type_norm, attributes, description ON public.sku_master FOR EACH ROW EXECUTE FUNCTION public.sku_master_search_update();",
 ]
 
+# Legacy full-table refresh (rewrites every row twice under one long lock); kept for SKU_INDEX_REFRESH=full.
 REFRESH_SQL = [
     "UPDATE public.sku_master SET search_text = concat_ws(' ', brand, category, COALESCE(type_norm,''), COALESCE(attributes->>'raw_dimension',''), COALESCE(description,''));",
     "UPDATE public.sku_master SET tsv = to_tsvector('simple', unaccent(COALESCE(search_text,'')));",
 ]
 
+REFRESH_BATCH_SIZE = int(os.getenv("SKU_INDEX_REFRESH_BATCH", "2000"))
+REFRESH_PAUSE_SECONDS = float(os.getenv("SKU_INDEX_REFRESH_PAUSE", "0.25"))
+REFRESH_LOCK_TIMEOUT = os.getenv("SKU_INDEX_REFRESH_LOCK_TIMEOUT", "2s")
+REFRESH_MAX_RETRIES = 5
+
+# One keyset page per statement: recompute search_text/tsv in a single pass and only
+# write rows whose stored values differ (i.e. whose inputs changed since the last refresh).
+REFRESH_BATCH_SQL = text(
+    """
+    WITH batch AS (
+        SELECT sku_id,
+               concat_ws(' ', brand, category, COALESCE(type_norm,''), COALESCE(attributes->>'raw_dimension',''), COALESCE(description,'')) AS new_search_text
+        FROM public.sku_master
+        WHERE (CAST(:after AS text) IS NULL OR sku_id > CAST(:after AS text))
+        ORDER BY sku_id
+        LIMIT :limit
+    ),
+    computed AS (
+        SELECT sku_id, new_search_text, to_tsvector('simple', unaccent(COALESCE(new_search_text,''))) AS new_tsv
+        FROM batch
+    ),
+    changed AS (
+        UPDATE public.sku_master sm
+        SET search_text = c.new_search_text,
+            tsv = c.new_tsv
+        FROM computed c
+        WHERE sm.sku_id = c.sku_id
+          AND (sm.search_text IS DISTINCT FROM c.new_search_text OR sm.tsv IS DISTINCT FROM c.new_tsv)
+        RETURNING sm.sku_id
+    )
+    SELECT (SELECT max(sku_id) FROM batch) AS last_sku_id,
+           (SELECT count(*) FROM batch) AS scanned,
+           (SELECT count(*) FROM changed) AS updated
+    """
+)
+
+
 async def apply_statements(engine, statements):
     async with engine.begin() as conn:
         for sql in statements:
             await conn.execute(text(sql))
 
+
+async def refresh_search_columns(
+    engine,
+    batch_size: int = REFRESH_BATCH_SIZE,
+    pause_seconds: float = REFRESH_PAUSE_SECONDS,
+    lock_timeout: str = REFRESH_LOCK_TIMEOUT,
+):
+    """Online replacement for REFRESH_SQL, safe to run against production.
+
+    Each page is its own short transaction with a lock_timeout, so the job never queues
+    behind (or blocks) application writes for long; unchanged rows are not rewritten,
+    and the loop sleeps between pages to leave I/O headroom.
+    """
+    after = None
+    scanned = updated = 0
+    retries = 0
+    while True:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+                row = (await conn.execute(REFRESH_BATCH_SQL, {"after": after, "limit": batch_size})).mappings().one()
+        except DBAPIError as exc:
+            retries += 1
+            if retries > REFRESH_MAX_RETRIES:
+                raise
+            print(f"Refresh batch after {after!r} failed ({exc.__class__.__name__}); retry {retries}/{REFRESH_MAX_RETRIES}")
+            await asyncio.sleep(pause_seconds * (2 ** retries))
+            continue
+        retries = 0
+        if not row["scanned"]:
+            break
+        after = row["last_sku_id"]
+        scanned += row["scanned"]
+        updated += row["updated"]
+        print(f"Refreshed up to sku_id={after!r}: scanned {scanned}, updated {updated}")
+        await asyncio.sleep(pause_seconds)
+    return {"scanned": scanned, "updated": updated}
+
 async def main():
     engine = create_async_engine(DB_URL, future=True)
+    refresh_mode = os.getenv("SKU_INDEX_REFRESH", "batched").lower()
     try:
-        print("Ensuring extensions...")
-        await apply_statements(engine, EXTENSION_SQL)
-        print("Altering sku_master columns...")
-        await apply_statements(engine, ALTER_SQL)
-        print("Creating indexes...")
-        await apply_statements(engine, INDEX_SQL)
-        print("Installing trigger...")
-        await apply_statements(engine, TRIGGER_SQL)
+        # SKU_INDEX_REFRESH=only skips the DDL steps (which take table locks) for business-hours runs.
+        if refresh_mode != "only":
+            print("Ensuring extensions...")
+            await apply_statements(engine, EXTENSION_SQL)
+            print("Altering sku_master columns...")
+            await apply_statements(engine, ALTER_SQL)
+            print("Creating indexes...")
+            await apply_statements(engine, INDEX_SQL)
+            print("Installing trigger...")
+            await apply_statements(engine, TRIGGER_SQL)
         print("Refreshing search_text and tsv...")
-        await apply_statements(engine, REFRESH_SQL)
+        if refresh_mode == "full":
+            await apply_statements(engine, REFRESH_SQL)
+        else:
+            stats = await refresh_search_columns(engine)
+            print(f"Refresh complete: {stats}")
         print("Schema update complete.")
     finally:
         await engine.dispose()
@@ -6,6 +6,7 @@ import math
 import os
 import uuid
 from datetime import datetime
+from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
 import pandas as pd
@@ -26,6 +27,17 @@ DB_URL = os.getenv("DATABASE_URL")
 
 REQUIRED_COLS = ("brand", "category", "uom_code", "attributes")
 
+STAGE_TABLE = "sku_master_stage"
+SEARCH_TRIGGER = "sku_master_search_update"
+STAGE_COLUMNS = (
+    "sku_id", "brand", "category", "uom_code", "pack_qty", "pack_uom", "description",
+    "attributes", "canonical_key", "status", "ambiguous", "type_norm",
+    "size_mm_primary", "size_mm_secondary", "primary_size_native", "primary_size_unit",
+    "secondary_size_native", "secondary_size_unit", "created_at", "updated_at",
+)
+# Columns refreshed when an existing sku_id is reloaded with on_conflict="update".
+MERGE_UPDATE_COLUMNS = tuple(c for c in STAGE_COLUMNS if c not in ("sku_id", "created_at"))
+
 
 def _require_asyncpg(url: str):
     if not url:
@@ -237,10 +249,168 @@ async def insert_excel_into_sku_master(
     return {"processed": processed, "inserted": inserted, "skipped": skipped}
 
 
+# ---------------------------------------------------------------------------
+# Bulk ingest: stream rows into a temp staging table with COPY, then merge
+# into sku_master with one INSERT ... SELECT ... ON CONFLICT.
+# ---------------------------------------------------------------------------
+
+def _iter_excel_rows(path: str, sheet_name: Optional[str]):
+    """Row-by-row reader (openpyxl read-only) so the sheet is never held in memory.
+    Cells are stringified to match the dtype=str behaviour of _read_excel_rows.
+    """
+    from openpyxl import load_workbook
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c).strip() if c is not None else "" for c in header]
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            yield {
+                col: (None if v is None else str(v))
+                for col, v in zip(columns, values)
+                if col
+            }
+    finally:
+        wb.close()
+
+
+def _as_decimal(value: Optional[float]) -> Optional[Decimal]:
+    if value is None:
+        return None
+    return Decimal(str(value))
+
+
+def _stage_tuple(rec: Dict[str, Any]) -> tuple:
+    values = dict(rec)
+    values["attributes"] = json.dumps(rec["attributes"], ensure_ascii=False)
+    values["pack_qty"] = _as_decimal(rec["pack_qty"])
+    values["size_mm_primary"] = _as_decimal(rec["size_mm_primary"])
+    values["size_mm_secondary"] = _as_decimal(rec["size_mm_secondary"])
+    values["ambiguous"] = bool(rec["ambiguous"])
+    return tuple(values.get(col) for col in STAGE_COLUMNS)
+
+
+def _merge_sql(schema: str, table_name: str, on_conflict: str) -> str:
+    cols = ", ".join(STAGE_COLUMNS)
+    select_cols = ", ".join(f"s.{c}" for c in STAGE_COLUMNS)
+    # Same expressions as the sku_master_search_update trigger, evaluated once per statement.
+    search_expr = (
+        "concat_ws(' ', s.brand, s.category, COALESCE(s.type_norm,''), "
+        "COALESCE(s.attributes->>'raw_dimension',''), COALESCE(s.description,''))"
+    )
+    if on_conflict == "update":
+        assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in MERGE_UPDATE_COLUMNS)
+        changed = " OR ".join(f"t.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in MERGE_UPDATE_COLUMNS if c != "updated_at")
+        conflict = (
+            f"ON CONFLICT (sku_id) DO UPDATE SET {assignments}, "
+            "search_text = EXCLUDED.search_text, tsv = EXCLUDED.tsv "
+            f"WHERE {changed}"
+        )
+    else:
+        conflict = "ON CONFLICT (sku_id) DO NOTHING"
+    return f"""
+        WITH src AS (
+            SELECT DISTINCT ON (s.sku_id) {select_cols}, {search_expr} AS search_text
+            FROM {STAGE_TABLE} s
+            ORDER BY s.sku_id
+        ),
+        merged AS (
+            INSERT INTO {schema}.{table_name} AS t ({cols}, search_text, tsv)
+            SELECT src.*, to_tsvector('simple', unaccent(COALESCE(src.search_text, '')))
+            FROM src
+            {conflict}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            count(*) FILTER (WHERE inserted) AS inserted,
+            count(*) FILTER (WHERE NOT inserted) AS updated
+        FROM merged
+    """
+
+
+async def bulk_load_sku_master(
+    excel_path: str,
+    sheet_name: Optional[str] = None,
+    schema: str = SCHEMA,
+    table_name: str = TABLE_NAME,
+    on_conflict: str = "nothing",
+    defer_search_trigger: bool = True,
+) -> Dict[str, int]:
+    """COPY-based alternative to insert_excel_into_sku_master for large catalogues.
+
+    - rows are read lazily and streamed via asyncpg copy_records_to_table into a temp table
+    - one INSERT ... SELECT ... ON CONFLICT (sku_id) merges them into sku_master
+    - search_text/tsv are computed set-wise in the merge; with defer_search_trigger the
+      per-row sku_master_search_update trigger is disabled for the duration of the transaction
+    - on_conflict="nothing" keeps existing rows (legacy behaviour); "update" refreshes changed ones
+
+    Returns {"processed", "loaded", "updated", "skipped", "unchanged"}: skipped rows failed
+    _build_record validation, unchanged rows already existed (or were duplicate sku_ids in the sheet).
+    """
+    if on_conflict not in ("nothing", "update"):
+        raise ValueError("on_conflict must be 'nothing' or 'update'")
+    _require_asyncpg(DB_URL)
+    engine = create_async_engine(DB_URL, future=True)
+    counts = {"processed": 0, "skipped": 0, "staged": 0}
+
+    def _records():
+        for row in _iter_excel_rows(excel_path, sheet_name):
+            counts["processed"] += 1
+            rec = _build_record(row)
+            if rec is None:
+                counts["skipped"] += 1
+                continue
+            counts["staged"] += 1
+            yield _stage_tuple(rec)
+
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            apg = raw.driver_connection
+            async with apg.transaction():
+                await apg.execute(
+                    f"CREATE TEMP TABLE {STAGE_TABLE} "
+                    f"(LIKE {schema}.{table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await apg.copy_records_to_table(STAGE_TABLE, records=_records(), columns=list(STAGE_COLUMNS))
+                if defer_search_trigger:
+                    await apg.execute(f"ALTER TABLE {schema}.{table_name} DISABLE TRIGGER {SEARCH_TRIGGER}")
+                row = await apg.fetchrow(_merge_sql(schema, table_name, on_conflict))
+                if defer_search_trigger:
+                    await apg.execute(f"ALTER TABLE {schema}.{table_name} ENABLE TRIGGER {SEARCH_TRIGGER}")
+    finally:
+        await engine.dispose()
+
+    loaded = int(row["inserted"] or 0)
+    updated = int(row["updated"] or 0)
+    return {
+        "processed": counts["processed"],
+        "loaded": loaded,
+        "updated": updated,
+        "skipped": counts["skipped"],
+        "unchanged": counts["staged"] - loaded - updated,
+    }
+
+
 async def main():
     print(f"Excel file: {EXCEL_PATH}")
     print("Loading DATABASE_URL from .env ...")
-    stats = await insert_excel_into_sku_master(EXCEL_PATH, EXCEL_SHEET)
+    if os.getenv("SKU_BULK_LOAD", "").lower() in ("1", "true", "yes"):
+        stats = await bulk_load_sku_master(
+            EXCEL_PATH,
+            EXCEL_SHEET,
+            on_conflict=os.getenv("SKU_BULK_ON_CONFLICT", "nothing"),
+        )
+    else:
+        stats = await insert_excel_into_sku_master(EXCEL_PATH, EXCEL_SHEET)
     print(stats)
 
 
@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import argparse
 import json
 import math
+import os
 import re
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
 SOURCE_PATH = Path(r"C:\Users\vlaks\Downloads\data_download")
 OUTPUT_PATH = Path("outputs/cleaned_sku_master.xlsx")
 SORTED_OUTPUT_PATH = Path("outputs/cleaned_sku_master_sorted.xlsx")
+CHUNKED_OUTPUT_DIR = Path("outputs/cleaned_sku_master")
+CHUNK_SIZE = 50_000
+OUTPUT_COLUMNS = (
+    "sku_id", "brand", "category", "uom_code", "pack_qty", "pack_uom", "description",
+    "attributes", "canonical_key", "status", "created_at", "updated_at", "type_norm",
+    "size_mm_primary", "size_mm_secondary", "ambiguous",
+)
 ALLOWED_MATERIALS = {"uPVC", "CPVC", "HDPE", "GI", "SS", "Brass", "PVC"}
 ALLOWED_PRODUCT_TYPES = {"Pipe", "Fitting", "Valve", "Tap", "Hose"}
 UNIT_MAPPINGS = {
@@ -657,6 +668,332 @@ def process_row(row: pd.Series) -> ProcessResult:
     return ProcessResult(output_row, should_drop_row, ambiguous)
 
 
+# ---------------------------------------------------------------------------
+# Chunked / column-wise transform
+#
+# Same output as process_row, but each chunk is handled column by column:
+# cheap checks run as pandas string ops over the whole column, and the
+# expensive scalar parsers run once per distinct input instead of once per row
+# (supplier catalogues repeat the same dimension/type strings thousands of times).
+# ---------------------------------------------------------------------------
+
+DROP_PATTERN = "|".join(re.escape(token) for token in sorted(DROP_KEYWORDS))
+
+
+def _column(df: pd.DataFrame, name: str) -> List[object]:
+    if name in df.columns:
+        return df[name].tolist()
+    return [None] * len(df)
+
+
+def _map_distinct(fn: Callable[..., object], *columns: Sequence[object]) -> List[object]:
+    """Apply fn row-wise over zipped columns, evaluating each distinct input tuple once."""
+    cache: Dict[Tuple[object, ...], object] = {}
+    out: List[object] = []
+    for key in zip(*columns):
+        try:
+            out.append(cache[key])
+        except KeyError:
+            value = fn(*key)
+            cache[key] = value
+            out.append(value)
+        except TypeError:
+            out.append(fn(*key))
+    return out
+
+
+def _text_series(values: Iterable[object]) -> pd.Series:
+    return pd.Series(list(values), dtype=object)
+
+
+def _material_series(texts: pd.Series) -> pd.Series:
+    """Column-wise _material_from_token."""
+    lower = texts.str.lower().str.strip()
+    conditions = [
+        lower.str.contains("cpvc", regex=False),
+        lower.str.contains("hdpe", regex=False),
+        lower.str.contains("pvc-u", regex=False) | lower.str.contains("upvc", regex=False),
+        lower.str.startswith("gi") | lower.str.contains(" gi", regex=False),
+        lower.str.contains("brass", regex=False),
+        lower.str.contains("stainless", regex=False) | lower.str.contains("ss", regex=False),
+        lower.str.contains("pvc", regex=False),
+    ]
+    choices = ["CPVC", "HDPE", "uPVC", "GI", "Brass", "SS", "PVC"]
+    picked = np.select([c.to_numpy(dtype=bool) for c in conditions], choices, default="")
+    return pd.Series([value or None for value in picked], dtype=object)
+
+
+def _raw_material_guess(raw_material: object) -> Optional[str]:
+    if not raw_material:
+        return None
+    for token in re.split(r"[\/,]", str(raw_material)):
+        guess = _material_from_token(token)
+        if guess:
+            return guess
+    return None
+
+
+def _standards_series(texts: pd.Series) -> List[List[str]]:
+    per_pattern = [texts.str.findall(pattern).tolist() for pattern in STANDARD_PATTERNS]
+    return [list(matches) for matches in zip(*per_pattern)]
+
+
+def _merge_standards(*groups: Sequence[List[str]]) -> List[str]:
+    standards: List[str] = []
+    for group in groups:
+        for matches in group:
+            for match in matches:
+                cleaned = re.sub(r"\s+", " ", match.strip()).upper()
+                if cleaned not in standards:
+                    standards.append(cleaned)
+    return standards
+
+
+def process_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, int, int]:
+    """Column-wise equivalent of running process_row over every row of df.
+    Returns (kept rows, dropped count, ambiguous count among kept rows).
+    """
+    df = df.reset_index(drop=True)
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=list(OUTPUT_COLUMNS)), 0, 0
+
+    description_raw = _text_series(str(v or "").strip() for v in _column(df, "description"))
+    category_raw = _map_distinct(lambda v: str(v or ""), _column(df, "category"))
+    attributes = _map_distinct(parse_attributes, _column(df, "attributes"))
+    attr_dicts = [a if isinstance(a, dict) else {} for a in attributes]
+    raw_type = [a.get("type") for a in attr_dicts]
+    raw_material = [a.get("material") for a in attr_dicts]
+    attr_variant = [a.get("variant") for a in attr_dicts]
+    raw_dimension = [a.get("dimension") for a in attr_dicts]
+
+    brand = _map_distinct(clean_brand, _column(df, "brand"))
+
+    # material: first hit across attribute tokens, then category, then description
+    material = pd.Series(_map_distinct(_raw_material_guess, raw_material), dtype=object)
+    category_guess = pd.Series(_map_distinct(_material_from_token, category_raw), dtype=object)
+    material = material.where(material.notna(), category_guess)
+    material = material.where(material.notna(), _material_series(description_raw))
+    material = material.where(material.isin(ALLOWED_MATERIALS), None)
+    material_ambiguous = material.isna().to_numpy()
+
+    types = _map_distinct(normalize_type, raw_type)
+    type_title = [t[0] for t in types]
+    type_slug = [t[1] for t in types]
+    products = _map_distinct(detect_product_type, category_raw, raw_type)
+    product_type = pd.Series([p[0] for p in products], dtype=object)
+    product_ambiguous = np.array([p[1] for p in products], dtype=bool)
+
+    # variant: SWR / Pressure keyword across category + description + attribute, attribute wins
+    variant_text = _text_series(
+        " ".join(filter(None, parts)).lower()
+        for parts in zip(category_raw, description_raw, attr_variant)
+    )
+    variant = np.where(
+        variant_text.str.contains("swr", regex=False).to_numpy(dtype=bool),
+        "SWR",
+        np.where(variant_text.str.contains("pressure", regex=False).to_numpy(dtype=bool), "Pressure", ""),
+    ).astype(object)
+    attr_clean = [v.strip().upper() if isinstance(v, str) else "" for v in attr_variant]
+    for idx, clean in enumerate(attr_clean):
+        if clean in {"SWR", "PRESSURE"}:
+            variant[idx] = clean.title()
+    variant = [v or None for v in variant]
+    standards = [
+        _merge_standards(desc_hits, attr_hits)
+        for desc_hits, attr_hits in zip(
+            _standards_series(description_raw),
+            _standards_series(_text_series(v or "" for v in attr_variant)),
+        )
+    ]
+
+    material_list = material.tolist()
+    product_list = product_type.tolist()
+    dimensions = _map_distinct(parse_dimension, material_list, product_list, type_title, raw_dimension)
+    sizes = [compute_size_mm_fields(d.numeric_sizes) for d in dimensions]
+
+    keep_material = material.isin(ALLOWED_MATERIALS) | product_type.isin(ALLOWED_PRODUCT_TYPES)
+    mentions_drop = description_raw.str.lower().str.contains(DROP_PATTERN, regex=True)
+    dropped_mask = (~keep_material & mentions_drop).to_numpy(dtype=bool)
+
+    uom_code = _map_distinct(normalize_uom, _column(df, "uom_code"))
+    pack_uom = _map_distinct(normalize_uom, _column(df, "pack_uom"))
+    unit = [u or p for u, p in zip(uom_code, pack_uom)]
+    pack_qty = _map_distinct(safe_int, _column(df, "pack_qty"))
+
+    rows: List[Dict[str, object]] = []
+    ambiguous_count = 0
+    for i in range(n):
+        if dropped_mask[i]:
+            continue
+        mat = material_list[i]
+        prod = product_list[i]
+        dim = dimensions[i]
+        size_primary, size_secondary = sizes[i]
+        ambiguous = bool(
+            material_ambiguous[i] or product_ambiguous[i] or dim.ambiguous
+            or not mat or not prod or not size_primary
+        )
+        ambiguous_count += ambiguous
+        canonical = ""
+        if not ambiguous:
+            canonical = build_canonical_key(type_slug[i], mat, prod, size_primary, size_secondary, variant[i])
+        rows.append({
+            "sku_id": "",
+            "brand": brand[i],
+            "category": f"{mat} {prod}".strip() if mat and prod else category_raw[i],
+            "uom_code": unit[i],
+            "pack_qty": pack_qty[i] if pack_qty[i] is not None else "",
+            "pack_uom": unit[i],
+            "description": build_description(mat, prod, type_title[i], dim.display_size, variant[i], standards[i]),
+            "attributes": build_attributes(mat, type_title[i], variant[i], dim.info),
+            "canonical_key": canonical,
+            "status": "active",
+            "created_at": "",
+            "updated_at": "",
+            "type_norm": type_slug[i] or "",
+            "size_mm_primary": str(size_primary) if size_primary else "",
+            "size_mm_secondary": str(size_secondary) if size_secondary else "",
+            "ambiguous": ambiguous,
+        })
+    dropped = int(dropped_mask.sum())
+    return pd.DataFrame(rows, columns=list(OUTPUT_COLUMNS)), dropped, ambiguous_count
+
+
+def _sort_for_review(output_df: pd.DataFrame) -> pd.DataFrame:
+    category_counts = output_df["category"].value_counts(dropna=False)
+    sorted_df = output_df.copy()
+    sorted_df["__category_freq"] = sorted_df["category"].map(category_counts).fillna(0)
+    sorted_df["__size_mm_primary_sort"] = pd.to_numeric(sorted_df["size_mm_primary"], errors="coerce")
+    sorted_df["__size_mm_secondary_sort"] = pd.to_numeric(sorted_df["size_mm_secondary"], errors="coerce")
+    return sorted_df.sort_values(
+        by=["__category_freq", "category", "__size_mm_primary_sort", "__size_mm_secondary_sort", "description"],
+        ascending=[False, True, True, True, True],
+        na_position="last",
+    ).drop(columns=["__category_freq", "__size_mm_primary_sort", "__size_mm_secondary_sort"])
+
+
+class _ParquetSink:
+    """Appends chunks to a single Parquet file; disabled when pyarrow is not installed."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.writer = None
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print(f"Warning: pyarrow not installed, skipping {path}")
+            self.enabled = False
+            return
+        self._pa = pa
+        self._pq = pq
+        self.enabled = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        if not self.enabled or df.empty:
+            return
+        table = self._pa.Table.from_pandas(df.astype(str), preserve_index=False)
+        if self.writer is None:
+            self.writer = self._pq.ParquetWriter(str(self.path), table.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _iter_source_chunks(path: Path, chunk_size: int) -> Iterable[pd.DataFrame]:
+    if not path.exists():
+        raise FileNotFoundError(f"Source file not found at {path}")
+    if path.suffix.lower() in {".xlsx", ".xls"}:
+        # Excel has no streaming reader in pandas; slice the sheet instead.
+        df = pd.read_excel(path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def transform_chunked(
+    source_path: Path = SOURCE_PATH,
+    output_dir: Path = CHUNKED_OUTPUT_DIR,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None,
+    formats: Sequence[str] = ("parquet", "csv"),
+) -> Dict[str, int]:
+    """Stream the source catalogue in chunks through process_frame on a process pool.
+    CSV/Parquet outputs are appended chunk by chunk (bounded memory); "xlsx" additionally
+    writes the unsorted + review-sorted workbooks at the end, which needs the full frame.
+    Duplicate rows are removed across chunks via row hashes.
+    """
+    formats = {f.lower() for f in formats}
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "cleaned_sku_master.csv"
+    parquet = _ParquetSink(output_dir / "cleaned_sku_master.parquet") if "parquet" in formats else None
+    write_csv = "csv" in formats or "xlsx" in formats
+    if write_csv and csv_path.exists():
+        csv_path.unlink()
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    seen_hashes: set = set()
+    stats = {"rows_in": 0, "rows_out": 0, "dropped": 0, "ambiguous": 0, "duplicates": 0, "chunks": 0}
+
+    def _consume(result: Tuple[pd.DataFrame, int, int]) -> None:
+        frame, dropped, ambiguous = result
+        stats["chunks"] += 1
+        stats["dropped"] += dropped
+        stats["ambiguous"] += ambiguous
+        if frame.empty:
+            return
+        row_hashes = pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+        keep = np.ones(len(frame), dtype=bool)
+        for idx, h in enumerate(row_hashes):
+            if h in seen_hashes:
+                keep[idx] = False
+            else:
+                seen_hashes.add(h)
+        stats["duplicates"] += int((~keep).sum())
+        frame = frame[keep]
+        stats["rows_out"] += len(frame)
+        if write_csv:
+            frame.to_csv(csv_path, mode="a", header=not csv_path.exists(), index=False)
+        if parquet is not None:
+            parquet.write(frame)
+        print(f"Chunk {stats['chunks']}: {stats['rows_in']} rows read, {stats['rows_out']} written")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight: deque = deque()
+            for chunk in _iter_source_chunks(source_path, chunk_size):
+                stats["rows_in"] += len(chunk)
+                in_flight.append(pool.submit(process_frame, chunk))
+                # Cap queued chunks so memory stays bounded; results are consumed in order.
+                while len(in_flight) >= workers * 2:
+                    _consume(in_flight.popleft().result())
+            while in_flight:
+                _consume(in_flight.popleft().result())
+    finally:
+        if parquet is not None:
+            parquet.close()
+
+    if not stats["rows_out"]:
+        raise RuntimeError("No rows processed; check input data")
+
+    if "xlsx" in formats:
+        output_df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+        output_df.to_excel(output_dir / OUTPUT_PATH.name, index=False)
+        _sort_for_review(output_df).to_excel(output_dir / SORTED_OUTPUT_PATH.name, index=False)
+    if "csv" not in formats and csv_path.exists():
+        csv_path.unlink()
+
+    print(f"Rows processed: {stats['rows_in'] - stats['dropped']}")
+    print(f"Rows dropped: {stats['dropped']}")
+    print(f"Ambiguous rows: {stats['ambiguous']}")
+    print(f"Outputs written to {output_dir}")
+    return stats
+
+
 def transform() -> None:
     df = load_source_dataframe(SOURCE_PATH)
     processed: List[Dict[str, object]] = []
@@ -681,16 +1018,7 @@ def transform() -> None:
     except PermissionError:
         print(f"Warning: unable to write {OUTPUT_PATH} (permission denied).")
         wrote_unsorted = False
-    category_counts = output_df["category"].value_counts(dropna=False)
-    sorted_df = output_df.copy()
-    sorted_df["__category_freq"] = sorted_df["category"].map(category_counts).fillna(0)
-    sorted_df["__size_mm_primary_sort"] = pd.to_numeric(sorted_df["size_mm_primary"], errors="coerce")
-    sorted_df["__size_mm_secondary_sort"] = pd.to_numeric(sorted_df["size_mm_secondary"], errors="coerce")
-    sorted_df = sorted_df.sort_values(
-        by=["__category_freq", "category", "__size_mm_primary_sort", "__size_mm_secondary_sort", "description"],
-        ascending=[False, True, True, True, True],
-        na_position="last",
-    ).drop(columns=["__category_freq", "__size_mm_primary_sort", "__size_mm_secondary_sort"])
+    sorted_df = _sort_for_review(output_df)
     sorted_df.to_excel(SORTED_OUTPUT_PATH, index=False)
 
     print(f"Rows processed: {len(processed)}")
@@ -704,4 +1032,21 @@ def transform() -> None:
 
 
 if __name__ == "__main__":
-    transform()
+    parser = argparse.ArgumentParser(description="Clean the supplier SKU catalogue.")
+    parser.add_argument("--chunked", action="store_true", help="stream in chunks across a process pool")
+    parser.add_argument("--source", type=Path, default=SOURCE_PATH)
+    parser.add_argument("--output-dir", type=Path, default=CHUNKED_OUTPUT_DIR)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--formats", default="parquet,csv", help="comma-separated: parquet,csv,xlsx")
+    args = parser.parse_args()
+    if args.chunked:
+        transform_chunked(
+            source_path=args.source,
+            output_dir=args.output_dir,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            formats=[f.strip() for f in args.formats.split(",") if f.strip()],
+        )
+    else:
+        transform()
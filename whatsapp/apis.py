@@ -3,6 +3,7 @@
 from urllib.parse import urlencode
 import requests
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field, ValidationError
 from uuid import UUID
 from datetime import datetime
@@ -17,11 +18,12 @@ from database.uoc_crud import DatabaseCRUD as UocCRUD
 from database.sku_crud import SkuCRUD
 from database.models import RequestStatus
 from managers.quotation_handler import (
-    handle_quote_flow,
     notify_user_vendor_quote_update,
     send_vendor_order_confirmation,
 )
 from managers.order_context import OrderContextService
+from jobs.order_submission import enqueue_quote_fanout
+from jobs.runner import job_runner
 
 class MaterialItem(BaseModel):
     material_name: str
@@ -183,19 +185,21 @@ async def submit_order(payload: SubmitOrderRequest):
             #     "user_id": await crud.get_user_id_from_request(str(payload.request_id)),  # Optional helper
             #     "messages": [{"content": "Quote requested"}]
             # }
-            state = {}
-
-            print("submit_order ::::: sender id : calling handle quote flow")
-            await handle_quote_flow(
-                state,
-                sender_id,
-                vendor_targets,
-                str(payload.request_id),
-                [item.dict() for item in payload.items],
+            # Vendor + supervisor notifications run on the job workers; the client doesn't wait on WhatsApp.
+            print("submit_order ::::: sender id : queueing quote flow")
+            queued = await enqueue_quote_fanout(
+                session,
+                request_id=str(payload.request_id),
+                sender_id=sender_id,
+                vendors=vendor_targets,
+                items=jsonable_encoder([item.dict() for item in payload.items]),
                 project_name=payload.project.name,
                 project_location=payload.project.location,
             )
-            print(f"submit_order ::::: sender id : handle quote flow done")
+            await session.commit()
+        if queued:
+            job_runner.wake()
+        print(f"submit_order ::::: sender id : quote flow queued : {queued}")
 
         return {"success": True, "message": "Procurement request submitted and quote flow started."}
 
@@ -248,6 +252,17 @@ async def get_vendor_quotes(request_id: UUID):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/vendor-quotes/{request_id}/comparison")
+async def get_vendor_quote_comparison(request_id: UUID):
+    print(f"apis ::::: get_vendor_quote_comparison ::::: request id : {request_id}")
+    try:
+        async with AsyncSessionLocal() as session:
+            crud = ProcurementCRUD(session)
+            return await crud.get_quote_comparison(request_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/sku")
 async def get_sku_details(
     keyword: str = Query(..., min_length=1, description="Free-form search (brand, size, grade, etc.)"),
@@ -271,6 +286,23 @@ async def get_orders_for_sender(sender_id: str, limit: int = Query(20, ge=1, le=
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/procurement/orders/{sender_id}/page")
+async def get_order_page_for_sender(
+    sender_id: str,
+    lifecycle: Optional[str] = Query(None, pattern="^(draft|active|fulfilled)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+):
+    try:
+        async with AsyncSessionLocal() as session:
+            service = OrderContextService(session)
+            return await service.get_order_page(sender_id, lifecycle=lifecycle, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 from urllib.parse import urlencode, quote
 import json
 import requests
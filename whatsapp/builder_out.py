@@ -1,5 +1,6 @@
 # whatsapp/builder_out.py
 
+import asyncio
 import os
 import time
 import requests
@@ -151,6 +152,39 @@ def _extract_header_media(extra_data: Optional[Dict[str, Any]]) -> Optional[Dict
 
     return { "type": kind, kind: inner }
 
+# ---------- Outbound rate limiting ----------
+class OutboundRateLimiter:
+    """Spaces sends evenly at `rate` per second across all concurrent async senders."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self._interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# Shared by every bulk sender (vendor fan-out, follow-up nudges) so they respect one account-wide budget.
+# VENDOR_NUDGE_SENDS_PER_SECOND is the older, nudge-only setting; still honoured when the new one is unset.
+outbound_limiter = OutboundRateLimiter(
+    float(os.getenv("WHATSAPP_SENDS_PER_SECOND") or os.getenv("VENDOR_NUDGE_SENDS_PER_SECOND") or "10")
+)
+
+
+async def whatsapp_output_async(*args, limiter: Optional[OutboundRateLimiter] = None, **kwargs):
+    """Rate-limited whatsapp_output that keeps the blocking HTTP call off the event loop."""
+    await (limiter or outbound_limiter).wait()
+    return await asyncio.to_thread(whatsapp_output, *args, **kwargs)
+
+
 # ---------- Public Entry ----------
 def whatsapp_output(
     to_number: str,
@@ -1,5 +1,7 @@
 # whatsapp/engagement.py
 import asyncio 
+import uuid
+from app.scheduler import scheduler
 from whatsapp.builder_out import whatsapp_output
 
 async def run_with_engagement(sender_id: str, work_coro, *, first_nudge_after: int = 10):
@@ -21,27 +23,23 @@ We’ll format your details and present them in a refined, professional way to g
     task = asyncio.create_task(work_coro)
 
     async def heartbeat():
-        try:
-            await asyncio.sleep(first_nudge_after)
-            if not task.done():
-                # A single, useful heartbeat (no spam)
-                whatsapp_output(
-                    sender_id,
-                    """⏳ *Almost there…*
+        if not task.done():
+            # A single, useful heartbeat (no spam)
+            whatsapp_output(
+                sender_id,
+                """⏳ *Almost there…*
 
 _Just refining your details - this might take a minute or two._
-                    """,
-                    message_type="plain",
-                    extra_data=[
+                """,
+                message_type="plain",
+                extra_data=[
 
-                    ],
-                )
-        except asyncio.CancelledError:
-            pass
+                ],
+            )
 
-    hb = asyncio.create_task(heartbeat())
+    hb_key = f"engagement:{sender_id}:{uuid.uuid4().hex}"
+    scheduler.call_later(hb_key, first_nudge_after, heartbeat)
     try:
         return await task
     finally:
-        if not hb.done():
-            hb.cancel()
+        scheduler.cancel(hb_key)
@@ -12,6 +12,7 @@ from app.logging_config import logger
 import requests
 from pathlib import Path
 from whatsapp.builder_out import mark_read, send_typing_indicator_meta
+from managers.plan_ingest import download_to_file, ingest_plan_pdf
 # Load environment variables
 load_dotenv()
 APP_SECRET = os.getenv("APP_SECRET", None)
@@ -26,6 +27,7 @@ from agents import credit_agent
 from whatsapp.builder_out import whatsapp_output
 #from database._init_ import AsyncSessionLocal
 from app.db import get_sessionmaker
+from app.scheduler import scheduler
 AsyncSessionLocal = get_sessionmaker()
 
 from database.uoc_crud import DatabaseCRUD
@@ -62,35 +64,29 @@ MEDIA_DOWNLOAD_DIR = Path(MEDIA_DOWNLOAD_PATH)
 #r = redis.Redis(host='localhost', port=6379, decode_responses=True)
 memory_store = {}
 PHOTO_DEBOUNCE_SECONDS = float(os.getenv("PHOTO_DEBOUNCE_SECONDS", "5"))
-_media_batch_tasks: Dict[str, asyncio.Task] = {}
+MEDIA_BATCH_TIMER = "media_batch"
+
+
+def _media_batch_key(sender_id: str) -> str:
+    return f"{MEDIA_BATCH_TIMER}:{sender_id}"
 
 
 def _cancel_media_batch_task(sender_id: str) -> None:
-    task = _media_batch_tasks.pop(sender_id, None)
-    if task and not task.done():
-        task.cancel()
+    scheduler.cancel(_media_batch_key(sender_id))
 
 
 def _schedule_media_batch_processing(sender_id: str) -> None:
-    async def _runner() -> None:
-        try:
-            await asyncio.sleep(PHOTO_DEBOUNCE_SECONDS)
-            await _process_media_batch(sender_id)
-        except asyncio.CancelledError:
-            return
-        except Exception:
-            logging.exception("Webhook :::::: media batch processing failed")
-        finally:
-            _media_batch_tasks.pop(sender_id, None)
-
     _cancel_media_batch_task(sender_id)
-    _media_batch_tasks[sender_id] = asyncio.create_task(_runner())
+    # In-memory on purpose: the batched messages live in memory_store, which a restart empties.
+    scheduler.call_later(
+        _media_batch_key(sender_id),
+        PHOTO_DEBOUNCE_SECONDS,
+        lambda: _process_media_batch(sender_id),
+    )
 
 
 async def _flush_media_batch(sender_id: str) -> None:
-    task = _media_batch_tasks.pop(sender_id, None)
-    if task and not task.done():
-        task.cancel()
+    _cancel_media_batch_task(sender_id)
     await _process_media_batch(sender_id)
 
 
@@ -164,6 +160,8 @@ async def _process_media_batch(sender_id: str) -> None:
         fresh_state.pop("last_media_at", None)
         save_state(sender_id, fresh_state)
 
+
+
 def get_state(sender_id: str): 
     print("Webhook :::::: get_state::::: Getting state for sender_id:", sender_id)
     return memory_store.get(sender_id)                      
@@ -540,6 +538,7 @@ async def handle_whatsapp_event(data: dict):
         else:
             state["user_full_name"] = user_name
             state["user_stage"] = "new" 
+            state["inbound_wamid"] = inbound_wamid
             
             
  
@@ -631,7 +630,8 @@ async def handle_whatsapp_event(data: dict):
             file_name = msg["document"].get("filename", "document")
 
             # Fetch download URL & metadata
-            meta_resp = requests.get(
+            meta_resp = await asyncio.to_thread(
+                requests.get,
                 f"https://graph.facebook.com/v19.0/{media_id}",
                 params={"access_token": ACCESS_TOKEN},
                 timeout=10,
@@ -652,24 +652,22 @@ async def handle_whatsapp_event(data: dict):
             ext = ".pdf" if file_type == "pdf" else ".bin"
             local_path = MEDIA_DOWNLOAD_DIR / f"{media_id}{ext}"
             try:
-                file_data = requests.get(media_url, timeout=10).content
-                with open(local_path, "wb") as fp:
-                    fp.write(file_data)
-                print(f"Webhook :::::: Saved document to {local_path}")
+                size = await download_to_file(
+                    media_url, local_path, headers={"Authorization": f"Bearer {ACCESS_TOKEN}"}
+                )
+                print(f"Webhook :::::: Saved document to {local_path} ({size} bytes)")
             except Exception as e:
                 print("Webhook :::::: Failed to download and save document:", e)
                 return {"status": "ignored", "reason": "Failed to download"}
 
-            # Try optional text extraction for PDFs
+            # Page extraction runs in a process pool; state keeps only the manifest summary.
+            state.pop("pdf_text", None)
+            state.pop("plan_manifest", None)
             if file_type == "pdf":
                 try:
-                    import fitz  # PyMuPDF
-                    doc = fitz.open(str(local_path))
-                    pdf_text = "".join(page.get_text() for page in doc)
-                    doc.close()
-                    state["pdf_text"] = pdf_text
+                    state["plan_manifest"] = await ingest_plan_pdf(str(local_path))
                 except Exception as e:
-                    print("Webhook :::::: PDF text extraction failed:", e)
+                    print("Webhook :::::: PDF page extraction failed:", e)
 
             # Add synthetic user message & metadata
             state["messages"].append({
@@ -681,6 +679,7 @@ async def handle_whatsapp_event(data: dict):
             state["file_name"] = file_name
             state["msg_type"] = file_type
             state["media_url"] = str(local_path)
+            state["file_local_path"] = str(local_path)
         elif msg_type == "audio":
             print("Webhook :::::: whatsapp_webhook::::: Processing audio message")
             audio_obj = msg["audio"]
@@ -817,8 +816,11 @@ async def handle_whatsapp_event(data: dict):
                 
 
             elif q_type == "has_plan_or_doc":
-                    file_url  = state.get("image_path") or state.get("file_local_path")
                     file_type = state.get("msg_type")
+                    if file_type in ("pdf", "document"):
+                        file_url = state.get("file_local_path")
+                    else:
+                        file_url = state.get("image_path") or state.get("file_local_path")
 
                     if file_url and file_type in ("image", "pdf", "document"):
                         print("Webhook :::::: Detected plan upload —", file_type, file_url)
@@ -858,6 +860,18 @@ async def handle_whatsapp_event(data: dict):
                         followups_state = await uoc_mgr.select_or_create_project(state, None)
                     else:
                         followups_state = await task_handler.handle_job_update(state)
+            elif q_type == "task_scope_confirmation":
+                print("Webhook :::::: whatsapp_webhook::::: <needs_clarification True>::::: <uoc_question_type>::::: -- The set question type is task_scope_confirmation, so calling ??confirm_scope?? --")
+                try:
+                    followups_state = await task_handler.confirm_scope(state)
+                except Exception as e:
+                    print("Webhook :::::: whatsapp_webhook::::: Error in confirm_scope:", e)
+                    import traceback; traceback.print_exc()
+                    followups_state = state
+                    followups_state.update(
+                        latest_respons="Sorry, I couldn't log that update. Please send it again.",
+                        uoc_next_message_type="plain",
+                    )
             elif q_type == "task_region_identification":
                 print("Webhook :::::: whatsapp_webhook::::: <needs_clarification True>::::: <uoc_question_type>::::: -- The set question type is task_region_identification, so calling ??get_region_via_llm?? --")
                 try: